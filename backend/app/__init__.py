@@ -1,7 +1,6 @@
 from flask import Flask, jsonify, json
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
 from flask_jwt_extended import JWTManager
@@ -9,11 +8,12 @@ from flask_swagger_ui import get_swaggerui_blueprint
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
 import sqlite3
+import click
 import os
+from .replicas import RoutingSession, PRIMARY_UNTIL_HEADER
 
 # --- Initialize Extensions ---
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bcrypt = Bcrypt()
 mail = Mail()
 jwt = JWTManager()
@@ -32,9 +32,28 @@ def create_app():
     from .config import Config
     app.config.from_object(Config)
 
+    # In production, workers neither create the schema (Alembic migrations
+    # are authoritative) nor write files, and Flask-Migrate (which imports
+    # all of Alembic) is only loaded when running under the flask CLI.
+    production = app.config['STARTUP_MODE'] == 'production'
+
     # --- Bind Extensions to the App ---
+    from .db_profile import configure_engines, init_db_profile
+    configure_engines(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_db_profile(app)
+
+    from .replicas import init_read_replicas
+    init_read_replicas(app)
+
+    from .instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+    if not production or click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    from .passwords import init_password_hasher
+    init_password_hasher(app)
     bcrypt.init_app(app)
     mail.init_app(app)
     jwt.init_app(app)
@@ -54,9 +73,29 @@ def create_app():
             "error": str(error)
         }), 401
     
+    from .pagination import InvalidCursor
+
+    @app.errorhandler(InvalidCursor)
+    def invalid_cursor_callback(error):
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    from .fieldsets import InvalidFields
+
+    @app.errorhandler(InvalidFields)
+    def invalid_fields_callback(error):
+        return jsonify({"error": str(error), "available": error.available}), 400
+
+    from .passwords import PasswordHasherBusy
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy_callback(error):
+        response = jsonify({"error": "Server is busy, please retry shortly"})
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response, 503
+    
     # Configure Swagger UI
     SWAGGER_URL = '/api/docs'
-    API_URL = '/static/swagger.json'
+    API_URL = '/api/openapi.json'  # Served from memory, see app/openapi.py
     
     # Create Swagger UI blueprint
     swaggerui_blueprint = get_swaggerui_blueprint(
@@ -68,20 +107,25 @@ def create_app():
         }
     )
     
-    # Create static folder if it doesn't exist
-    if not os.path.exists(os.path.join(app.root_path, 'static')):
-        os.makedirs(os.path.join(app.root_path, 'static'))
-          # Copy swagger.json to static folder
-    with open(os.path.join(app.root_path, 'swagger.json'), 'r') as f:
-        swagger_data = json.load(f)
-    
-    with open(os.path.join(app.root_path, 'static', 'swagger.json'), 'w') as f:
-        json.dump(swagger_data, f)
+    if not production:
+        # Create static folder if it doesn't exist
+        if not os.path.exists(os.path.join(app.root_path, 'static')):
+            os.makedirs(os.path.join(app.root_path, 'static'))
+        # Keep the legacy static copy of swagger.json up to date
+        with open(os.path.join(app.root_path, 'swagger.json'), 'r') as f:
+            swagger_data = json.load(f)
+
+        with open(os.path.join(app.root_path, 'static', 'swagger.json'), 'w') as f:
+            json.dump(swagger_data, f)
     
     # Register Swagger UI blueprint
     app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
+
+    from .openapi import openapi_bp
+    app.register_blueprint(openapi_bp)
     
-    CORS(app)
+    # Lets browser clients on other origins echo the read-your-writes deadline
+    CORS(app, expose_headers=[PRIMARY_UNTIL_HEADER])
 
     # Register blueprints
     from .auth import auth_bp
@@ -105,8 +149,71 @@ def create_app():
     from .follows import follows_bp
     app.register_blueprint(follows_bp, url_prefix='/api/follows')
 
+    from .feed import feed_bp
+    app.register_blueprint(feed_bp, url_prefix='/api/feed')
+
+    from .bulk import bulk_bp
+    app.register_blueprint(bulk_bp)
+
+    from .view_tracking import init_view_tracking
+    init_view_tracking(app)
+
+    from .mailer import init_mail_outbox
+    init_mail_outbox(app)
+
+    from .tags import init_tag_cache
+    init_tag_cache(app)
+
+    from .metrics import init_metrics
+    init_metrics(app)
+
+    # Registered after the metrics hook so that runs on the compressed size
+    from .compression import init_compression
+    init_compression(app)
+
+    # Register CLI commands
+    from .counters import reconcile_counters_command
+    app.cli.add_command(reconcile_counters_command)
+
+    from .search import rebuild_search_index_command
+    app.cli.add_command(rebuild_search_index_command)
+
+    from .trending import refresh_trending_command, rebuild_trending_command
+    app.cli.add_command(refresh_trending_command)
+    app.cli.add_command(rebuild_trending_command)
+
+    from .feed import rebuild_feeds_command
+    app.cli.add_command(rebuild_feeds_command)
+
+    from .mailer import deliver_outbox_command, smtp_sink_command
+    app.cli.add_command(deliver_outbox_command)
+    app.cli.add_command(smtp_sink_command)
+
+    from .bulk import export_blogs_command, import_blogs_command
+    app.cli.add_command(export_blogs_command)
+    app.cli.add_command(import_blogs_command)
+
+    from .replicas import sync_replicas_command
+    app.cli.add_command(sync_replicas_command)
+
+    from .follow_graph import prune_follow_events_command
+    app.cli.add_command(prune_follow_events_command)
+
+    from .recommendations import build_recommendations_command
+    app.cli.add_command(build_recommendations_command)
+
+    from .excerpts import backfill_excerpts_command
+    app.cli.add_command(backfill_excerpts_command)
+
+    if not production:
+        with app.app_context():
+            db.create_all()
+
+            from .search import init_search_index
+            init_search_index(app)
 
-    with app.app_context():
-        db.create_all()
+    # Starts loading in the background, so only once the tables exist
+    from .follow_graph import init_follow_graph
+    init_follow_graph(app)
 
     return app
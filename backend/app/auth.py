@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify, url_for
 from .models import User
 from . import db, bcrypt, jwt
-from .utils import generate_confirmation_token, confirm_token, send_email
+from .utils import generate_confirmation_token, confirm_token
+from .mailer import queue_email, get_outbox
+from .passwords import PasswordHasherBusy
+from .replicas import use_primary
+from .metrics import monitoring_required
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, create_refresh_token
 
 auth_bp = Blueprint('auth', __name__)
@@ -37,17 +41,20 @@ def signup():
     new_user = User(username=username, email=email)
     new_user.set_password(password)
     db.session.add(new_user)
-    db.session.commit()
 
     token = generate_confirmation_token(new_user.email)
     verify_url = url_for('auth.verify_email', token=token, _external=True)
     html_body = f"<p>Welcome! Thanks for signing up. Please follow this link to activate your account:</p><p><a href='{verify_url}'>{verify_url}</a></p>"
-    send_email(new_user.email, "Please confirm your email", html_body)
+    # Delivered by the outbox workers; committed together with the user
+    queue_email(new_user.email, "Please confirm your email", html_body)
+    db.session.commit()
+    get_outbox().notify()
 
     return jsonify({"message": "User created. Please check your email to verify your account."}), 201
 
 
 @auth_bp.route('/verify-email/<token>', methods=['GET'])
+@use_primary
 def verify_email(token):
     try:
         email = confirm_token(token)
@@ -78,6 +85,14 @@ def login():
     if not user.is_verified:
         return jsonify({"error": "Account not verified. Please check your email."}), 403
 
+    # Upgrade hashes made with an older cost factor while we have the password
+    if user.password_needs_rehash():
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass  # Try again on a later login
+
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
 
@@ -118,7 +133,9 @@ def reset_password_request():
         token = generate_confirmation_token(user.email)
         reset_url = f"http://localhost:3000/reset-password/{token}"
         html_body = f"<p>You requested a password reset. Click the link below:</p><p><a href='{reset_url}'>{reset_url}</a></p>"
-        send_email(user.email, "Password Reset Request", html_body)
+        queue_email(user.email, "Password Reset Request", html_body)
+        db.session.commit()
+        get_outbox().notify()
 
     return jsonify({"message": "If an account with that email exists, a password reset link has been sent."}), 200
 
@@ -143,6 +160,12 @@ def reset_password(token):
     db.session.commit()
     return jsonify({"message": "Your password has been reset successfully."}), 200
 
+@auth_bp.route('/outbox/stats', methods=['GET'])
+@monitoring_required
+def get_outbox_stats():
+    """Email outbox queue lag and delivery throughput"""
+    return jsonify(get_outbox().stats()), 200
+
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
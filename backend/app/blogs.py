@@ -1,7 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from .models import Blog, User, Tag, db
-from sqlalchemy import func
+from .view_tracking import get_view_buffer
+from .pagination import keyset_page, cursor_pagination
+from . import trending, feed
+from .caching import conditional, bump_versions, blog_version_keys
+from .tags import set_blog_tags
+from .instrumentation import query_budget
+from .metrics import monitoring_required
+from .serializers import with_blog_relations, serialize_blog, public_blog_counts, blog_fields
+from .fieldsets import select_fields
+from .excerpts import content_fields, set_blog_content
+from .search import (search_backend, build_match_expression, search_hits,
+                     highlight_hits, index_blog, remove_blog)
 
 blogs_bp = Blueprint('blogs', __name__, url_prefix='/api/blogs')
 
@@ -46,7 +57,12 @@ def validate_category(category):
         return True  # Category is optional
     return category.lower() in BLOG_CATEGORIES
 
+def _escape_like(value):
+    """Escape LIKE wildcards so user input is matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 @blogs_bp.route('/categories', methods=['GET'])
+@conditional(static_tag=','.join(BLOG_CATEGORIES))
 def get_categories():
     """Get list of available blog categories"""
     return jsonify({
@@ -79,17 +95,16 @@ def create_blog():
     if category:
         category = category.lower()
 
-    tags = []
-    for tag_name in tags_input:
-        tag_name = tag_name.lower()
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
-        tags.append(tag)
-
-    new_blog = Blog(title=title, content=content, user_id=user_id, category=category, tags=tags, is_draft=not publish_flag)
+    new_blog = Blog(title=title, content=content, user_id=user_id, category=category, is_draft=not publish_flag,
+                    **content_fields(content))
     db.session.add(new_blog)
+    db.session.flush()
+    set_blog_tags(new_blog, tags_input, new=True)
+    index_blog(new_blog)
+    if not new_blog.is_draft:
+        trending.record_event(new_blog.id, 'publish')
+        feed.fan_out_blog(new_blog)
+        bump_versions(*blog_version_keys(new_blog))
     db.session.commit()
 
     return jsonify({
@@ -98,6 +113,8 @@ def create_blog():
             'id': new_blog.id,
             'title': new_blog.title,
             'content': new_blog.content,
+            'word_count': new_blog.word_count,
+            'reading_time': new_blog.reading_time,
             'timestamp': new_blog.timestamp.isoformat(),
             'category': new_blog.category,
             'is_draft': new_blog.is_draft
@@ -105,6 +122,8 @@ def create_blog():
     }), 201
 
 @blogs_bp.route('', methods=['GET'])
+@conditional(lambda: ['blogs'])
+@query_budget(6)
 def get_blogs():
     # Pagination parameters with validation
     page = request.args.get('page', 1, type=int)
@@ -118,32 +137,29 @@ def get_blogs():
     
     # Limit per_page to prevent abuse
     per_page = min(per_page, 100)
+    selection = select_fields(blog_fields('preview'), embeds=('author', 'tags'), default_embeds=('author',))
     
     category = request.args.get('category')
     query = Blog.query.filter_by(is_draft=False, is_archived=False)
     if category:
         query = query.filter_by(category=category)
-
-    # Apply pagination
-    paginated_blogs = query.order_by(Blog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    result = [{
-        'id': blog.id,
-        'title': blog.title,
-        'content': blog.content,
-        'timestamp': blog.timestamp.isoformat(),
-        'category': blog.category,
-        'author': blog.user.username
-    } for blog in paginated_blogs.items]
-
-    # Return paginated response
-    return jsonify({
-        'blogs': result,
-        'pagination': {
+    query = with_blog_relations(query, selection=selection, content='preview')
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        # Keyset mode: seek past the cursor, no OFFSET and no COUNT(*)
+        blogs, next_cursor = keyset_page(query, [Blog.timestamp, Blog.id], cursor, per_page,
+                                         lambda blog: (blog.timestamp, blog.id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        # Apply pagination
+        paginated_blogs = query.order_by(Blog.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        blogs = paginated_blogs.items
+        pagination = {
             'page': paginated_blogs.page,
             'per_page': paginated_blogs.per_page,
             'total': paginated_blogs.total,
@@ -153,54 +169,44 @@ def get_blogs():
             'next_num': paginated_blogs.next_num if paginated_blogs.has_next else None,
             'prev_num': paginated_blogs.prev_num if paginated_blogs.has_prev else None
         }
+    
+    result = [serialize_blog(blog, content='preview', selection=selection) for blog in blogs]
+
+    # Return paginated response
+    return jsonify({
+        'blogs': result,
+        'pagination': pagination
     }), 200
 
 
 @blogs_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def get_blog_by_id(id):
-    blog = Blog.query.get(id)
+    selection = select_fields(blog_fields(counts=('likes_count', 'view_count')), embeds=('author', 'tags'))
+    blog = with_blog_relations(Blog.query.filter(Blog.id == id), selection=selection).first()
     if not blog:
         return jsonify({'msg': 'Blog not found'}), 404
     
-    # Track view (with 1-hour cooldown to prevent spam)
+    # Track view (with 1-hour cooldown to prevent spam); the write is
+    # buffered and flushed in batches by the view tracker
     user_id = int(get_jwt_identity())
-    from .models import BlogView, Like
-    from datetime import datetime, timedelta
-    
-    # Check if user already viewed this blog recently
-    recent_view = BlogView.query.filter_by(
-        blog_id=id, 
-        user_id=user_id
-    ).filter(
-        BlogView.timestamp > datetime.utcnow() - timedelta(hours=1)
-    ).first()
-    
-    # Only create new view if no recent view exists
-    if not recent_view:
-        view = BlogView(blog_id=id, user_id=user_id, ip_address=request.remote_addr)
-        db.session.add(view)
-        db.session.commit()
-    
-    # Get counts (consistent with your trending blogs approach)
-    view_count = BlogView.query.filter_by(blog_id=id).count()
-    likes_count = Like.query.filter_by(blog_id=id).count()
+    view_buffer = get_view_buffer()
+    view_buffer.record(id, user_id, request.remote_addr)
     
     # Return consistent response format (matching your other endpoints)
-    return jsonify({
-        'id': blog.id,
-        'title': blog.title,
-        'content': blog.content,
-        'timestamp': blog.timestamp.isoformat(),
-        'category': blog.category,
-        'author': blog.user.username,
-        'tags': [tag.name for tag in blog.tags],  # Consistent with search/trending
-        'view_count': view_count,
-        'likes_count': likes_count
-    }), 200
+    data = serialize_blog(blog, counts=('likes_count',), selection=selection)
+    if 'view_count' in selection:
+        data['view_count'] = blog.view_count + view_buffer.pending_count(id)
+    return jsonify(data), 200
 
 
 
+@blogs_bp.route('/views/stats', methods=['GET'])
+@monitoring_required
+def get_view_tracking_stats():
+    """Queue depth and flush latency of the buffered view tracker"""
+    return jsonify(get_view_buffer().stats()), 200
+
 @blogs_bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_blog(id):
@@ -214,6 +220,7 @@ def update_blog(id):
         return jsonify({'msg': 'Unauthorized'}), 403
 
     data = request.get_json()
+    was_public = not blog.is_draft and not blog.is_archived
     
     # Validate category if provided
     new_category = data.get('category', blog.category)
@@ -223,24 +230,21 @@ def update_blog(id):
         }), 400
 
     blog.title = data.get('title', blog.title)
-    blog.content = data.get('content', blog.content)
+    if data.get('content') is not None:
+        set_blog_content(blog, data['content'])
     blog.category = new_category.lower() if new_category else blog.category
     
     # Handle publish status change
     if 'publish' in data:
         blog.is_draft = not data.get('publish', blog.is_draft)
 
-    blog.tags.clear()
-    tags_input = data.get('tags', [])
-
-    for tag_name in tags_input:
-        tag_name = tag_name.lower()
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
-        blog.tags.append(tag)
+    set_blog_tags(blog, data.get('tags', []))
 
+    index_blog(blog)
+    trending.sync_blog(blog)
+    feed.sync_blog(blog, was_public)
+    if was_public or not (blog.is_draft or blog.is_archived):
+        bump_versions(*blog_version_keys(blog))
     db.session.commit()
 
     return jsonify({'msg': 'Blog updated successfully'}), 200
@@ -256,12 +260,16 @@ def delete_blog(id):
     if blog.user_id != user_id:
         return jsonify({'msg': 'Unauthorized'}), 403
 
+    remove_blog(blog.id)
+    feed.retract_blog(blog.id)
+    bump_versions(*blog_version_keys(blog, deleted=True))
     db.session.delete(blog)
     db.session.commit()
 
     return jsonify({'msg': 'Blog deleted successfully'}), 200
 
 @blogs_bp.route('/search', methods=['GET'])
+@query_budget(8)
 def search_blogs():
     # Pagination parameters with validation
     page = request.args.get('page', 1, type=int)
@@ -276,6 +284,7 @@ def search_blogs():
     per_page = min(per_page, 100)
     
     # Search parameters
+    query_text = request.args.get('q')
     username = request.args.get('username')
     title = request.args.get('title')
     category = request.args.get('category')
@@ -286,85 +295,108 @@ def search_blogs():
     if author_only and username:
         # Return unique authors matching search, not their blogs
         authors_query = db.session.query(User).join(Blog).filter(
-            User.username.ilike(f'%{username}%'),
+            User.username.ilike(f'{_escape_like(username)}%', escape='\\'),
             Blog.is_draft == False,
             Blog.is_archived == False
         ).distinct()
         
-        # Apply pagination to authors
-        paginated_authors = authors_query.order_by(User.username).paginate(
-            page=page,
-            per_page=min(per_page, 50),  # Limit author results
-            error_out=False
-        )
+        cursor = request.args.get('cursor')
+        if cursor is not None:
+            authors, next_cursor = keyset_page(authors_query, [User.username, User.id], cursor, min(per_page, 50),
+                                               lambda author: (author.username, author.id), descending=False)
+            pagination = cursor_pagination(min(per_page, 50), next_cursor)
+        else:
+            # Apply pagination to authors
+            paginated_authors = authors_query.order_by(User.username).paginate(
+                page=page,
+                per_page=min(per_page, 50),  # Limit author results
+                error_out=False
+            )
+            authors = paginated_authors.items
+            pagination = {
+                'page': paginated_authors.page,
+                'per_page': paginated_authors.per_page,
+                'total': paginated_authors.total,
+                'pages': paginated_authors.pages,
+                'has_next': paginated_authors.has_next,
+                'has_prev': paginated_authors.has_prev,
+                'next_num': paginated_authors.next_num if paginated_authors.has_next else None,
+                'prev_num': paginated_authors.prev_num if paginated_authors.has_prev else None
+            }
         
+        blog_counts = public_blog_counts([author.id for author in authors])
         authors_list = []
-        for author in paginated_authors.items:
-            blog_count = Blog.query.filter_by(user_id=author.id, is_draft=False, is_archived=False).count()
+        for author in authors:
             authors_list.append({
                 'id': author.id,
                 'username': author.username,
-                'blog_count': blog_count,
+                'blog_count': blog_counts.get(author.id, 0),
                 'joined_date': author.created_at.isoformat() if hasattr(author, 'created_at') else None,
                 'profile_url': f'/api/users/{author.username}'  # Helper for frontend
             })
         
         return jsonify({
             'authors': authors_list,
-            'pagination': {
-                'page': paginated_authors.page,
-                'per_page': paginated_authors.per_page,
-                'total': paginated_authors.total,
-                'pages': paginated_authors.pages,
-                'has_next': paginated_authors.has_next,
-                'has_prev': paginated_authors.has_prev,
-                'next_num': paginated_authors.next_num if paginated_authors.has_next else None,
-                'prev_num': paginated_authors.prev_num if paginated_authors.has_prev else None
-            },
+            'pagination': pagination,
             'search_type': 'authors_only',
             'search_term': username
         }), 200
 
-    # Regular blog search
-    query = Blog.query.join(User)
+    # Regular blog search. Free text and title go through the full-text
+    # index (ranked, prefix-matching); username is a prefix match and
+    # category an exact match so both can use plain indexes.
+    match = build_match_expression(query_text, title) if search_backend() else None
+    if match:
+        hits = search_hits(match)
+        query = db.session.query(Blog, hits.c.rank).join(hits, hits.c.blog_id == Blog.id).join(User)
+    else:
+        query = db.session.query(Blog).join(User)
+        if search_backend() is None:
+            # No full-text index on this database; fall back to substring matching
+            if query_text:
+                query = query.filter(Blog.title.ilike(f'%{_escape_like(query_text)}%', escape='\\') |
+                                     Blog.content.ilike(f'%{_escape_like(query_text)}%', escape='\\'))
+            if title:
+                query = query.filter(Blog.title.ilike(f'%{_escape_like(title)}%', escape='\\'))
 
     if username:
-        query = query.filter(User.username.ilike(f'%{username}%'))
-
-    if title:
-        query = query.filter(Blog.title.ilike(f'%{title}%'))
+        query = query.filter(User.username.ilike(f'{_escape_like(username)}%', escape='\\'))
 
     if category:
-        query = query.filter(Blog.category.ilike(f'%{category}%'))
+        query = query.filter(Blog.category == category.lower())
 
     if tag_filter:
         tag_names = [t.strip().lower() for t in tag_filter.split(',')]
         query = query.join(Blog.tags).filter(Tag.name.in_(tag_names)).distinct()
 
     query = query.filter(Blog.is_draft == False, Blog.is_archived == False)
-
-    # Apply pagination
-    paginated_results = query.order_by(Blog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-
-    response = []
-    for blog in paginated_results.items:
-        response.append({
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content,
-            'category': blog.category,
-            'timestamp': blog.timestamp.isoformat(),
-            'author': blog.user.username,
-            'tags': [tag.name for tag in blog.tags]
-        })
-
-    return jsonify({
-        'blogs': response,
-        'pagination': {
+    selection = select_fields(blog_fields('preview', extra=('rank', 'highlight') if match else ()),
+                              embeds=('author', 'tags'))
+    query = with_blog_relations(query, selection=selection, content='preview')
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if match:
+            rows, next_cursor = keyset_page(query, [hits.c.rank, Blog.timestamp, Blog.id], cursor, per_page,
+                                            lambda row: (row[1], row[0].timestamp, row[0].id))
+        else:
+            rows, next_cursor = keyset_page(query, [Blog.timestamp, Blog.id], cursor, per_page,
+                                            lambda blog: (blog.timestamp, blog.id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        if match:
+            query = query.order_by(hits.c.rank.desc(), Blog.timestamp.desc())
+        else:
+            query = query.order_by(Blog.timestamp.desc())
+
+        # Apply pagination
+        paginated_results = query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        rows = paginated_results.items
+        pagination = {
             'page': paginated_results.page,
             'per_page': paginated_results.per_page,
             'total': paginated_results.total,
@@ -374,6 +406,24 @@ def search_blogs():
             'next_num': paginated_results.next_num if paginated_results.has_next else None,
             'prev_num': paginated_results.prev_num if paginated_results.has_prev else None
         }
+
+    if not match:
+        rows = [(blog, None) for blog in rows]
+    highlights = highlight_hits(match, [blog.id for blog, _ in rows]) if match and 'highlight' in selection else {}
+
+    response = []
+    for blog, rank in rows:
+        item = serialize_blog(blog, content='preview', selection=selection)
+        if match:
+            if 'rank' in selection:
+                item['rank'] = rank
+            if 'highlight' in selection:
+                item['highlight'] = highlights.get(blog.id)
+        response.append(item)
+
+    return jsonify({
+        'blogs': response,
+        'pagination': pagination
     }), 200
 
 @blogs_bp.route('/<int:blog_id>/publish', methods=['PATCH'])
@@ -384,7 +434,12 @@ def publish_blog(blog_id):
     if blog.user_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    was_public = not blog.is_draft and not blog.is_archived
     blog.is_draft = False
+    index_blog(blog)
+    trending.record_event(blog.id, 'publish')
+    feed.sync_blog(blog, was_public)
+    bump_versions(*blog_version_keys(blog))
     db.session.commit()
     return jsonify({'message': 'Blog published'}), 200
 
@@ -397,11 +452,16 @@ def archive_blog(blog_id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     blog.is_archived = True
+    remove_blog(blog.id)
+    trending.remove_blog(blog.id)
+    feed.retract_blog(blog.id)
+    bump_versions(*blog_version_keys(blog))
     db.session.commit()
     return jsonify({'message': 'Blog archived'}), 200
 
 @blogs_bp.route('/drafts', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_drafts():
     user_id = int(get_jwt_identity())
     
@@ -417,28 +477,24 @@ def get_drafts():
     
     per_page = min(per_page, 100)
     
-    # Apply pagination to drafts query
-    paginated_drafts = Blog.query.filter_by(user_id=user_id, is_draft=True).order_by(Blog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    drafts_list = [
-        {
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content,
-            'timestamp': blog.timestamp.isoformat(),
-            'category': blog.category,
-            'tags': [tag.name for tag in blog.tags]
-        }
-        for blog in paginated_drafts.items
-    ]
-    
-    return jsonify({
-        'blogs': drafts_list,  # Changed from 'drafts' to 'blogs' for consistency
-        'pagination': {
+    selection = select_fields(blog_fields('preview'), embeds=('tags',))
+    query = with_blog_relations(Blog.query.filter_by(user_id=user_id, is_draft=True), author=False,
+                                selection=selection, content='preview')
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        blogs, next_cursor = keyset_page(query, [Blog.timestamp, Blog.id], cursor, per_page,
+                                         lambda blog: (blog.timestamp, blog.id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        # Apply pagination to drafts query
+        paginated_drafts = query.order_by(Blog.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        blogs = paginated_drafts.items
+        pagination = {
             'page': paginated_drafts.page,
             'per_page': paginated_drafts.per_page,
             'total': paginated_drafts.total,
@@ -448,10 +504,17 @@ def get_drafts():
             'next_num': paginated_drafts.next_num if paginated_drafts.has_next else None,
             'prev_num': paginated_drafts.prev_num if paginated_drafts.has_prev else None
         }
+    
+    drafts_list = [serialize_blog(blog, content='preview', author=False, selection=selection) for blog in blogs]
+    
+    return jsonify({
+        'blogs': drafts_list,  # Changed from 'drafts' to 'blogs' for consistency
+        'pagination': pagination
     }), 200
 
 @blogs_bp.route('/archived', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_archived_blogs():
     user_id = int(get_jwt_identity())
     
@@ -467,28 +530,24 @@ def get_archived_blogs():
     
     per_page = min(per_page, 100)
     
-    # Apply pagination to archived blogs query
-    paginated_archived = Blog.query.filter_by(user_id=user_id, is_archived=True).order_by(Blog.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    archived_list = [
-        {
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content,
-            'timestamp': blog.timestamp.isoformat(),
-            'category': blog.category,
-            'tags': [tag.name for tag in blog.tags]
-        }
-        for blog in paginated_archived.items
-    ]
-    
-    return jsonify({
-        'blogs': archived_list,  # Changed from 'archived_blogs' to 'blogs' for consistency
-        'pagination': {
+    selection = select_fields(blog_fields('preview'), embeds=('tags',))
+    query = with_blog_relations(Blog.query.filter_by(user_id=user_id, is_archived=True), author=False,
+                                selection=selection, content='preview')
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        blogs, next_cursor = keyset_page(query, [Blog.timestamp, Blog.id], cursor, per_page,
+                                         lambda blog: (blog.timestamp, blog.id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        # Apply pagination to archived blogs query
+        paginated_archived = query.order_by(Blog.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        blogs = paginated_archived.items
+        pagination = {
             'page': paginated_archived.page,
             'per_page': paginated_archived.per_page,
             'total': paginated_archived.total,
@@ -498,16 +557,24 @@ def get_archived_blogs():
             'next_num': paginated_archived.next_num if paginated_archived.has_next else None,
             'prev_num': paginated_archived.prev_num if paginated_archived.has_prev else None
         }
+    
+    archived_list = [serialize_blog(blog, content='preview', author=False, selection=selection) for blog in blogs]
+    
+    return jsonify({
+        'blogs': archived_list,  # Changed from 'archived_blogs' to 'blogs' for consistency
+        'pagination': pagination
     }), 200
 
 @blogs_bp.route('/recommendations', methods=['GET'])
 @jwt_required()
+@query_budget(10)
 def get_personalized_recommendations():
-    """Get personalized blog recommendations based on user's category preferences"""
+    """Get personalized blog recommendations from similar readers' activity and category preferences"""
     user_id = int(get_jwt_identity())
     
     # Import here to avoid circular imports
     from .models import UserCategoryPreference
+    from .recommendations import recommend
     
     # Pagination parameters
     page = request.args.get('page', 1, type=int)
@@ -520,12 +587,19 @@ def get_personalized_recommendations():
     if per_page < 1:
         return jsonify({'error': 'Items per page must be 1 or greater'}), 400
     
+    selection = select_fields(blog_fields('preview', counts=('likes_count',), extra=('reason',)),
+                              embeds=('author', 'tags'))
+    
     # Get user's preferred categories
     user_preferences = UserCategoryPreference.query.filter_by(user_id=user_id).all()
     preferred_categories = [pref.category for pref in user_preferences]
     
-    if not preferred_categories:
-        # If no preferences set, return general popular blogs
+    # Neighbours of the user's recent likes and views (precomputed, see
+    # app/recommendations.py), then the newest blogs in preferred categories
+    ranked, history_size = recommend(user_id, preferred_categories)
+    
+    if not ranked and not preferred_categories:
+        # Nothing to go on yet
         return jsonify({
             'message': 'No category preferences set. Please set your preferences first.',
             'recommendations': [],
@@ -540,103 +614,100 @@ def get_personalized_recommendations():
             'suggestion': 'Visit /api/preferences/categories to set your preferred categories'
         }), 200
     
-    # Get blogs from preferred categories (excluding user's own blogs)
-    query = Blog.query.filter(
-        Blog.is_draft == False,
-        Blog.is_archived == False,
-        Blog.user_id != user_id,  # Exclude user's own blogs
-        Blog.category.in_(preferred_categories)
-    ).order_by(Blog.timestamp.desc())
-    
-    # Apply pagination
-    paginated_blogs = query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
+    # Paginate the ranked list, then load just this page's blogs
+    total = len(ranked)
+    pages = (total + per_page - 1) // per_page
+    page_ids = ranked[(page - 1) * per_page:page * per_page]
+    blogs = {blog.id: blog for blog in with_blog_relations(
+        Blog.query.filter(Blog.id.in_([blog_id for blog_id, _ in page_ids])), selection=selection, content='preview'
+    ).all()}
     
     # Serialize blogs
     recommendations = []
-    for blog in paginated_blogs.items:
-        recommendations.append({
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content[:200] + '...' if len(blog.content) > 200 else blog.content,  # Preview
-            'timestamp': blog.timestamp.isoformat(),
-            'category': blog.category,
-            'author': blog.user.username,
-            'tags': [tag.name for tag in blog.tags],
-            'likes_count': len(blog.likes) if hasattr(blog, 'likes') else 0
-        })
+    for blog_id, reason in page_ids:
+        if blog_id in blogs:
+            blog_data = serialize_blog(blogs[blog_id], content='preview', counts=('likes_count',),
+                                       selection=selection)
+            if 'reason' in selection:
+                blog_data['reason'] = reason
+            recommendations.append(blog_data)
     
     return jsonify({
         'recommendations': recommendations,
         'pagination': {
-            'page': paginated_blogs.page,
-            'per_page': paginated_blogs.per_page,
-            'total': paginated_blogs.total,
-            'pages': paginated_blogs.pages,
-            'has_next': paginated_blogs.has_next,
-            'has_prev': paginated_blogs.has_prev,
-            'next_num': paginated_blogs.next_num if paginated_blogs.has_next else None,
-            'prev_num': paginated_blogs.prev_num if paginated_blogs.has_prev else None
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': pages,
+            'has_next': page < pages,
+            'has_prev': page > 1,
+            'next_num': page + 1 if page < pages else None,
+            'prev_num': page - 1 if page > 1 else None
         },
         'based_on_categories': preferred_categories,
-        'total_preferred_categories': len(preferred_categories)
+        'total_preferred_categories': len(preferred_categories),
+        'based_on_history': history_size
     }), 200
 
 @blogs_bp.route('/trending', methods=['GET'])
+@conditional(lambda: ['trending'], window='HTTP_CACHE_TRENDING_WINDOW')
+@query_budget(6)
 def get_trending_blogs():
-    """Get trending blogs across all categories"""
+    """Get trending blogs across all categories, or within one with ?category="""
     # Pagination parameters
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     per_page = min(per_page, 50)
-      # Get blogs with most likes in the last 7 days (simplified trending logic)
-    from datetime import datetime, timedelta
-    week_ago = datetime.utcnow() - timedelta(days=7)
-
-    from .models import Like #import like model at the top 
-    
-    # For now, just get recent popular blogs (you can enhance this with like counts later)
-    query = Blog.query.outerjoin(Like, Blog.id == Like.blog_id).filter(
-        Blog.is_draft == False,
-        Blog.is_archived == False,
-        Blog.timestamp >= week_ago
-    ).group_by(Blog.id).order_by(
-        func.count(Like.id).desc(),  # ✅ Most liked first
-        Blog.timestamp.desc()        # ✅ Then by newest as tiebreaker
-    )
-    
-    paginated_blogs = query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    trending_blogs = []
-    for blog in paginated_blogs.items:
-        likes_count = Like.query.filter_by(blog_id=blog.id).count()
-        trending_blogs.append({
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content[:200] + '...' if len(blog.content) > 200 else blog.content,
-            'timestamp': blog.timestamp.isoformat(),
-            'category': blog.category,
-            'author': blog.user.username,
-            'tags': [tag.name for tag in blog.tags],
-            'likes_count': likes_count
-        })
-    
-    return jsonify({
-        'trending_blogs': trending_blogs,
-        'pagination': {
+    category = request.args.get('category')
+    selection = select_fields(blog_fields('preview', counts=('likes_count',), extra=('trending_score',)),
+                              embeds=('author', 'tags'))
+
+    # Scores are precomputed and time-decayed (see app/trending.py), so this
+    # is a range read on the (category,) score index
+    from .models import TrendingScore
+
+    query = db.session.query(Blog, TrendingScore.score, TrendingScore.epoch)\
+                      .join(TrendingScore, TrendingScore.blog_id == Blog.id)\
+                      .filter(Blog.is_draft == False, Blog.is_archived == False)
+    if category:
+        query = query.filter(TrendingScore.category == category.lower())
+    query = with_blog_relations(query, selection=selection, content='preview')
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        rows, next_cursor = keyset_page(query, [TrendingScore.score, TrendingScore.blog_id], cursor, per_page,
+                                        lambda row: (row[1], row[0].id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_blogs = query.order_by(
+            TrendingScore.score.desc(),
+            TrendingScore.blog_id.desc()
+        ).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        rows = paginated_blogs.items
+        pagination = {
             'page': paginated_blogs.page,
             'per_page': paginated_blogs.per_page,
             'total': paginated_blogs.total,
             'pages': paginated_blogs.pages,
             'has_next': paginated_blogs.has_next,
             'has_prev': paginated_blogs.has_prev
-        },
-        'period': 'last_7_days'
+        }
+    
+    trending_blogs = []
+    for blog, score, epoch in rows:
+        item = serialize_blog(blog, content='preview', counts=('likes_count',), selection=selection)
+        if 'trending_score' in selection:
+            item['trending_score'] = round(trending.decayed_score(score, epoch), 4)
+        trending_blogs.append(item)
+    
+    return jsonify({
+        'trending_blogs': trending_blogs,
+        'pagination': pagination,
+        'period': 'time_decayed',
+        'half_life_hours': current_app.config['TRENDING_HALF_LIFE_HOURS'],
+        'category': category.lower() if category else None
     }), 200
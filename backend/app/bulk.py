@@ -0,0 +1,466 @@
+# app/bulk.py
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import click
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from .models import db, User, Blog, Tag, Like, Comment, blog_tags
+from .tags import normalize_tags, resolve_tag_ids
+from .search import index_blog_rows
+from .caching import bump_versions
+from .excerpts import content_fields
+from .utils import admin_required
+
+# Bulk export and import of blogs as NDJSON, one blog per line with its
+# tags, likes and comments (users are referenced by username, so a dump
+# can be loaded into another environment that has the same accounts).
+#
+# Export walks the blog table with a server-side cursor (yield_per) and
+# loads each batch's tags, likes and comments with one IN query apiece, so
+# memory stays constant however many blogs there are. Import reads the
+# stream line by line and writes each batch of blogs in one transaction of
+# multi-row inserts, inside a savepoint: a batch the database rejects is
+# retried a record at a time, and only the records that still fail are
+# skipped (counted as 'rejected'). Both report a checkpoint after every
+# batch (the last exported blog id, or the input line and byte offset)
+# that the CLI keeps in a file, so an interrupted run picks up where it
+# stopped.
+#
+# view_count is imported as a number, without blog_view rows;
+# `flask reconcile-counters` keeps it (see app/counters.py).
+#
+# Imports update the search index; run `flask rebuild-feeds` and
+# `flask rebuild-trending` afterwards to bring timelines and trending up
+# to date.
+
+bulk_bp = Blueprint('bulk', __name__)
+
+MAX_REPORTED_ERRORS = 100
+IN_CHUNK = 500  # stay well below SQLite's bound parameter limit
+
+
+def _chunks(values, size=IN_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _objects(values):
+    """The dicts in a list field of an import record, ignoring anything malformed."""
+    return [value for value in values if isinstance(value, dict)] if isinstance(values, list) else []
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _parse_time(value):
+    if not value:
+        return datetime.utcnow()
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _parse_bool(value, field):
+    # JSON booleans or the strings 'true'/'false'; anything else is an error
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError(f'{field} must be true or false, not {value!r}')
+
+
+# --- Export ---
+
+def export_batches(after_id=0, batch_size=500):
+    """Yield (last_blog_id, lines) for each batch of blogs with id > after_id, in id order."""
+    blogs = db.session.execute(
+        select(Blog.id, User.username, Blog.title, Blog.content, Blog.category, Blog.timestamp,
+               Blog.is_draft, Blog.is_archived, Blog.view_count)
+        .join(User, Blog.user_id == User.id)
+        .where(Blog.id > after_id)
+        .order_by(Blog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for batch in blogs.partitions():
+        ids = [row.id for row in batch]
+
+        tags = defaultdict(list)
+        for blog_id, name in db.session.execute(
+            select(blog_tags.c.blog_id, Tag.name)
+            .join(Tag, Tag.id == blog_tags.c.tag_id)
+            .where(blog_tags.c.blog_id.in_(ids))
+            .order_by(blog_tags.c.blog_id, Tag.name)
+        ):
+            tags[blog_id].append(name)
+
+        likes = defaultdict(list)
+        for blog_id, username, timestamp in db.session.execute(
+            select(Like.blog_id, User.username, Like.timestamp)
+            .join(User, Like.user_id == User.id)
+            .where(Like.blog_id.in_(ids))
+            .order_by(Like.blog_id, Like.id)
+        ):
+            likes[blog_id].append({'user': username, 'timestamp': _isoformat(timestamp)})
+
+        comments = defaultdict(list)
+        for row in db.session.execute(
+            select(Comment.blog_id, Comment.id, Comment.parent_id, User.username, Comment.content, Comment.timestamp)
+            .join(User, Comment.user_id == User.id)
+            .where(Comment.blog_id.in_(ids))
+            .order_by(Comment.blog_id, Comment.id)
+        ):
+            comments[row.blog_id].append({
+                'id': row.id,
+                'parent_id': row.parent_id,
+                'author': row.username,
+                'content': row.content,
+                'timestamp': _isoformat(row.timestamp)
+            })
+
+        lines = []
+        for row in batch:
+            record = {
+                'id': row.id,
+                'author': row.username,
+                'title': row.title,
+                'content': row.content,
+                'category': row.category,
+                'timestamp': _isoformat(row.timestamp),
+                'is_draft': bool(row.is_draft),
+                'is_archived': bool(row.is_archived),
+                'view_count': row.view_count,
+                'tags': tags[row.id],
+                'likes': likes[row.id],
+                'comments': comments[row.id]
+            }
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        yield ids[-1], lines
+
+
+# --- Import ---
+
+def _user_ids(usernames):
+    ids = {}
+    for chunk in _chunks(usernames):
+        ids.update(db.session.execute(select(User.username, User.id).where(User.username.in_(chunk))).all())
+    return ids
+
+
+def import_batch(records, stats):
+    """Insert a batch of (line_number, record) in the caller's transaction.
+
+    Invalid records and blogs by unknown authors are counted in stats and
+    skipped; likes and comments by unknown users are dropped.
+    """
+    usernames = set()
+    for _, record in records:
+        usernames.add(record.get('author'))
+        usernames.update(like.get('user') for like in _objects(record.get('likes')))
+        usernames.update(comment.get('author') for comment in _objects(record.get('comments')))
+    usernames.discard(None)
+    user_ids = _user_ids(usernames)
+
+    accepted, blog_rows = [], []
+    for line_number, record in records:
+        try:
+            title, content = record.get('title'), record.get('content')
+            if not title or not content:
+                raise ValueError('title and content are required')
+            if record.get('author') not in user_ids:
+                raise ValueError(f"unknown author {record.get('author')!r}")
+            row = {
+                'title': title,
+                'content': content,
+                'user_id': user_ids[record['author']],
+                'category': (record.get('category') or '').lower() or None,
+                'timestamp': _parse_time(record.get('timestamp')),
+                'is_draft': _parse_bool(record.get('is_draft'), 'is_draft'),
+                'is_archived': _parse_bool(record.get('is_archived'), 'is_archived'),
+                'view_count': int(record.get('view_count') or 0)
+            }
+            row.update(content_fields(content))
+
+            likes = {}
+            for like in _objects(record.get('likes')):
+                user_id = user_ids.get(like.get('user'))
+                if user_id is not None:
+                    likes.setdefault(user_id, _parse_time(like.get('timestamp')))
+            comments = []
+            for comment in _objects(record.get('comments')):
+                if comment.get('content') and comment.get('author') in user_ids:
+                    comments.append(dict(comment, timestamp=_parse_time(comment.get('timestamp'))))
+        except (TypeError, ValueError, AttributeError) as e:
+            _record_error(stats, line_number, str(e))
+            continue
+        stats['dropped'] += (len(_objects(record.get('likes'))) - len(likes)
+                             + len(_objects(record.get('comments'))) - len(comments))
+
+        row['like_count'] = len(likes)
+        row['comment_count'] = len(comments)
+        blog_rows.append(row)
+        accepted.append((record, likes, comments))
+
+    if not blog_rows:
+        return
+    blog_table = Blog.__table__
+    blog_ids = db.session.execute(
+        insert(blog_table).returning(blog_table.c.id, sort_by_parameter_order=True), blog_rows
+    ).scalars().all()
+
+    tag_names = {}
+    for blog_id, (record, _, _) in zip(blog_ids, accepted):
+        tag_names[blog_id] = normalize_tags(record.get('tags'))
+    tag_ids = resolve_tag_ids(sorted({name for names in tag_names.values() for name in names}))
+    tag_rows = [{'blog_id': blog_id, 'tag_id': tag_ids[name]}
+                for blog_id, names in tag_names.items() for name in names]
+    if tag_rows:
+        db.session.execute(insert(blog_tags), tag_rows)
+
+    like_rows = [{'blog_id': blog_id, 'user_id': user_id, 'timestamp': timestamp}
+                 for blog_id, (_, likes, _) in zip(blog_ids, accepted) for user_id, timestamp in likes.items()]
+    if like_rows:
+        db.session.execute(insert(Like.__table__), like_rows)
+
+    # Comments go in without parents first, then replies are pointed at the
+    # new ids of the comments they answered
+    comment_rows, sources = [], []
+    for blog_id, (_, _, comments) in zip(blog_ids, accepted):
+        for comment in comments:
+            comment_rows.append({
+                'blog_id': blog_id,
+                'user_id': user_ids[comment['author']],
+                'content': comment['content'],
+                'timestamp': comment['timestamp']
+            })
+            sources.append((blog_id, comment.get('id'), comment.get('parent_id')))
+    if comment_rows:
+        comment_table = Comment.__table__
+        comment_ids = db.session.execute(
+            insert(comment_table).returning(comment_table.c.id, sort_by_parameter_order=True), comment_rows
+        ).scalars().all()
+        new_ids = {(blog_id, old_id): new_id for (blog_id, old_id, _), new_id in zip(sources, comment_ids)}
+        parents = [{'c_id': new_id, 'c_parent': new_ids[(blog_id, parent_id)]}
+                   for (blog_id, _, parent_id), new_id in zip(sources, comment_ids)
+                   if parent_id is not None and (blog_id, parent_id) in new_ids]
+        if parents:
+            db.session.execute(
+                update(comment_table).where(comment_table.c.id == bindparam('c_id'))
+                                     .values(parent_id=bindparam('c_parent')),
+                parents
+            )
+
+    index_blog_rows([
+        {'id': blog_id, 'title': row['title'], 'content': row['content'], 'tags': ' '.join(tag_names[blog_id])}
+        for blog_id, row in zip(blog_ids, blog_rows) if not row['is_draft'] and not row['is_archived']
+    ])
+    bump_versions('blogs', 'trending', *{f"user:{row['user_id']}" for row in blog_rows})
+    stats['imported'] += len(blog_rows)
+
+
+def _record_error(stats, line_number, message):
+    stats['failed'] += 1
+    if len(stats['errors']) < MAX_REPORTED_ERRORS:
+        stats['errors'].append({'line': line_number, 'error': message})
+
+
+def _import_chunk(records, stats):
+    """import_batch in a savepoint; a chunk the database rejects is retried a record at a time.
+
+    Records that still fail are counted in stats['rejected'] and skipped,
+    so one bad record cannot abort the import.
+    """
+    before = dict(stats, errors=list(stats['errors']))
+    try:
+        with db.session.begin_nested():
+            import_batch(records, stats)
+        return
+    except SQLAlchemyError as e:
+        stats.clear()
+        stats.update(before)
+        error = e
+    if len(records) > 1:
+        for record in records:
+            _import_chunk([record], stats)
+        return
+    line_number = records[0][0]
+    current_app.logger.warning('Import: line %d rejected by the database: %s', line_number, error)
+    stats['rejected'] += 1
+    if len(stats['errors']) < MAX_REPORTED_ERRORS:
+        stats['errors'].append({'line': line_number, 'error': 'rejected by the database'})
+
+
+def import_stream(lines, batch_size=1000, skip=0, start_line=0, start_offset=0, on_batch=None):
+    """Import NDJSON lines (bytes), committing every batch_size blogs.
+
+    The first `skip` lines are passed over. After each commit on_batch(stats)
+    is called; stats['lines'] and stats['offset'] then point just past the
+    last committed line. Returns the final stats.
+    """
+    stats = {'lines': start_line, 'offset': start_offset, 'imported': 0, 'failed': 0, 'rejected': 0, 'dropped': 0,
+             'errors': []}
+    started = time.perf_counter()
+    batch = []
+
+    def flush():
+        if batch:
+            _import_chunk(list(batch), stats)
+            batch.clear()
+        db.session.commit()
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        if on_batch:
+            on_batch(stats)
+
+    for raw in lines:
+        stats['lines'] += 1
+        stats['offset'] += len(raw)
+        if stats['lines'] <= skip or not raw.strip():
+            continue
+        try:
+            record = json.loads(raw)
+            if not isinstance(record, dict):
+                raise ValueError('expected a JSON object')
+        except ValueError as e:
+            _record_error(stats, stats['lines'], f'invalid JSON: {e}')
+            continue
+        batch.append((stats['lines'], record))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return stats
+
+
+# --- HTTP ---
+
+@bulk_bp.route('/api/admin/blogs/export', methods=['GET'])
+@admin_required
+def export_blogs():
+    """Stream every blog with tags, likes and comments as NDJSON (resume with ?after_id=)"""
+    after_id = request.args.get('after_id', 0, type=int)
+    batch_size = request.args.get('batch_size', current_app.config['BULK_EXPORT_BATCH_SIZE'], type=int)
+    if batch_size < 1:
+        return jsonify({'error': 'batch_size must be 1 or greater'}), 400
+
+    def generate():
+        for _, lines in export_batches(after_id, batch_size):
+            yield ''.join(lines)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bulk_bp.route('/api/admin/blogs/import', methods=['POST'])
+@admin_required
+def import_blogs():
+    """Import blogs from an NDJSON request body (resume with ?skip=<lines>)"""
+    skip = request.args.get('skip', 0, type=int)
+    batch_size = request.args.get('batch_size', current_app.config['BULK_IMPORT_BATCH_SIZE'], type=int)
+    if batch_size < 1:
+        return jsonify({'error': 'batch_size must be 1 or greater'}), 400
+
+    stats = import_stream(request.stream, batch_size=batch_size, skip=skip)
+    stats.pop('offset')
+    return jsonify(stats), 200
+
+
+# --- CLI ---
+
+def _load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def _save_checkpoint(path, data):
+    if not path:
+        return
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f)
+    os.replace(path + '.tmp', path)
+
+
+@click.command('export-blogs')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--batch-size', type=int, help='Blogs per batch [default: BULK_EXPORT_BATCH_SIZE]')
+@click.option('--after-id', default=0, show_default=True, help='Only export blogs with a larger id')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Resume file, updated after every batch')
+@with_appcontext
+def export_blogs_command(output, batch_size, after_id, checkpoint):
+    """Export blogs with tags, likes and comments to an NDJSON file ('-' for stdout)."""
+    batch_size = batch_size or current_app.config['BULK_EXPORT_BATCH_SIZE']
+    state = _load_checkpoint(checkpoint)
+    if output == '-':
+        out = sys.stdout.buffer
+    elif state:
+        # Drop anything written after the last checkpoint, then append
+        out = open(output, 'r+b')
+        out.truncate(state['offset'])
+        out.seek(state['offset'])
+        after_id = state['after_id']
+    else:
+        out = open(output, 'wb')
+
+    exported = state['exported'] if state else 0
+    started = time.perf_counter()
+    try:
+        for last_id, lines in export_batches(after_id, batch_size):
+            out.write(''.join(lines).encode('utf-8'))
+            out.flush()
+            exported += len(lines)
+            offset = out.tell() if output != '-' else 0
+            _save_checkpoint(checkpoint, {'after_id': last_id, 'offset': offset, 'exported': exported})
+            rate = exported / max(time.perf_counter() - started, 1e-9)
+            click.echo(f'Exported {exported} blog(s) (last id {last_id}, {rate:.0f}/s)', err=True)
+    finally:
+        if output != '-':
+            out.close()
+    click.echo(f'Export complete: {exported} blog(s)', err=True)
+
+
+@click.command('import-blogs')
+@click.argument('source', type=click.Path(dir_okay=False, allow_dash=True, exists=True))
+@click.option('--batch-size', type=int, help='Blogs per transaction [default: BULK_IMPORT_BATCH_SIZE]')
+@click.option('--checkpoint', type=click.Path(dir_okay=False), help='Resume file, updated after every batch')
+@with_appcontext
+def import_blogs_command(source, batch_size, checkpoint):
+    """Import blogs from an NDJSON file ('-' for stdin) written by export-blogs."""
+    batch_size = batch_size or current_app.config['BULK_IMPORT_BATCH_SIZE']
+    state = _load_checkpoint(checkpoint) or {'lines': 0, 'offset': 0, 'imported': 0}
+    if source == '-':
+        if state['lines']:
+            raise click.UsageError('--checkpoint can only resume a file, not stdin')
+        stream = sys.stdin.buffer
+    else:
+        stream = open(source, 'rb')
+        stream.seek(state['offset'])
+
+    imported_before = state['imported']
+
+    def progress(stats):
+        imported = imported_before + stats['imported']
+        _save_checkpoint(checkpoint, {'lines': stats['lines'], 'offset': stats['offset'], 'imported': imported})
+        rate = stats['imported'] / max(stats['seconds'], 1e-9)
+        click.echo(f"Line {stats['lines']}: {imported} imported, {stats['failed']} failed ({rate:.0f}/s)", err=True)
+
+    try:
+        stats = import_stream(stream, batch_size=batch_size, start_line=state['lines'],
+                              start_offset=state['offset'], on_batch=progress)
+    finally:
+        if source != '-':
+            stream.close()
+
+    for error in stats['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Import complete: {imported_before + stats['imported']} blog(s) imported, {stats['failed']} failed, "
+               f"{stats['rejected']} rejected by the database, {stats['dropped']} like(s)/comment(s) by unknown users dropped")
+    click.echo('Run `flask rebuild-feeds` and `flask rebuild-trending` to include the imported blogs')
@@ -0,0 +1,160 @@
+# app/caching.py
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .models import db, VersionStamp
+from .utils import dialect_insert
+
+# HTTP conditional GET for public read endpoints.
+#
+# Every write bumps a version stamp for each entity it affects ('blogs',
+# 'user:42', 'follows:42', ...). Per-entity stamps are bumped inside the
+# write's transaction; the site-wide ones ('blogs', 'trending'), which every
+# blog write touches, are bumped in a short transaction of their own right
+# after the commit, so concurrent writers do not queue on those rows for
+# the length of each other's transactions. A read endpoint
+# wrapped in @conditional names the stamps its response depends on; the
+# strong ETag is a hash of the request URL and those versions, and
+# Last-Modified is the newest stamp's time. Comparing them against
+# If-None-Match / If-Modified-Since costs one indexed lookup on
+# version_stamp, so a 304 never reaches the view's queries.
+#
+# Cache-Control is chosen per blueprint from HTTP_CACHE_CONTROL so a CDN or
+# reverse proxy can serve repeat traffic and revalidate cheaply.
+
+
+def _upsert_versions(connection, keys):
+    keys = sorted(set(keys))  # fixed lock order between concurrent writers
+    if not keys:
+        return
+    now = datetime.utcnow()
+    statement = dialect_insert(VersionStamp.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['key'],
+        set_={
+            'version': VersionStamp.__table__.c.version + 1,
+            'updated_at': statement.excluded.updated_at
+        }
+    )
+    connection.execute(statement, [{'key': key, 'version': 1, 'updated_at': now} for key in keys])
+
+
+def bump_versions(*keys):
+    """Advance the version of each key once the caller's transaction commits.
+
+    Keys naming one entity ('user:42') are bumped in that transaction;
+    site-wide keys (no ':') right after it commits.
+    """
+    shared = {key for key in keys if ':' not in key}
+    _upsert_versions(db.session, [key for key in keys if ':' in key])
+    if shared:
+        db.session.info.setdefault('bump_after_commit', set()).update(shared)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_after_commit(session):
+    if session.in_nested_transaction():
+        return  # a savepoint was released; wait for the real commit
+    keys = session.info.pop('bump_after_commit', None)
+    if keys:
+        # The session cannot run SQL here, so use a connection of its own,
+        # on the primary even when a GET has pinned the session to a replica
+        with db.engine.begin() as connection:
+            _upsert_versions(connection, keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    if not session.in_nested_transaction():
+        session.info.pop('bump_after_commit', None)
+
+
+def blog_version_keys(blog, deleted=False):
+    """Stamps affected by creating, editing, publishing, archiving or deleting a blog."""
+    keys = ['blogs', 'trending', f'user:{blog.user_id}']
+    if deleted:
+        keys.append(f'likes:blog:{blog.id}')
+    return keys
+
+
+def get_versions(keys):
+    """Return {key: (version, updated_at)} for the keys that have been bumped."""
+    if not keys:
+        return {}
+    rows = db.session.query(VersionStamp.key, VersionStamp.version, VersionStamp.updated_at)\
+                     .filter(VersionStamp.key.in_(keys)).all()
+    return {key: (version, updated_at) for key, version, updated_at in rows}
+
+
+def cache_control_for(blueprint):
+    policies = current_app.config['HTTP_CACHE_CONTROL']
+    return policies.get(blueprint, policies.get('default'))
+
+
+def _make_etag(keys, versions, static_tag, window_start):
+    parts = [request.full_path, static_tag or '']
+    parts.extend(f'{key}={versions.get(key, (0, None))[0]}' for key in sorted(keys))
+    if window_start:
+        parts.append(f'window={window_start.timestamp():.0f}')
+    return hashlib.blake2b('\n'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since and uses
+        # the weak comparison (RFC 9110 13.1.2, 13.2.2)
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional(keys=None, static_tag=None, window=None):
+    """Serve a GET view with ETag/Last-Modified validators and 304 responses.
+
+    keys(**view_args) returns the version stamp keys the response depends
+    on. static_tag covers responses that only change with a deploy. window
+    names a config setting in seconds: the (then weak) ETag also rolls over
+    that often, for responses like trending that drift without a write.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['HTTP_CACHE_ENABLED']:
+                return view(*args, **kwargs)
+
+            stamp_keys = list(keys(**kwargs)) if keys else []
+            versions = get_versions(stamp_keys)
+            window_start = None
+            if window:
+                seconds = current_app.config[window]
+                window_start = datetime.fromtimestamp(time.time() // seconds * seconds, timezone.utc)
+            etag = _make_etag(stamp_keys, versions, static_tag, window_start)
+
+            modified = [updated_at.replace(tzinfo=timezone.utc) for _, updated_at in versions.values()]
+            if window_start:
+                modified.append(window_start)
+            last_modified = max(modified, default=None)
+
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            # Windowed responses may differ byte-wise within a window, so
+            # their validator is only weak
+            response.set_etag(etag, weak=window_start is not None)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            policy = cache_control_for(request.blueprint)
+            if policy:
+                response.headers['Cache-Control'] = policy
+            return response
+        return wrapper
+    return decorator
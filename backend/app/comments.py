@@ -1,7 +1,15 @@
 # app/comments.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only
 from .models import db, Comment, Blog, User, CommentLike
+from .counters import bump_blog_counter
+from .trending import record_event
+from .pagination import keyset_page, cursor_pagination
+from .instrumentation import query_budget
+from .likes import toggle_comment_like_row
+from .fieldsets import select_fields
 from datetime import datetime
 
 comments_bp = Blueprint('comments', __name__)
@@ -42,6 +50,8 @@ def add_comment(blog_id):
         parent_id=parent_id
     )
     db.session.add(comment)
+    bump_blog_counter(blog_id, 'comment_count', 1)
+    record_event(blog_id, 'comment')
     db.session.commit()
 
     # Return the created comment with user info
@@ -76,17 +86,22 @@ def delete_comment(comment_id):
         Comment.query.filter_by(parent_id=comment.id).delete()
         message = f'Comment and {replies_count} replies deleted'
     else:
+        replies_count = 0
         message = 'Reply deleted'
 
     db.session.delete(comment)
+    bump_blog_counter(comment.blog_id, 'comment_count', -(replies_count + 1))
     db.session.commit()
     
     return jsonify({'message': message}), 200
 
 
 @comments_bp.route('/blog/<int:blog_id>', methods=['GET'])
+@query_budget(10)
 def get_comments(blog_id):
     """Get comments for a blog with pagination and proper nesting"""
+    # ?fields= applies to comments and their inline replies alike
+    selection = select_fields(COMMENT_FIELDS, embeds=('user', 'replies'))
     blog = Blog.query.get_or_404(blog_id)
     
     # Pagination parameters
@@ -95,67 +110,24 @@ def get_comments(blog_id):
     per_page = min(per_page, 50)  # Limit to prevent abuse
     
     # Get only parent comments (not replies) with pagination
-    paginated_comments = Comment.query.filter_by(
+    query = Comment.query.options(*_comment_loaders(selection)).filter_by(
         blog_id=blog.id, 
         parent_id=None
-    ).order_by(Comment.timestamp.desc()).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
     )
 
-    def serialize_comment(comment, current_user_id=None):
-        """Serialize comment with all necessary info"""
-        # Get replies (limited to prevent overload)
-        replies = Comment.query.filter_by(parent_id=comment.id)\
-                              .order_by(Comment.timestamp.asc())\
-                              .limit(10).all()  # Show first 10 replies
-        
-        total_replies = Comment.query.filter_by(parent_id=comment.id).count()
-        
-        return {
-            'id': comment.id,
-            'content': comment.content,
-            'user': {
-                'id': comment.user.id,
-                'username': comment.user.username
-            },
-            'timestamp': comment.timestamp.isoformat(),
-            'likes': comment.like_count,
-            'is_liked': _is_comment_liked(comment.id, current_user_id) if current_user_id else False,
-            'replies_count': total_replies,
-            'replies': [serialize_reply(reply, current_user_id) for reply in replies],
-            'has_more_replies': total_replies > 10
-        }
-
-    def serialize_reply(reply, current_user_id=None):
-        """Serialize reply comment"""
-        return {
-            'id': reply.id,
-            'content': reply.content,
-            'user': {
-                'id': reply.user.id,
-                'username': reply.user.username
-            },
-            'timestamp': reply.timestamp.isoformat(),
-            'likes': reply.like_count,
-            'is_liked': _is_comment_liked(reply.id, current_user_id) if current_user_id else False,
-            'parent_id': reply.parent_id
-        }
-
-    # Check if user is authenticated to show like status
-    current_user_id = None
-    try:
-        current_user_id = get_jwt_identity()
-    except:
-        pass  # User not authenticated
-
-    comments_data = [serialize_comment(comment, current_user_id) 
-                    for comment in paginated_comments.items]
-
-    return jsonify({
-        'comments': comments_data,
-        'pagination': {
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        comments, next_cursor = keyset_page(query, [Comment.timestamp, Comment.id], cursor, per_page,
+                                            lambda comment: (comment.timestamp, comment.id))
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_comments = query.order_by(Comment.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        comments = paginated_comments.items
+        pagination = {
             'page': paginated_comments.page,
             'per_page': paginated_comments.per_page,
             'total': paginated_comments.total,
@@ -163,48 +135,67 @@ def get_comments(blog_id):
             'has_next': paginated_comments.has_next,
             'has_prev': paginated_comments.has_prev
         }
+
+    # Assemble the page's threads with a fixed number of queries: the top
+    # replies per parent, reply counts, like counts and the viewer's likes.
+    # Each is skipped when none of the keys it feeds were asked for.
+    parent_ids = [comment.id for comment in comments]
+    replies = _top_replies(parent_ids, REPLY_PREVIEW_LIMIT, selection) if 'replies' in selection else []
+    if 'replies_count' in selection or 'has_more_replies' in selection:
+        reply_counts = _reply_counts(parent_ids)
+    else:
+        reply_counts = {}
+
+    comment_ids = parent_ids + [reply.id for reply in replies]
+    like_counts = _like_counts(comment_ids) if 'likes' in selection else {}
+    liked_ids = _liked_comment_ids(comment_ids, _current_user_id()) if 'is_liked' in selection else set()
+
+    replies_by_parent = {}
+    for reply in replies:
+        replies_by_parent.setdefault(reply.parent_id, []).append(reply)
+
+    comments_data = []
+    for comment in comments:
+        total_replies = reply_counts.get(comment.id, 0)
+        comments_data.append(_select({
+            'id': comment.id,
+            'content': lambda: comment.content,
+            'user': lambda: {
+                'id': comment.user.id,
+                'username': comment.user.username
+            },
+            'timestamp': lambda: comment.timestamp.isoformat(),
+            'likes': lambda: like_counts.get(comment.id, 0),
+            'is_liked': lambda: comment.id in liked_ids,
+            'replies_count': lambda: total_replies,
+            'replies': lambda: [_serialize_reply(reply, like_counts, liked_ids, selection)
+                                for reply in replies_by_parent.get(comment.id, [])],
+            'has_more_replies': lambda: total_replies > REPLY_PREVIEW_LIMIT
+        }, selection))
+
+    return jsonify({
+        'comments': comments_data,
+        'pagination': pagination
     }), 200
 
 @comments_bp.route('/<int:comment_id>/like', methods=['POST'])
 @jwt_required()
 def like_comment(comment_id):
     """Like or unlike a comment"""
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     comment = Comment.query.get_or_404(comment_id)
-    
-    # Check if already liked
-    existing_like = CommentLike.query.filter_by(
-        user_id=user_id, 
-        comment_id=comment_id
-    ).first()
-    
-    if existing_like:
-        # Unlike the comment
-        db.session.delete(existing_like)
-        db.session.commit()
-        return jsonify({
-            'message': 'Comment unliked',
-            'liked': False,
-            'likes_count': comment.like_count
-        }), 200
-    else:
-        # Like the comment
-        like = CommentLike(
-            user_id=user_id,
-            comment_id=comment_id,
-            blog_id=comment.blog_id
-        )
-        db.session.add(like)
-        db.session.commit()
-        return jsonify({
-            'message': 'Comment liked',
-            'liked': True,
-            'likes_count': comment.like_count
-        }), 200
+
+    liked = toggle_comment_like_row(user_id, comment)
+    return jsonify({
+        'message': 'Comment liked' if liked else 'Comment unliked',
+        'liked': liked,
+        'likes_count': _like_counts([comment_id]).get(comment_id, 0)
+    }), 200
 
 @comments_bp.route('/<int:comment_id>/replies', methods=['GET'])
 def get_comment_replies(comment_id):
     """Get more replies for a specific comment (load more functionality)"""
+    selection = select_fields(REPLY_FIELDS, embeds=('user',))
     comment = Comment.query.get_or_404(comment_id)
     
     # Pagination for replies
@@ -212,40 +203,22 @@ def get_comment_replies(comment_id):
     per_page = request.args.get('per_page', 10, type=int)
     per_page = min(per_page, 20)
     
-    paginated_replies = Comment.query.filter_by(parent_id=comment_id)\
-                                   .order_by(Comment.timestamp.asc())\
-                                   .paginate(
-                                       page=page,
-                                       per_page=per_page,
-                                       error_out=False
-                                   )
-    
-    # Check if user is authenticated
-    current_user_id = None
-    try:
-        current_user_id = get_jwt_identity()
-    except:
-        pass
-    
-    def serialize_reply(reply):
-        return {
-            'id': reply.id,
-            'content': reply.content,
-            'user': {
-                'id': reply.user.id,
-                'username': reply.user.username
-            },
-            'timestamp': reply.timestamp.isoformat(),
-            'likes': reply.like_count,
-            'is_liked': _is_comment_liked(reply.id, current_user_id) if current_user_id else False,
-            'parent_id': reply.parent_id
-        }
-    
-    replies_data = [serialize_reply(reply) for reply in paginated_replies.items]
-    
-    return jsonify({
-        'replies': replies_data,
-        'pagination': {
+    query = Comment.query.options(*_comment_loaders(selection)).filter_by(parent_id=comment_id)
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        replies, next_cursor = keyset_page(query, [Comment.timestamp, Comment.id], cursor, per_page,
+                                           lambda reply: (reply.timestamp, reply.id), descending=False)
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_replies = query.order_by(Comment.timestamp.asc())\
+                                 .paginate(
+                                     page=page,
+                                     per_page=per_page,
+                                     error_out=False
+                                 )
+        replies = paginated_replies.items
+        pagination = {
             'page': paginated_replies.page,
             'per_page': paginated_replies.per_page,
             'total': paginated_replies.total,
@@ -253,6 +226,17 @@ def get_comment_replies(comment_id):
             'has_next': paginated_replies.has_next,
             'has_prev': paginated_replies.has_prev
         }
+    
+    # Check if user is authenticated
+    reply_ids = [reply.id for reply in replies]
+    like_counts = _like_counts(reply_ids) if 'likes' in selection else {}
+    liked_ids = _liked_comment_ids(reply_ids, _current_user_id()) if 'is_liked' in selection else set()
+
+    replies_data = [_serialize_reply(reply, like_counts, liked_ids, selection) for reply in replies]
+    
+    return jsonify({
+        'replies': replies_data,
+        'pagination': pagination
     }), 200
 
 @comments_bp.route('/<int:comment_id>', methods=['PUT'])
@@ -289,10 +273,99 @@ def edit_comment(comment_id):
         }
     }), 200
 
-def _is_comment_liked(comment_id, user_id):
-    """Helper function to check if user liked a comment"""
-    if not user_id:
-        return False
-    return CommentLike.query.filter_by(comment_id=comment_id, user_id=user_id).first() is not None
+# ---------- Thread loading helpers ----------
+
+REPLY_PREVIEW_LIMIT = 10  # Replies shown inline under each top-level comment
+
+# Plain keys of listed replies and comments, for ?fields=
+REPLY_FIELDS = ('id', 'content', 'timestamp', 'likes', 'is_liked')
+COMMENT_FIELDS = REPLY_FIELDS + ('replies_count', 'has_more_replies')
+
+def _comment_loaders(selection):
+    """Loader options for the comment columns and author a selection needs"""
+    options = []
+    if selection.partial:
+        # Ordering, keyset and threading columns are always needed
+        columns = [Comment.id, Comment.timestamp, Comment.parent_id]
+        if 'content' in selection:
+            columns.append(Comment.content)
+        if 'user' in selection:
+            columns.append(Comment.user_id)
+        options.append(load_only(*columns))
+    if 'user' in selection:
+        options.append(joinedload(Comment.user).load_only(User.id, User.username))
+    return options
+
+def _select(values, selection):
+    """Keep the requested keys of values, calling the deferred ones"""
+    return {key: value() if callable(value) else value
+            for key, value in values.items() if key in selection}
+
+def _current_user_id():
+    """Id of the caller if a valid token was sent, otherwise None"""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        return int(identity) if identity is not None else None
+    except Exception:
+        return None  # User not authenticated
+
+def _top_replies(parent_ids, limit, selection):
+    """First `limit` replies of every parent, oldest first, in one windowed query"""
+    if not parent_ids:
+        return []
+    position = func.row_number().over(
+        partition_by=Comment.parent_id,
+        order_by=(Comment.timestamp.asc(), Comment.id.asc())
+    ).label('position')
+    ranked = db.session.query(Comment.id.label('id'), position)\
+                       .filter(Comment.parent_id.in_(parent_ids))\
+                       .subquery()
+    return Comment.query.options(*_comment_loaders(selection))\
+                        .join(ranked, ranked.c.id == Comment.id)\
+                        .filter(ranked.c.position <= limit)\
+                        .order_by(Comment.parent_id, Comment.timestamp.asc(), Comment.id.asc())\
+                        .all()
+
+def _reply_counts(parent_ids):
+    """Return {parent_id: number of replies}"""
+    if not parent_ids:
+        return {}
+    rows = db.session.query(Comment.parent_id, func.count(Comment.id))\
+                     .filter(Comment.parent_id.in_(parent_ids))\
+                     .group_by(Comment.parent_id).all()
+    return dict(rows)
+
+def _like_counts(comment_ids):
+    """Return {comment_id: number of likes}"""
+    if not comment_ids:
+        return {}
+    rows = db.session.query(CommentLike.comment_id, func.count(CommentLike.id))\
+                     .filter(CommentLike.comment_id.in_(comment_ids))\
+                     .group_by(CommentLike.comment_id).all()
+    return dict(rows)
 
+def _liked_comment_ids(comment_ids, user_id):
+    """Subset of comment_ids the user has liked"""
+    if not user_id or not comment_ids:
+        return set()
+    rows = db.session.query(CommentLike.comment_id)\
+                     .filter(CommentLike.user_id == user_id, CommentLike.comment_id.in_(comment_ids))\
+                     .all()
+    return {row[0] for row in rows}
 
+def _serialize_reply(reply, like_counts, liked_ids, selection):
+    """Serialize reply comment"""
+    data = _select({
+        'id': reply.id,
+        'content': lambda: reply.content,
+        'user': lambda: {
+            'id': reply.user.id,
+            'username': reply.user.username
+        },
+        'timestamp': lambda: reply.timestamp.isoformat(),
+        'likes': lambda: like_counts.get(reply.id, 0),
+        'is_liked': lambda: reply.id in liked_ids
+    }, selection)
+    data['parent_id'] = reply.parent_id
+    return data
@@ -0,0 +1,246 @@
+# app/compression.py
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # br is offered only when the brotli package is installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # likewise zstd and the zstandard package
+    zstandard = None
+
+# Response compression negotiated on Accept-Encoding.
+#
+# After each request, a compressible response (COMPRESS_MIMETYPES, at least
+# COMPRESS_MIN_SIZE bytes, no Content-Encoding or no-transform yet) is
+# encoded with the client's most preferred encoding, ties going to the
+# order of COMPRESS_ALGORITHMS, and every such response gets Vary:
+# Accept-Encoding. Streamed responses (the bulk NDJSON export) go through
+# a streaming compressor flushed after each chunk, so batches still arrive
+# as they are produced.
+#
+# Responses carrying an ETag (the @conditional endpoints, the OpenAPI
+# document, static files) keep their compressed bytes in a per-process LRU
+# bounded by COMPRESS_CACHE_MAX_BYTES, keyed by ETag and encoding: each
+# representation is compressed once, at the higher COMPRESS_CACHED_*
+# levels, rather than on every request. A compressed representation's ETag
+# is made weak, as nginx does, so revalidating with it still matches the
+# view's strong ETag and yields a 304; that 304 gets the same weak ETag and
+# Vary as the compressed 200 it stands for.
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)  # 31: gzip header and trailer
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def stream(self, chunks):
+        compressor = self.compressor.compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_encoders(config, cached=False):
+    """{encoding: encoder} for COMPRESS_ALGORITHMS whose library is installed, in preference order.
+
+    cached picks the COMPRESS_CACHED_* levels, for bodies compressed once.
+    """
+    prefix = 'COMPRESS_CACHED_' if cached else 'COMPRESS_'
+    factories = {'gzip': lambda: GzipEncoder(config[prefix + 'GZIP_LEVEL'])}
+    if brotli is not None:
+        factories['br'] = lambda: BrotliEncoder(config[prefix + 'BROTLI_QUALITY'])
+    if zstandard is not None:
+        factories['zstd'] = lambda: ZstdEncoder(config[prefix + 'ZSTD_LEVEL'])
+    names = [name.strip() for name in config['COMPRESS_ALGORITHMS'].split(',')]
+    return {name: factories[name]() for name in names if name in factories}
+
+
+class CompressedCache:
+    """Compressed bodies by (ETag, encoding), least recently used evicted past max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def _compressible(response, mimetypes):
+    if not 200 <= response.status_code < 300 or response.status_code in (204, 206):
+        return False
+    if 'Content-Encoding' in response.headers or response.mimetype not in mimetypes:
+        return False
+    return 'no-transform' not in response.headers.get('Cache-Control', '')
+
+
+def _read_body(response):
+    # Whole body of a buffered or streamed (e.g. send_file) response
+    if not response.is_streamed:
+        return response.get_data()
+    iterable = response.response
+    try:
+        return b''.join(response.iter_encoded())
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def _close_after(chunks, iterable):
+    try:
+        yield from chunks
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+def compress_response(response, encoders, cached_encoders, cache, min_size, mimetypes):
+    """Encode response in place for the current request's Accept-Encoding."""
+    if not encoders:
+        return response
+    if response.status_code == 304:
+        # Describe the representation the 200 would have been: same
+        # Vary and, when it would have been compressed, the weak ETag
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag is not None and not weak and request.accept_encodings.best_match(list(encoders)) is not None:
+            response.set_etag(etag, weak=True)
+        return response
+    if not _compressible(response, mimetypes):
+        return response
+    response.vary.add('Accept-Encoding')
+    name = request.accept_encodings.best_match(list(encoders))
+    if name is None:
+        return response
+    length = response.content_length
+    if length is not None and length < min_size:
+        return response
+    encoder = encoders[name]
+
+    etag, weak = response.get_etag()
+    if etag is not None:
+        key = (etag, weak, name)
+        body = cache.get(key)
+        if body is None:
+            data = _read_body(response)
+            if len(data) < min_size:
+                response.set_data(data)
+                response.direct_passthrough = False
+                return response
+            body = cached_encoders[name].compress(data)
+            cache.put(key, body)
+        elif response.is_streamed and hasattr(response.response, 'close'):
+            response.response.close()  # not needed, but release the file
+        response.set_data(body)
+        response.direct_passthrough = False
+        response.set_etag(etag, weak=True)
+    elif response.is_streamed:
+        iterable = response.response
+        response.response = _close_after(encoder.stream(response.iter_encoded()), iterable)
+        response.headers.pop('Content-Length', None)
+        response.direct_passthrough = False
+    else:
+        response.set_data(encoder.compress(response.get_data()))
+
+    response.headers['Content-Encoding'] = name
+    response.headers.pop('Accept-Ranges', None)  # ranges would address the encoded bytes
+    return response
+
+
+def init_compression(app):
+    """Compress responses after every request; see the module comment."""
+    if not app.config['COMPRESS_ENABLED']:
+        return
+    encoders = available_encoders(app.config)
+    cached_encoders = available_encoders(app.config, cached=True)
+    cache = CompressedCache(app.config['COMPRESS_CACHE_MAX_BYTES'])
+    app.extensions['compressed_cache'] = cache
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    mimetypes = {mimetype.strip() for mimetype in app.config['COMPRESS_MIMETYPES'].split(',')}
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, encoders, cached_encoders, cache, min_size, mimetypes)
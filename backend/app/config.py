@@ -8,8 +8,15 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "secret-key")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///site.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Optional read replicas, comma separated; each becomes a bind (app/replicas.py)
+    DATABASE_REPLICA_URIS = [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    SQLALCHEMY_BINDS = {f'replica{i}': uri for i, uri in enumerate(DATABASE_REPLICA_URIS)}
     SECURITY_PASSWORD_SALT = os.getenv("SECURITY_PASSWORD_SALT", "my-secret-salt")
 
+    # 'production' skips db.create_all() and other startup writes (app/__init__.py)
+    STARTUP_MODE = os.getenv('STARTUP_MODE', 'development')
+
 
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.googlemail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -18,6 +25,17 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', 'your-email-password')
     MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@example.com')
 
+    # Email outbox (app/mailer.py)
+    MAIL_OUTBOX_ENABLED = os.getenv('MAIL_OUTBOX_ENABLED', 'true').lower() in ['true', 'on', '1']  # false sends inline
+    MAIL_OUTBOX_WORKERS = int(os.getenv('MAIL_OUTBOX_WORKERS', 2))
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 50))
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 5.0))  # seconds
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    MAIL_OUTBOX_BACKOFF_BASE = float(os.getenv('MAIL_OUTBOX_BACKOFF_BASE', 30))  # seconds, doubled per attempt
+    MAIL_OUTBOX_BACKOFF_MAX = float(os.getenv('MAIL_OUTBOX_BACKOFF_MAX', 3600))
+    MAIL_OUTBOX_CLAIM_TIMEOUT = int(os.getenv('MAIL_OUTBOX_CLAIM_TIMEOUT', 300))  # seconds before a claim is taken over
+    MAIL_OUTBOX_SMTP_IDLE_TIMEOUT = int(os.getenv('MAIL_OUTBOX_SMTP_IDLE_TIMEOUT', 60))
+
     FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:3000')
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     SESSION_COOKIE_SECURE = True
@@ -30,3 +48,123 @@ class Config:
     JWT_TOKEN_LOCATION = ["headers"]
     JWT_HEADER_NAME = "Authorization"
     JWT_HEADER_TYPE = "Bearer"
+
+    # Password hashing (app/passwords.py). Unset BCRYPT_LOG_ROUNDS to calibrate
+    # the cost at startup so one hash takes about BCRYPT_TARGET_MS.
+    BCRYPT_LOG_ROUNDS = int(os.environ['BCRYPT_LOG_ROUNDS']) if os.getenv('BCRYPT_LOG_ROUNDS') else None
+    BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 250))
+    BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', 10))
+    BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.getenv('PASSWORD_HASH_WORKERS') else None  # default: one per CPU, 0 = inline
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))  # beyond this, 503
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10.0))  # seconds
+    PASSWORD_HASH_START_METHOD = os.getenv('PASSWORD_HASH_START_METHOD', 'fork')
+
+    # Write-behind view tracking (app/view_tracking.py)
+    VIEW_BUFFER_ENABLED = os.getenv('VIEW_BUFFER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    VIEW_FLUSH_BATCH_SIZE = int(os.getenv('VIEW_FLUSH_BATCH_SIZE', 500))
+    VIEW_FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', 2.0))  # seconds
+    VIEW_MAX_UNFLUSHED = int(os.getenv('VIEW_MAX_UNFLUSHED', 5000))  # loss budget
+    VIEW_DEDUPE_WINDOW = int(os.getenv('VIEW_DEDUPE_WINDOW', 3600))  # seconds
+    VIEW_DEDUPE_MAX_ENTRIES = int(os.getenv('VIEW_DEDUPE_MAX_ENTRIES', 100000))
+
+    # Full-text search (app/search.py); text search configuration used on Postgres
+    SEARCH_TS_CONFIG = os.getenv('SEARCH_TS_CONFIG', 'english')
+
+    # Trending scores (app/trending.py)
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+    TRENDING_LIKE_WEIGHT = float(os.getenv('TRENDING_LIKE_WEIGHT', 3.0))
+    TRENDING_VIEW_WEIGHT = float(os.getenv('TRENDING_VIEW_WEIGHT', 1.0))
+    TRENDING_COMMENT_WEIGHT = float(os.getenv('TRENDING_COMMENT_WEIGHT', 4.0))
+    TRENDING_PUBLISH_WEIGHT = float(os.getenv('TRENDING_PUBLISH_WEIGHT', 1.0))
+    TRENDING_MIN_SCORE = float(os.getenv('TRENDING_MIN_SCORE', 0.01))  # pruned below this on refresh
+    TRENDING_REBASE_AFTER_HALF_LIVES = int(os.getenv('TRENDING_REBASE_AFTER_HALF_LIVES', 32))  # warn if refresh-trending has not run for this long
+
+    # Home timeline fan-out (app/feed.py)
+    FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 1000))  # above this, posts are pulled at read time
+    FEED_BACKFILL_POSTS = int(os.getenv('FEED_BACKFILL_POSTS', 50))  # recent posts copied to a new follower's inbox
+
+    # HTTP conditional GET and Cache-Control (app/caching.py), keyed by blueprint name
+    HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    HTTP_CACHE_CONTROL = {
+        'default': os.getenv('HTTP_CACHE_CONTROL_DEFAULT', 'public, no-cache'),
+        'blogs': os.getenv('HTTP_CACHE_CONTROL_BLOGS', 'public, max-age=30, stale-while-revalidate=60'),
+        'users': os.getenv('HTTP_CACHE_CONTROL_USERS', 'public, max-age=30, stale-while-revalidate=60'),
+        'follows': os.getenv('HTTP_CACHE_CONTROL_FOLLOWS', 'public, max-age=60'),
+        'likes': os.getenv('HTTP_CACHE_CONTROL_LIKES', 'public, max-age=10'),
+        'openapi': os.getenv('HTTP_CACHE_CONTROL_OPENAPI', 'public, max-age=300')
+    }
+    HTTP_CACHE_TRENDING_WINDOW = int(os.getenv('HTTP_CACHE_TRENDING_WINDOW', 60))  # seconds trending scores may lag
+
+    # Tag name -> id cache per process (app/tags.py); 0 disables it
+    TAG_CACHE_SIZE = int(os.getenv('TAG_CACHE_SIZE', 10000))
+
+    # Admin-only endpoints such as bulk export/import (app/bulk.py)
+    ADMIN_USERNAMES = [name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()]
+    BULK_EXPORT_BATCH_SIZE = int(os.getenv('BULK_EXPORT_BATCH_SIZE', 500))  # blogs per cursor batch
+    BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', 1000))  # blogs per import transaction
+
+    # Per-request SQL instrumentation (app/instrumentation.py)
+    SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'false').lower() in ['true', 'on', '1']
+    SQL_INSTRUMENTATION_HEADERS = os.getenv('SQL_INSTRUMENTATION_HEADERS', 'true').lower() in ['true', 'on', '1']  # X-Query-Count, Server-Timing
+    SQL_SLOWEST_STATEMENTS = int(os.getenv('SQL_SLOWEST_STATEMENTS', 3))  # kept per request for the log
+    SQL_SLOW_REQUEST_MS = float(os.getenv('SQL_SLOW_REQUEST_MS', 200))  # log requests with more DB time than this
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5))  # repeats of one statement shape
+    SQL_QUERY_BUDGETS = os.getenv('SQL_QUERY_BUDGETS')  # @query_budget: 'raise', 'warn' or 'off'; unset: 'raise' when TESTING, else 'off'
+
+    # Prometheus metrics at /metrics (app/metrics.py)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    METRICS_DIR = os.getenv('METRICS_DIR', os.getenv('PROMETHEUS_MULTIPROC_DIR'))  # shared by worker processes; empty it at server start
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5.0))  # seconds between per-process snapshots
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # if set, scrapes need 'Authorization: Bearer <token>' (outbox stats: this or an admin)
+
+    # Read replica routing (app/replicas.py)
+    REPLICA_HEALTH_INTERVAL = float(os.getenv('REPLICA_HEALTH_INTERVAL', 5.0))  # seconds between checks
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 10.0))  # Postgres replay lag before a replica is skipped
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', 10.0))  # a writer reads from the primary this long
+
+    # Engine tuning (app/db_profile.py): 'default' keeps driver defaults, 'tuned' applies the settings below
+    DB_PROFILE = os.getenv('DB_PROFILE', 'default')
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -65536))  # pages, or KiB when negative
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # bytes
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds, Postgres
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ['true', 'on', '1']  # Postgres
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))  # Postgres, 0 disables; not applied to CLI commands
+
+    # POST /api/likes/status (app/likes.py)
+    LIKE_STATUS_MAX_IDS = int(os.getenv('LIKE_STATUS_MAX_IDS', 500))  # per id list
+
+    # In-memory follow graph (app/follow_graph.py)
+    FOLLOW_GRAPH_ENABLED = os.getenv('FOLLOW_GRAPH_ENABLED', 'true').lower() in ['true', 'on', '1']
+    FOLLOW_GRAPH_SYNC_INTERVAL = float(os.getenv('FOLLOW_GRAPH_SYNC_INTERVAL', 1.0))  # seconds between replays of other workers' changes
+    FOLLOW_SUGGESTION_MAX_SCAN = int(os.getenv('FOLLOW_SUGGESTION_MAX_SCAN', 50000))  # second-hop edges looked at per suggestion request
+    FOLLOW_EVENT_RETENTION_HOURS = float(os.getenv('FOLLOW_EVENT_RETENTION_HOURS', 72))  # flask prune-follow-events keeps this much
+
+    # Item-item recommendations (app/recommendations.py)
+    RECO_NEIGHBORS = int(os.getenv('RECO_NEIGHBORS', 50))  # similar blogs kept per blog
+    RECO_LIKE_WEIGHT = float(os.getenv('RECO_LIKE_WEIGHT', 3.0))
+    RECO_COMMENT_LIKE_WEIGHT = float(os.getenv('RECO_COMMENT_LIKE_WEIGHT', 2.0))
+    RECO_VIEW_WEIGHT = float(os.getenv('RECO_VIEW_WEIGHT', 1.0))
+    RECO_HISTORY_SIZE = int(os.getenv('RECO_HISTORY_SIZE', 20))  # latest interactions of each kind a user's recommendations start from
+    RECO_CATEGORY_BOOST = float(os.getenv('RECO_CATEGORY_BOOST', 0.5))  # extra score share for preferred categories
+    RECO_MAX_RESULTS = int(os.getenv('RECO_MAX_RESULTS', 200))
+    RECO_BUILD_BLOCK_SIZE = int(os.getenv('RECO_BUILD_BLOCK_SIZE', 1024))  # blogs per similarity block; bounds build memory
+
+    # Response compression (app/compression.py)
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    COMPRESS_ALGORITHMS = os.getenv('COMPRESS_ALGORITHMS', 'zstd,br,gzip')  # preference order; br and zstd need the brotli and zstandard packages
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # bytes; smaller responses are sent as is
+    COMPRESS_MIMETYPES = os.getenv('COMPRESS_MIMETYPES', 'application/json,application/x-ndjson,text/plain,text/html,text/css,application/javascript,text/javascript')
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+    COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', 3))
+    COMPRESS_CACHED_GZIP_LEVEL = int(os.getenv('COMPRESS_CACHED_GZIP_LEVEL', 9))  # levels for ETagged responses, compressed once
+    COMPRESS_CACHED_BROTLI_QUALITY = int(os.getenv('COMPRESS_CACHED_BROTLI_QUALITY', 9))
+    COMPRESS_CACHED_ZSTD_LEVEL = int(os.getenv('COMPRESS_CACHED_ZSTD_LEVEL', 12))
+    COMPRESS_CACHE_MAX_BYTES = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024))  # compressed bodies of ETagged responses kept per process
@@ -0,0 +1,84 @@
+# app/counters.py
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import update, select, func, bindparam, case
+from .models import db, Blog, Like, BlogView, Comment
+
+COUNTER_COLUMNS = {
+    'like_count': Blog.like_count,
+    'view_count': Blog.view_count,
+    'comment_count': Blog.comment_count
+}
+
+
+def bump_blog_counter(blog_id, counter, delta=1):
+    """Atomically add delta to one of the denormalized Blog counters.
+
+    Runs as a single `UPDATE blog SET n = n + :delta` inside the caller's
+    transaction, so the counter commits (or rolls back) with the row change
+    that caused it.
+    """
+    column = COUNTER_COLUMNS[counter]
+    db.session.execute(
+        update(Blog)
+        .where(Blog.id == blog_id)
+        .values({column: column + delta})
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_blog_counters(counter, deltas):
+    """Apply many counter deltas ({blog_id: delta}) in one executemany UPDATE."""
+    if not deltas:
+        return
+    table = Blog.__table__
+    column = table.c[counter]
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_id'))
+        .values({column: column + bindparam('delta')}),
+        [{'b_id': blog_id, 'delta': delta} for blog_id, delta in deltas.items()]
+    )
+
+
+def reconcile_blog_counters(chunk_size=1000):
+    """Rebuild every Blog counter from the raw like/view/comment tables.
+
+    view_count is only ever raised: bulk imports carry a blog's view count
+    without its blog_view rows, and views are never removed, so the larger
+    of the stored and counted values is kept. Likes and comments are
+    rebuilt exactly.
+
+    Blogs are processed in id ranges of chunk_size, each range in its own
+    short transaction, so the table is never locked for the whole run.
+    Returns the number of id ranges processed.
+    """
+    min_id, max_id = db.session.query(func.min(Blog.id), func.max(Blog.id)).one()
+    if min_id is None:
+        return 0
+
+    like_count = select(func.count(Like.id)).where(Like.blog_id == Blog.id).scalar_subquery()
+    counted_views = select(func.count(BlogView.id)).where(BlogView.blog_id == Blog.id).scalar_subquery()
+    view_count = case((counted_views > Blog.view_count, counted_views), else_=Blog.view_count)
+    comment_count = select(func.count(Comment.id)).where(Comment.blog_id == Blog.id).scalar_subquery()
+
+    chunks = 0
+    for lower in range(min_id, max_id + 1, chunk_size):
+        db.session.execute(
+            update(Blog)
+            .where(Blog.id >= lower, Blog.id < lower + chunk_size)
+            .values(like_count=like_count, view_count=view_count, comment_count=comment_count)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        chunks += 1
+    return chunks
+
+
+@click.command('reconcile-counters')
+@click.option('--chunk-size', default=1000, show_default=True, help='Blogs updated per transaction')
+@with_appcontext
+def reconcile_counters_command(chunk_size):
+    """Recompute like/view/comment counters on every blog."""
+    chunks = reconcile_blog_counters(chunk_size=chunk_size)
+    click.echo(f'Reconciled blog counters in {chunks} chunk(s)')
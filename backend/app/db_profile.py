@@ -0,0 +1,102 @@
+# app/db_profile.py
+import click
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Engine tuning, selected with DB_PROFILE.
+#
+# 'default' keeps the driver defaults. 'tuned' is meant for production:
+#
+# SQLite runs in WAL mode, so readers no longer wait for a writer and a
+# writer does not wait for readers. synchronous=NORMAL only syncs at
+# checkpoints, which in WAL mode is still safe against application
+# crashes. A large page cache and memory-mapped reads come with it, and a
+# busy_timeout makes a second writer wait instead of failing with
+# "database is locked".
+#
+# Postgres (and SQLite's QueuePool) get an explicit pool size, overflow and
+# checkout timeout. Postgres also gets pre-ping, recycling of old
+# connections, and a server-side statement_timeout so one runaway query
+# cannot hold a connection forever. CLI commands (migrations, rebuilds,
+# bulk import) are exempt from the statement timeout.
+
+PROFILES = ('default', 'tuned')
+
+
+def engine_options(url, config, cli=False):
+    """create_engine() keyword arguments for url under config's DB_PROFILE."""
+    if config['DB_PROFILE'] != 'tuned':
+        return {}
+    url = make_url(url)
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        if url.database and url.database != ':memory:':
+            options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                           pool_timeout=config['DB_POOL_TIMEOUT'])
+        return options
+
+    options.update(
+        pool_size=config['DB_POOL_SIZE'],
+        max_overflow=config['DB_MAX_OVERFLOW'],
+        pool_timeout=config['DB_POOL_TIMEOUT'],
+        pool_recycle=config['DB_POOL_RECYCLE'],
+        pool_pre_ping=config['DB_POOL_PRE_PING']
+    )
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS'] and not cli:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def sqlite_pragmas(config):
+    """[(pragma, value)] run on every new SQLite connection under the tuned profile."""
+    if config['DB_PROFILE'] != 'tuned':
+        return []
+    return [
+        ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('temp_store', 'MEMORY')
+    ]
+
+
+def configure_engines(app):
+    """Fill in engine options for the primary and every bind; call before db.init_app()."""
+    config = app.config
+    if config['DB_PROFILE'] not in PROFILES:
+        raise ValueError(f"DB_PROFILE must be one of {', '.join(PROFILES)}, not {config['DB_PROFILE']!r}")
+    cli = click.get_current_context(silent=True) is not None
+
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    for key, value in engine_options(config['SQLALCHEMY_DATABASE_URI'], config, cli).items():
+        options.setdefault(key, value)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+    binds = {}
+    for name, bind in (config.get('SQLALCHEMY_BINDS') or {}).items():
+        bind = {'url': bind} if isinstance(bind, str) else dict(bind)
+        for key, value in engine_options(bind['url'], config, cli).items():
+            bind.setdefault(key, value)
+        binds[name] = bind
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_db_profile(app):
+    """Run the profile's PRAGMAs on each new connection of the app's SQLite engines."""
+    from .models import db
+
+    pragmas = sqlite_pragmas(app.config)
+    if not pragmas:
+        return
+    with app.app_context():
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    for engine in engines:
+        event.listen(engine, 'connect', set_pragmas)
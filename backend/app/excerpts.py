@@ -0,0 +1,71 @@
+# app/excerpts.py
+import math
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, bindparam
+from .models import db, Blog
+from .serializers import preview
+
+# Stored excerpt, word count and reading time per blog.
+#
+# Blog.content is a deferred column: loading a Blog does not read the body,
+# and list endpoints serialize the stored excerpt instead, so a page of long
+# posts costs a few hundred bytes per row rather than the whole text. The
+# three columns are computed whenever content is written (create_blog,
+# update_blog, bulk import); `flask backfill-excerpts` fills them for rows
+# written before they existed.
+
+WORDS_PER_MINUTE = 200
+
+
+def content_fields(content):
+    """{excerpt, word_count, reading_time} for a blog body; reading_time is in minutes."""
+    words = len(content.split())
+    return {
+        'excerpt': preview(content),
+        'word_count': words,
+        'reading_time': max(1, math.ceil(words / WORDS_PER_MINUTE))
+    }
+
+
+def set_blog_content(blog, content):
+    """Set a blog's content together with its stored excerpt and counts."""
+    blog.content = content
+    for name, value in content_fields(content).items():
+        setattr(blog, name, value)
+
+
+def backfill_excerpts(recompute=False, chunk_size=500):
+    """Fill excerpt, word_count and reading_time from content. Returns the number of blogs updated.
+
+    Only rows with no excerpt yet, unless recompute; each chunk is its own
+    short transaction.
+    """
+    table = Blog.__table__
+    statement = update(table).where(table.c.id == bindparam('b_id')).values(
+        excerpt=bindparam('excerpt'),
+        word_count=bindparam('word_count'),
+        reading_time=bindparam('reading_time')
+    )
+    updated, last_id = 0, 0
+    while True:
+        query = select(table.c.id, table.c.content).where(table.c.id > last_id)
+        if not recompute:
+            query = query.where(table.c.excerpt.is_(None))
+        rows = db.session.execute(query.order_by(table.c.id).limit(chunk_size)).all()
+        if not rows:
+            return updated
+        db.session.execute(statement, [dict(content_fields(content), b_id=blog_id) for blog_id, content in rows])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+
+@click.command('backfill-excerpts')
+@click.option('--all', 'recompute', is_flag=True, help='Recompute every blog, not just those without an excerpt')
+@click.option('--chunk-size', default=500, show_default=True, help='Blogs per transaction')
+@with_appcontext
+def backfill_excerpts_command(recompute, chunk_size):
+    """Store excerpts, word counts and reading times for existing blogs."""
+    updated = backfill_excerpts(recompute=recompute, chunk_size=chunk_size)
+    click.echo(f'Updated {updated} blog(s)')
@@ -0,0 +1,275 @@
+# app/feed.py
+import heapq
+import click
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask.cli import with_appcontext
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, select, delete, literal, true
+from .models import db, Blog, Follow, FeedEntry, FeedPullAuthor
+from .pagination import seek_condition, decode_cursor, encode_cursor, cursor_pagination, InvalidCursor
+from .serializers import with_blog_relations, serialize_blog, blog_fields
+from .fieldsets import select_fields
+from .utils import dialect_insert
+from .instrumentation import query_budget
+
+# Home timeline ("posts from people I follow") with hybrid fan-out.
+#
+# Authors with at most FEED_FANOUT_MAX_FOLLOWERS followers push each post
+# into every follower's feed_inbox row set when it is published (fan-out on
+# write), so a reader's timeline is mostly a range read on
+# (user_id, timestamp, blog_id). Posting into thousands of inboxes would make
+# publishing slow for popular authors, so their posts are instead pulled at
+# read time: the followed high-follower authors' newest posts are read in one
+# query on blog.user_id IN (...), and that stream and the inbox stream, both
+# sorted newest first, are merged. Each stream only needs per_page + 1 rows,
+# so a page costs a fixed number of small reads however many authors (of
+# either kind) the reader follows.
+#
+# The high-follower authors are listed in feed_pull_author, kept up to date
+# on every follow and unfollow. An author dropping back under the threshold
+# has their recent posts pushed to every follower, since posts published
+# (or follows made) while they were pulled never reached the inboxes.
+
+feed_bp = Blueprint('feed', __name__, url_prefix='/api/feed')
+
+
+def _is_public(blog):
+    return not blog.is_draft and not blog.is_archived
+
+
+def _public_blogs():
+    return [Blog.is_draft == False, Blog.is_archived == False]
+
+
+def is_pull_author(author_id):
+    return db.session.get(FeedPullAuthor, author_id) is not None
+
+
+def _has_many_followers(author_id):
+    # Counts at most threshold + 1 follows, however popular the author
+    limit = current_app.config['FEED_FANOUT_MAX_FOLLOWERS']
+    follows = select(Follow.id).where(Follow.followed_id == author_id).limit(limit + 1).subquery()
+    return db.session.query(func.count()).select_from(follows).scalar() > limit
+
+
+def _insert_ignore(select_statement):
+    # SQLite cannot tell ON CONFLICT from a join constraint unless the
+    # SELECT ends in a WHERE clause
+    select_statement = select_statement.where(true())
+    columns = ['user_id', 'blog_id', 'author_id', 'timestamp']
+    statement = dialect_insert(FeedEntry.__table__).from_select(columns, select_statement)
+    return db.session.execute(statement.on_conflict_do_nothing()).rowcount
+
+
+def fan_out_blog(blog):
+    """Copy a public blog into its author's followers' inboxes in the caller's transaction.
+
+    Does nothing for drafts, archived blogs and high-follower authors.
+    Returns the number of inbox rows written.
+    """
+    if not _is_public(blog) or is_pull_author(blog.user_id):
+        return 0
+    return _insert_ignore(
+        select(Follow.follower_id, literal(blog.id), literal(blog.user_id), literal(blog.timestamp, db.DateTime))
+        .where(Follow.followed_id == blog.user_id)
+    )
+
+
+def retract_blog(blog_id):
+    """Remove a blog from every inbox in the caller's transaction."""
+    db.session.execute(
+        delete(FeedEntry)
+        .where(FeedEntry.blog_id == blog_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def sync_blog(blog, was_public):
+    """Fan out a blog that just became public, or retract one that stopped being public."""
+    if not _is_public(blog):
+        retract_blog(blog.id)
+    elif not was_public:
+        fan_out_blog(blog)
+
+
+def _latest_posts(author_id, limit):
+    return select(Blog.id, Blog.user_id, Blog.timestamp)\
+        .where(Blog.user_id == author_id, *_public_blogs())\
+        .order_by(Blog.timestamp.desc(), Blog.id.desc())\
+        .limit(limit)\
+        .subquery()
+
+
+def _backfill_author(author_id):
+    # The author's recent posts into every follower's inbox
+    posts = _latest_posts(author_id, current_app.config['FEED_BACKFILL_POSTS'])
+    return _insert_ignore(
+        select(Follow.follower_id, posts.c.id, posts.c.user_id, posts.c.timestamp)
+        .select_from(Follow).join(posts, true())
+        .where(Follow.followed_id == author_id)
+    )
+
+
+def update_pull_mode(author_id):
+    """Move an author between push and pull after their followers changed.
+
+    Runs in the caller's transaction, once the follow or unfollow is in the
+    session. Returns True if the author's posts are now pulled.
+    """
+    pulled = is_pull_author(author_id)
+    if _has_many_followers(author_id):
+        if not pulled:
+            statement = dialect_insert(FeedPullAuthor.__table__).values(author_id=author_id, since=datetime.utcnow())
+            db.session.execute(statement.on_conflict_do_nothing(index_elements=['author_id']))
+        return True
+    if pulled:
+        db.session.execute(
+            delete(FeedPullAuthor)
+            .where(FeedPullAuthor.author_id == author_id)
+            .execution_options(synchronize_session=False)
+        )
+        _backfill_author(author_id)
+    return False
+
+
+def backfill_follow(follower_id, author_id):
+    """Seed a new follower's inbox with the author's most recent posts."""
+    if update_pull_mode(author_id):
+        return 0
+    posts = _latest_posts(author_id, current_app.config['FEED_BACKFILL_POSTS'])
+    return _insert_ignore(select(literal(follower_id), posts.c.id, posts.c.user_id, posts.c.timestamp))
+
+
+def remove_follow(follower_id, author_id):
+    """Drop an unfollowed author's posts from the follower's inbox."""
+    db.session.execute(
+        delete(FeedEntry)
+        .where(FeedEntry.user_id == follower_id, FeedEntry.author_id == author_id)
+        .execution_options(synchronize_session=False)
+    )
+    update_pull_mode(author_id)
+
+
+def _inbox_stream(user_id, excluded_authors, seek_values, limit):
+    query = db.session.query(FeedEntry.timestamp, FeedEntry.blog_id).filter(FeedEntry.user_id == user_id)
+    if excluded_authors:
+        # Posts of authors that crossed the threshold after fanning out
+        # would otherwise come through twice
+        query = query.filter(FeedEntry.author_id.notin_(excluded_authors))
+    if seek_values:
+        query = query.filter(seek_condition([FeedEntry.timestamp, FeedEntry.blog_id], seek_values))
+    return query.order_by(FeedEntry.timestamp.desc(), FeedEntry.blog_id.desc()).limit(limit).all()
+
+
+def _authors_stream(author_ids, seek_values, limit):
+    if not author_ids:
+        return []
+    # The page takes at most limit rows in all, so one LIMIT covers every author
+    query = db.session.query(Blog.timestamp, Blog.id).filter(Blog.user_id.in_(author_ids), *_public_blogs())
+    if seek_values:
+        query = query.filter(seek_condition([Blog.timestamp, Blog.id], seek_values))
+    return query.order_by(Blog.timestamp.desc(), Blog.id.desc()).limit(limit).all()
+
+
+def _decode_feed_cursor(cursor):
+    values = decode_cursor(cursor)
+    if len(values) != 2 or not isinstance(values[0], datetime) or not isinstance(values[1], int):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def read_feed(user_id, cursor=None, per_page=20):
+    """Return (blog ids newest first, next_cursor) for one page of a user's timeline."""
+    seek_values = _decode_feed_cursor(cursor) if cursor else None
+    limit = per_page + 1
+
+    pulled = sorted(
+        row[0] for row in db.session.query(FeedPullAuthor.author_id)
+                                    .join(Follow, Follow.followed_id == FeedPullAuthor.author_id)
+                                    .filter(Follow.follower_id == user_id).all()
+    )
+
+    streams = [_inbox_stream(user_id, pulled, seek_values, limit), _authors_stream(pulled, seek_values, limit)]
+
+    keys = []
+    seen = set()
+    for timestamp, blog_id in heapq.merge(*streams, reverse=True):
+        if blog_id in seen:
+            continue
+        seen.add(blog_id)
+        keys.append((timestamp, blog_id))
+        if len(keys) == limit:
+            break
+
+    next_cursor = None
+    if len(keys) > per_page:
+        keys = keys[:per_page]
+        next_cursor = encode_cursor(keys[-1])
+    return [blog_id for _, blog_id in keys], next_cursor
+
+
+def rebuild_feeds():
+    """Rebuild feed_pull_author and every inbox from the follow graph.
+
+    Returns the number of inbox rows written.
+    """
+    db.session.execute(delete(FeedEntry))
+    pulled = {row[0]: row[1] for row in db.session.query(FeedPullAuthor.author_id, FeedPullAuthor.since).all()}
+    db.session.execute(delete(FeedPullAuthor))
+    excluded = [row[0] for row in db.session.query(Follow.followed_id)
+                                            .group_by(Follow.followed_id)
+                                            .having(func.count(Follow.id) > current_app.config['FEED_FANOUT_MAX_FOLLOWERS'])
+                                            .all()]
+    now = datetime.utcnow()
+    db.session.add_all(FeedPullAuthor(author_id=author_id, since=pulled.get(author_id, now)) for author_id in excluded)
+    db.session.commit()
+
+    authors = [row[0] for row in db.session.query(Follow.followed_id).distinct().all()]
+    excluded = set(excluded)
+    written = 0
+    for author_id in authors:
+        if author_id in excluded:
+            continue
+        written += _backfill_author(author_id)
+        db.session.commit()
+    db.session.commit()
+    return written
+
+
+@feed_bp.route('', methods=['GET'])
+@jwt_required()
+@query_budget(8)
+def get_feed():
+    """Get blogs from followed users, newest first"""
+    user_id = int(get_jwt_identity())
+    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(per_page, 50)
+
+    if per_page < 1:
+        return jsonify({'error': 'Items per page must be 1 or greater'}), 400
+    counts = ('likes_count', 'views_count', 'comments_count')
+    selection = select_fields(blog_fields('preview', counts=counts), embeds=('author', 'tags'))
+
+    blog_ids, next_cursor = read_feed(user_id, request.args.get('cursor'), per_page)
+
+    blogs = with_blog_relations(Blog.query.filter(Blog.id.in_(blog_ids)), selection=selection,
+                                content='preview').all() if blog_ids else []
+    blogs_by_id = {blog.id: blog for blog in blogs}
+    feed = [
+        serialize_blog(blogs_by_id[blog_id], content='preview', counts=counts, selection=selection)
+        for blog_id in blog_ids if blog_id in blogs_by_id
+    ]
+
+    return jsonify({
+        'feed': feed,
+        'pagination': cursor_pagination(per_page, next_cursor)
+    }), 200
+
+
+@click.command('rebuild-feeds')
+@with_appcontext
+def rebuild_feeds_command():
+    """Rebuild home timeline inboxes from follows and published blogs."""
+    written = rebuild_feeds()
+    click.echo(f'Wrote {written} inbox row(s)')
@@ -0,0 +1,72 @@
+# app/fieldsets.py
+from flask import request
+
+# Sparse fieldsets: ?fields= and ?include= on list and detail endpoints.
+#
+# ?fields=id,title,likes_count returns only those keys ('id' always comes
+# back). ?include=author,tags names the related objects ("embeds") to nest;
+# without it an endpoint nests its usual ones, or, when ?fields= is given,
+# only the embeds listed there. Names are checked against what the endpoint
+# can return and anything else is a 400.
+#
+# Endpoints hand the resulting FieldSelection to their query builders, so
+# unrequested columns stay out of the SELECT (load_only), unrequested
+# relationships are not loaded, and queries that only feed unrequested
+# keys (counts, likes, replies) are skipped altogether.
+
+
+class InvalidFields(ValueError):
+    def __init__(self, message, available):
+        super().__init__(message)
+        self.available = sorted(available)
+
+
+def _names(parameter):
+    value = request.args.get(parameter)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class FieldSelection:
+    """What a request asked for: `key in selection` for fields and embeds alike."""
+
+    def __init__(self, fields, embeds, embed_names):
+        self.fields = fields  # None means every field
+        self.embeds = embeds
+        self.embed_names = embed_names
+
+    def __contains__(self, key):
+        if key in self.embed_names:
+            return key in self.embeds
+        return self.fields is None or key == 'id' or key in self.fields
+
+    @property
+    def partial(self):
+        """True when only some fields were asked for."""
+        return self.fields is not None
+
+
+def select_fields(fields, embeds=(), default_embeds=None):
+    """Parse ?fields= and ?include= against the keys an endpoint can return.
+
+    fields are the plain keys, embeds the nested objects; default_embeds
+    (all embeds if None) are nested when neither parameter is given.
+    Raises InvalidFields for names the endpoint does not have.
+    """
+    fields, embeds = set(fields), set(embeds)
+    default_embeds = embeds if default_embeds is None else set(default_embeds)
+    requested, included = _names('fields'), _names('include')
+
+    unknown = (requested or set()) - fields - embeds
+    if unknown:
+        raise InvalidFields(f"Unknown field(s): {', '.join(sorted(unknown))}", fields | embeds)
+    unknown = (included or set()) - embeds
+    if unknown:
+        raise InvalidFields(f"Unknown include(s): {', '.join(sorted(unknown))}", embeds)
+
+    if requested is None and included is None:
+        chosen = default_embeds
+    else:
+        chosen = (included or set()) | ((requested or set()) & embeds)
+    return FieldSelection(None if requested is None else requested - embeds, chosen, embeds)
@@ -0,0 +1,344 @@
+# app/follow_graph.py
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, delete, func
+from .models import db, Follow, FollowEvent
+
+# In-memory follow graph.
+#
+# Each process keeps, per user, a sorted array('i') of the ids they follow
+# and another of their followers: 4 bytes per id, two ids per follow, and
+# a bisect for "does A follow B". Counts, follow checks, mutual follows
+# (merging the two sorted arrays) and "followed by people you follow"
+# suggestions are answered from memory without touching the follow table.
+#
+# The graph is loaded from Follow in a background thread when the app
+# starts (or, in a forked worker, on first use); until it is ready callers
+# fall back to SQL. Every follow and unfollow also appends a row to
+# follow_event in the same transaction. The process that made the change
+# applies it at once, and every process replays new events, in id order,
+# at most once per FOLLOW_GRAPH_SYNC_INTERVAL seconds. Replaying is
+# idempotent, so events that were already part of the snapshot, or
+# already applied locally, leave the graph unchanged. A gap in the event
+# ids holds replay back for up to GAP_GRACE_SECONDS, since it is usually
+# a transaction that has not committed yet.
+
+_EMPTY = array('i')
+GAP_GRACE_SECONDS = 10
+
+
+def _insert(ids, value):
+    index = bisect_left(ids, value)
+    if index == len(ids) or ids[index] != value:
+        ids.insert(index, value)
+        return True
+    return False
+
+
+def _remove(ids, value):
+    index = bisect_left(ids, value)
+    if index < len(ids) and ids[index] == value:
+        del ids[index]
+        return True
+    return False
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def intersect(a, b):
+    """Ids present in both sorted arrays."""
+    result, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            result.append(a[i])
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+class FollowGraph:
+    """Adjacency arrays for every user with at least one follow edge."""
+
+    def __init__(self, app, sync_interval=1.0, suggestion_max_scan=50000, event_retention_hours=72):
+        self.app = app
+        self.sync_interval = sync_interval
+        self.suggestion_max_scan = suggestion_max_scan
+        self.event_retention = event_retention_hours * 3600
+
+        self.following = {}
+        self.followers = {}
+        self.edges = 0
+        self.last_event_id = 0
+        self.ready = False
+
+        self._lock = threading.Lock()  # mutations and syncs
+        self._loader = None
+        self._pid = None
+        self._last_sync = 0.0
+        self.loaded_at = None
+        self.load_ms = None
+        self.events_applied = 0
+
+    # ---------- Loading ----------
+
+    def start_loading(self):
+        """Load in a background thread unless this process already has (or is building) the graph."""
+        pid = os.getpid()
+        with self._lock:
+            if self.ready or (self._loader is not None and self._loader.is_alive() and self._pid == pid):
+                return
+            # A forked worker inherits a finished graph, but not a loader thread
+            self._pid = pid
+            self._loader = threading.Thread(target=self._load_in_background, name='follow-graph-loader',
+                                            daemon=True)
+            self._loader.start()
+
+    def _load_in_background(self):
+        try:
+            with self.app.app_context():
+                self.load()
+        except Exception:
+            self.app.logger.exception('Failed to load the follow graph; follow queries stay on SQL')
+
+    def load(self):
+        """Build the graph from the follow table (needs an app context)."""
+        started = time.perf_counter()
+        # Events after this id are replayed on top of the snapshot
+        last_event_id = db.session.query(func.max(FollowEvent.id)).scalar() or 0
+
+        following, followers, edges = {}, {}, 0
+        for adjacency, key, other in ((following, Follow.follower_id, Follow.followed_id),
+                                      (followers, Follow.followed_id, Follow.follower_id)):
+            current_key, current = None, None
+            rows = db.session.execute(select(key, other).order_by(key, other).execution_options(yield_per=50000))
+            for user_id, other_id in rows:
+                if user_id != current_key:
+                    current_key, current = user_id, array('i')
+                    adjacency[user_id] = current
+                current.append(other_id)
+        edges = sum(len(ids) for ids in following.values())
+        db.session.commit()
+
+        with self._lock:
+            self.following, self.followers, self.edges = following, followers, edges
+            self.last_event_id = last_event_id
+            self._last_sync = 0.0
+            self.loaded_at = datetime.utcnow()
+            self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.ready = True
+        self.sync(force=True)
+        self.app.logger.info('Follow graph loaded: %d edges in %.0f ms', edges, self.load_ms)
+
+    # ---------- Updates ----------
+
+    def apply(self, follower_id, followed_id, following):
+        """Add or remove one edge; returns True if the graph changed."""
+        with self._lock:
+            return self._apply(follower_id, followed_id, following)
+
+    def _apply(self, follower_id, followed_id, following):
+        if following:
+            changed = _insert(self.following.setdefault(follower_id, array('i')), followed_id)
+            _insert(self.followers.setdefault(followed_id, array('i')), follower_id)
+        else:
+            changed = _remove(self.following.get(follower_id, _EMPTY), followed_id)
+            _remove(self.followers.get(followed_id, _EMPTY), follower_id)
+        if changed:
+            self.edges += 1 if following else -1
+        return changed
+
+    def record(self, follower_id, followed_id, following):
+        """Log a follow change in the caller's transaction; apply it after commit with apply()."""
+        db.session.add(FollowEvent(follower_id=follower_id, followed_id=followed_id, following=following))
+
+    def sync(self, force=False):
+        """Replay events logged by any process since the last sync."""
+        if not self.ready:
+            return 0
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return 0
+        if self._last_sync and now - self._last_sync > self.event_retention / 2:
+            # Idle for so long that the events we need may have been pruned
+            self.ready = False
+            self.start_loading()
+            return 0
+        with self._lock:
+            if not force and now - self._last_sync < self.sync_interval:
+                return 0
+            self._last_sync = now
+            events = db.session.execute(
+                select(FollowEvent.id, FollowEvent.follower_id, FollowEvent.followed_id, FollowEvent.following,
+                       FollowEvent.created_at)
+                .where(FollowEvent.id > self.last_event_id)
+                .order_by(FollowEvent.id)
+            ).all()
+            # A missing id is usually a transaction that has not committed
+            # yet; wait for it unless it is old enough to have rolled back
+            settled = datetime.utcnow() - timedelta(seconds=GAP_GRACE_SECONDS)
+            applied = 0
+            for event_id, follower_id, followed_id, following, created_at in events:
+                if event_id != self.last_event_id + 1 and created_at > settled:
+                    break
+                self._apply(follower_id, followed_id, following)
+                self.last_event_id = event_id
+                applied += 1
+            self.events_applied += applied
+            return applied
+
+    # ---------- Queries ----------
+
+    def following_ids(self, user_id):
+        return self.following.get(user_id, _EMPTY)
+
+    def follower_ids(self, user_id):
+        return self.followers.get(user_id, _EMPTY)
+
+    def counts(self, user_id):
+        """(followers, following)"""
+        return len(self.follower_ids(user_id)), len(self.following_ids(user_id))
+
+    def is_following(self, follower_id, followed_id):
+        return _contains(self.following_ids(follower_id), followed_id)
+
+    def mutuals(self, user_id):
+        """Users who follow user_id and whom user_id follows back, by id."""
+        return intersect(self.following_ids(user_id), self.follower_ids(user_id))
+
+    def suggestions(self, user_id, limit=10):
+        """[(user id, how many of the people user_id follows follow them)], best first.
+
+        Scans at most suggestion_max_scan second-hop edges, so a user who
+        follows very prolific followers still gets a bounded amount of work.
+        Ties go to the candidate with more followers.
+        """
+        following = self.following_ids(user_id)
+        scores, scanned = Counter(), 0
+        for friend_id in following:
+            second_hop = self.following_ids(friend_id)
+            scores.update(second_hop)
+            scanned += len(second_hop)
+            if scanned >= self.suggestion_max_scan:
+                break
+        scores.pop(user_id, None)
+        for followed_id in following:
+            scores.pop(followed_id, None)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -len(self.follower_ids(item[0])), item[0]))
+        return ranked[:limit]
+
+    def memory_bytes(self):
+        """Bytes held by the adjacency arrays and the dicts that index them."""
+        total = sys.getsizeof(self.following) + sys.getsizeof(self.followers)
+        for adjacency in (self.following, self.followers):
+            for user_id, ids in adjacency.items():
+                total += sys.getsizeof(ids) + sys.getsizeof(user_id)
+        return total
+
+    def stats(self):
+        memory = self.memory_bytes() if self.ready else None
+        return {
+            'ready': self.ready,
+            'edges': self.edges,
+            'users_following': len(self.following),
+            'users_followed': len(self.followers),
+            'memory_bytes': memory,
+            'bytes_per_million_edges': round(memory * 1000000 / self.edges) if memory and self.edges else None,
+            'last_event_id': self.last_event_id,
+            'events_applied': self.events_applied,
+            'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None,
+            'load_ms': self.load_ms,
+            'sync_interval': self.sync_interval
+        }
+
+
+def init_follow_graph(app):
+    """Create the app's FollowGraph and, unless disabled or under the CLI, start loading it."""
+    graph = FollowGraph(
+        app,
+        sync_interval=app.config['FOLLOW_GRAPH_SYNC_INTERVAL'],
+        suggestion_max_scan=app.config['FOLLOW_SUGGESTION_MAX_SCAN'],
+        event_retention_hours=app.config['FOLLOW_EVENT_RETENTION_HOURS']
+    )
+    app.extensions['follow_graph'] = graph
+    if app.config['FOLLOW_GRAPH_ENABLED'] and click.get_current_context(silent=True) is None:
+        graph.start_loading()
+    return graph
+
+
+def get_follow_graph():
+    return current_app.extensions['follow_graph']
+
+
+def ready_follow_graph():
+    """The synced graph, or None while it is disabled or still loading (use SQL then)."""
+    if not current_app.config['FOLLOW_GRAPH_ENABLED']:
+        return None
+    graph = current_app.extensions['follow_graph']
+    if not graph.ready:
+        graph.start_loading()
+        return None
+    graph.sync()
+    return graph
+
+
+def record_follow_change(follower_id, followed_id, following):
+    """Log a follow or unfollow in the current transaction, for every process to replay."""
+    if current_app.config['FOLLOW_GRAPH_ENABLED']:
+        current_app.extensions['follow_graph'].record(follower_id, followed_id, following)
+
+
+def apply_follow_change(follower_id, followed_id, following):
+    """Update this process's graph right after the change commits."""
+    graph = current_app.extensions['follow_graph']
+    if current_app.config['FOLLOW_GRAPH_ENABLED'] and graph.ready:
+        graph.apply(follower_id, followed_id, following)
+
+
+def follow_counts(user_id):
+    """(followers, following) for user_id, from the graph or, until it is ready, SQL."""
+    graph = ready_follow_graph()
+    if graph is not None:
+        return graph.counts(user_id)
+    return (Follow.query.filter_by(followed_id=user_id).count(),
+            Follow.query.filter_by(follower_id=user_id).count())
+
+
+def prune_follow_events(older_than_hours):
+    """Delete events older than the cutoff, always keeping the newest one. Returns the count."""
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    newest = db.session.query(func.max(FollowEvent.id)).scalar()
+    if newest is None:
+        return 0
+    # Keeping the newest row stops SQLite from handing its id out again
+    deleted = db.session.execute(
+        delete(FollowEvent).where(FollowEvent.created_at < cutoff, FollowEvent.id < newest)
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+@click.command('prune-follow-events')
+@click.option('--older-than-hours', type=float, default=None,
+              help='Defaults to FOLLOW_EVENT_RETENTION_HOURS')
+@with_appcontext
+def prune_follow_events_command(older_than_hours):
+    """Delete follow events every process has long since replayed."""
+    hours = older_than_hours if older_than_hours is not None else current_app.config['FOLLOW_EVENT_RETENTION_HOURS']
+    deleted = prune_follow_events(hours)
+    click.echo(f'Deleted {deleted} follow event(s) older than {hours:g} hours')
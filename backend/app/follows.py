@@ -2,9 +2,51 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from .models import User, Follow, db
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from .pagination import keyset_page, cursor_pagination
+from .feed import backfill_follow, remove_follow
+from .caching import conditional, bump_versions
+from .instrumentation import query_budget
+from .metrics import monitoring_required
+from .fieldsets import select_fields
+from .follow_graph import (ready_follow_graph, record_follow_change, apply_follow_change, follow_counts,
+                           get_follow_graph)
 
 follows_bp = Blueprint('follows', __name__, url_prefix='/api/follows')
 
+def _follow_version_keys(follower_id, followed_id):
+    # Follow counts appear in both users' stats and profiles
+    return [f'follows:{follower_id}', f'follows:{followed_id}', f'user:{follower_id}', f'user:{followed_id}']
+
+def _updated_counts(follower_id, followed_id):
+    # The followed user's followers and the follower's following
+    graph = ready_follow_graph()
+    if graph is not None:
+        return graph.counts(followed_id)[0], graph.counts(follower_id)[1]
+    return (Follow.query.filter_by(followed_id=followed_id).count(),
+            Follow.query.filter_by(follower_id=follower_id).count())
+
+# Keys of a listed follower or followed user, for ?fields=
+USER_FIELDS = ('id', 'username', 'joined_date')
+
+def _serialize_users(users, selection):
+    # Only the requested keys of each user
+    users_list = []
+    for listed_user in users:
+        item = {'id': listed_user.id}
+        if 'username' in selection:
+            item['username'] = listed_user.username
+        if 'joined_date' in selection:
+            item['joined_date'] = listed_user.created_at.isoformat() if hasattr(listed_user, 'created_at') else None
+        users_list.append(item)
+    return users_list
+
+def _usernames(user_ids):
+    # {id: username} in one query
+    if not user_ids:
+        return {}
+    return dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all())
+
 @follows_bp.route('/<int:user_id>', methods=['POST'])
 @jwt_required()
 def follow_user(user_id):
@@ -29,11 +71,14 @@ def follow_user(user_id):
     if existing_follow:
         # Unfollow
         db.session.delete(existing_follow)
+        remove_follow(follower_id, user_id)
+        record_follow_change(follower_id, user_id, False)
+        bump_versions(*_follow_version_keys(follower_id, user_id))
         db.session.commit()
+        apply_follow_change(follower_id, user_id, False)
         
         # Get updated counts
-        followers_count = Follow.query.filter_by(followed_id=user_id).count()
-        following_count = Follow.query.filter_by(follower_id=follower_id).count()
+        followers_count, following_count = _updated_counts(follower_id, user_id)
         
         return jsonify({
             'message': f'Unfollowed {user_to_follow.username}',
@@ -45,11 +90,14 @@ def follow_user(user_id):
         # Follow
         new_follow = Follow(follower_id=follower_id, followed_id=user_id)
         db.session.add(new_follow)
+        backfill_follow(follower_id, user_id)
+        record_follow_change(follower_id, user_id, True)
+        bump_versions(*_follow_version_keys(follower_id, user_id))
         db.session.commit()
+        apply_follow_change(follower_id, user_id, True)
         
         # Get updated counts
-        followers_count = Follow.query.filter_by(followed_id=user_id).count()
-        following_count = Follow.query.filter_by(follower_id=follower_id).count()
+        followers_count, following_count = _updated_counts(follower_id, user_id)
         
         return jsonify({
             'message': f'Now following {user_to_follow.username}',
@@ -76,10 +124,14 @@ def check_follow_status(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     # Check follow status
-    is_following = Follow.query.filter_by(
-        follower_id=follower_id, 
-        followed_id=user_id
-    ).first() is not None
+    graph = ready_follow_graph()
+    if graph is not None:
+        is_following = graph.is_following(follower_id, user_id)
+    else:
+        is_following = Follow.query.filter_by(
+            follower_id=follower_id, 
+            followed_id=user_id
+        ).first() is not None
     
     return jsonify({
         'is_following': is_following,
@@ -88,6 +140,7 @@ def check_follow_status(user_id):
     }), 200
 
 @follows_bp.route('/followers/<int:user_id>', methods=['GET'])
+@query_budget(6)
 def get_followers(user_id):
     """Get list of users who follow this user"""
     # Pagination
@@ -100,6 +153,7 @@ def get_followers(user_id):
         return jsonify({'error': 'Page must be 1 or greater'}), 400
     if per_page < 1:
         return jsonify({'error': 'Items per page must be 1 or greater'}), 400
+    selection = select_fields(USER_FIELDS)
     
     # Check if user exists
     user = User.query.get(user_id)
@@ -107,27 +161,26 @@ def get_followers(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     # Get followers with pagination
-    followers_query = db.session.query(User).join(
+    followers_query = db.session.query(User).options(load_only(User.id, User.username, User.created_at)).join(
         Follow, User.id == Follow.follower_id
-    ).filter(Follow.followed_id == user_id).order_by(Follow.timestamp.desc())
-    
-    paginated_followers = followers_query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    followers_list = []
-    for follower in paginated_followers.items:
-        followers_list.append({
-            'id': follower.id,
-            'username': follower.username,
-            'joined_date': follower.created_at.isoformat() if hasattr(follower, 'created_at') else None
-        })
-    
-    return jsonify({
-        'followers': followers_list,
-        'pagination': {
+    ).filter(Follow.followed_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        # Seek on the follow row's (timestamp, id), which the result rows carry along
+        rows, next_cursor = keyset_page(followers_query.add_columns(Follow.timestamp, Follow.id),
+                                        [Follow.timestamp, Follow.id], cursor, per_page,
+                                        lambda row: (row[1], row[2]))
+        users = [row[0] for row in rows]
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_followers = followers_query.order_by(Follow.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        users = paginated_followers.items
+        pagination = {
             'page': paginated_followers.page,
             'per_page': paginated_followers.per_page,
             'total': paginated_followers.total,
@@ -136,7 +189,13 @@ def get_followers(user_id):
             'has_prev': paginated_followers.has_prev,
             'next_num': paginated_followers.next_num if paginated_followers.has_next else None,
             'prev_num': paginated_followers.prev_num if paginated_followers.has_prev else None
-        },
+        }
+    
+    followers_list = _serialize_users(users, selection)
+    
+    return jsonify({
+        'followers': followers_list,
+        'pagination': pagination,
         'user': {
             'id': user.id,
             'username': user.username
@@ -144,6 +203,7 @@ def get_followers(user_id):
     }), 200
 
 @follows_bp.route('/following/<int:user_id>', methods=['GET'])
+@query_budget(6)
 def get_following(user_id):
     """Get list of users that this user follows"""
     # Pagination
@@ -156,6 +216,7 @@ def get_following(user_id):
         return jsonify({'error': 'Page must be 1 or greater'}), 400
     if per_page < 1:
         return jsonify({'error': 'Items per page must be 1 or greater'}), 400
+    selection = select_fields(USER_FIELDS)
     
     # Check if user exists
     user = User.query.get(user_id)
@@ -163,27 +224,26 @@ def get_following(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     # Get following with pagination
-    following_query = db.session.query(User).join(
+    following_query = db.session.query(User).options(load_only(User.id, User.username, User.created_at)).join(
         Follow, User.id == Follow.followed_id
-    ).filter(Follow.follower_id == user_id).order_by(Follow.timestamp.desc())
-    
-    paginated_following = following_query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    following_list = []
-    for followed_user in paginated_following.items:
-        following_list.append({
-            'id': followed_user.id,
-            'username': followed_user.username,
-            'joined_date': followed_user.created_at.isoformat() if hasattr(followed_user, 'created_at') else None
-        })
-    
-    return jsonify({
-        'following': following_list,
-        'pagination': {
+    ).filter(Follow.follower_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        # Seek on the follow row's (timestamp, id), which the result rows carry along
+        rows, next_cursor = keyset_page(following_query.add_columns(Follow.timestamp, Follow.id),
+                                        [Follow.timestamp, Follow.id], cursor, per_page,
+                                        lambda row: (row[1], row[2]))
+        users = [row[0] for row in rows]
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_following = following_query.order_by(Follow.timestamp.desc()).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        users = paginated_following.items
+        pagination = {
             'page': paginated_following.page,
             'per_page': paginated_following.per_page,
             'total': paginated_following.total,
@@ -192,7 +252,13 @@ def get_following(user_id):
             'has_prev': paginated_following.has_prev,
             'next_num': paginated_following.next_num if paginated_following.has_next else None,
             'prev_num': paginated_following.prev_num if paginated_following.has_prev else None
-        },
+        }
+    
+    following_list = _serialize_users(users, selection)
+    
+    return jsonify({
+        'following': following_list,
+        'pagination': pagination,
         'user': {
             'id': user.id,
             'username': user.username
@@ -200,6 +266,7 @@ def get_following(user_id):
     }), 200
 
 @follows_bp.route('/stats/<int:user_id>', methods=['GET'])
+@conditional(lambda user_id: [f'follows:{user_id}'])
 def get_follow_stats(user_id):
     """Get follower and following counts for a user"""
     # Check if user exists
@@ -208,8 +275,7 @@ def get_follow_stats(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     # Get counts
-    followers_count = Follow.query.filter_by(followed_id=user_id).count()
-    following_count = Follow.query.filter_by(follower_id=user_id).count()
+    followers_count, following_count = follow_counts(user_id)
     
     return jsonify({
         'user': {
@@ -219,3 +285,82 @@ def get_follow_stats(user_id):
         'followers_count': followers_count,
         'following_count': following_count
     }), 200
+
+@follows_bp.route('/mutuals/<int:user_id>', methods=['GET'])
+@query_budget(4)
+def get_mutuals(user_id):
+    """Get users who follow this user and whom this user follows back"""
+    limit = request.args.get('limit', 50, type=int)
+    if limit < 1:
+        return jsonify({'error': 'Limit must be 1 or greater'}), 400
+    limit = min(limit, 200)
+
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+
+    graph = ready_follow_graph()
+    if graph is not None:
+        mutual_ids = graph.mutuals(user_id)
+        total = len(mutual_ids)
+        mutual_ids = mutual_ids[:limit]
+    else:
+        mutuals_query = db.session.query(Follow.followed_id).filter(
+            Follow.follower_id == user_id,
+            Follow.followed_id.in_(db.session.query(Follow.follower_id).filter(Follow.followed_id == user_id))
+        )
+        total = mutuals_query.count()
+        mutual_ids = [row[0] for row in mutuals_query.order_by(Follow.followed_id).limit(limit)]
+
+    usernames = _usernames(mutual_ids)
+    return jsonify({
+        'user': {
+            'id': user.id,
+            'username': user.username
+        },
+        'mutuals': [{'id': mutual_id, 'username': usernames.get(mutual_id)} for mutual_id in mutual_ids],
+        'total': total
+    }), 200
+
+@follows_bp.route('/suggestions', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def get_follow_suggestions():
+    """Suggest people followed by the people the current user follows"""
+    user_id = int(get_jwt_identity())
+    limit = request.args.get('limit', 10, type=int)
+    if limit < 1:
+        return jsonify({'error': 'Limit must be 1 or greater'}), 400
+    limit = min(limit, 50)
+
+    graph = ready_follow_graph()
+    if graph is not None:
+        ranked = graph.suggestions(user_id, limit)
+    else:
+        friends = db.session.query(Follow.followed_id).filter(Follow.follower_id == user_id)
+        second_hop = db.aliased(Follow)
+        ranked = db.session.query(second_hop.followed_id, func.count()).filter(
+            second_hop.follower_id.in_(friends),
+            second_hop.followed_id != user_id,
+            second_hop.followed_id.notin_(friends)
+        ).group_by(second_hop.followed_id).order_by(
+            func.count().desc(), second_hop.followed_id
+        ).limit(limit).all()
+
+    usernames = _usernames([candidate_id for candidate_id, _ in ranked])
+    return jsonify({
+        'suggestions': [{
+            'id': candidate_id,
+            'username': usernames.get(candidate_id),
+            'mutual_connections': score
+        } for candidate_id, score in ranked if candidate_id in usernames]
+    }), 200
+
+@follows_bp.route('/graph/stats', methods=['GET'])
+@monitoring_required
+def get_follow_graph_stats():
+    """Report the in-memory follow graph's size and memory use"""
+    graph = get_follow_graph()
+    if graph.ready:
+        graph.sync()
+    return jsonify(graph.stats()), 200
@@ -0,0 +1,222 @@
+# app/instrumentation.py
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL instrumentation.
+#
+# Engine events time every statement the current thread executes and feed
+# it to whichever QueryStats recorders are active on that thread: one per
+# request when SQL_INSTRUMENTATION is on, plus any opened by
+# assert_max_queries() or @query_budget. A request's query count, total
+# database time and slowest statements are returned as X-Query-Count and
+# Server-Timing headers and logged when the request looks suspicious.
+#
+# Statements are grouped by shape (bound values and the length of IN lists
+# ignored). The same shape running SQL_N_PLUS_ONE_THRESHOLD or more times
+# in one request is almost always a query inside a loop, i.e. an N+1.
+
+_PLACEHOLDER = r'(?:\?|%\(\w+\)s|%s|:\w+|\$\d+)'
+_IN_LIST_RE = re.compile(r'\(\s*' + _PLACEHOLDER + r'(?:\s*,\s*' + _PLACEHOLDER + r')+\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_SPACE_RE = re.compile(r'\s+')
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint or block ran more statements than its budget allows."""
+
+
+def statement_shape(statement):
+    """Statement text with IN lists, numbers and whitespace normalised."""
+    shape = _IN_LIST_RE.sub('(?)', statement)
+    shape = _NUMBER_RE.sub('N', shape)
+    return _SPACE_RE.sub(' ', shape).strip()
+
+
+class QueryStats:
+    """Statements recorded on one thread while this recorder was active."""
+
+    def __init__(self, keep_slowest=3, keep_statements=False):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.total_ms = 0.0
+        self.texts = Counter()  # shapes are only worked out when asked for
+        self.statements = [] if keep_statements else None
+        self._slowest = []  # min-heap of (ms, sequence, statement)
+
+    def record(self, statement, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.texts[statement] += 1
+        if self.statements is not None:
+            self.statements.append(statement)
+        if self.keep_slowest:
+            entry = (elapsed_ms, self.count, statement)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self):
+        """[(ms, statement)], slowest first."""
+        return [(round(ms, 3), statement) for ms, _, statement in sorted(self._slowest, reverse=True)]
+
+    def repeated(self, threshold):
+        """[(shape, count)] for shapes run at least threshold times: probable N+1s."""
+        shapes = Counter()
+        for statement, count in self.texts.items():
+            shapes[statement_shape(statement)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count >= threshold]
+
+    def summary(self, threshold):
+        return {
+            'queries': self.count,
+            'db_ms': round(self.total_ms, 3),
+            'slowest': self.slowest(),
+            'n_plus_one': self.repeated(threshold)
+        }
+
+
+def _recorders():
+    recorders = getattr(_local, 'recorders', None)
+    if recorders is None:
+        recorders = _local.recorders = []
+    return recorders
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_local, 'recorders', None):
+        conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorders = getattr(_local, 'recorders', None)
+    started = conn.info.pop('query_started', None)
+    if not recorders or started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for recorder in recorders:
+        recorder.record(statement, elapsed_ms)
+
+
+def _install():
+    """Attach the engine listeners on first use, so they cost nothing until then."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _installed = True
+
+
+@contextmanager
+def recording(keep_slowest=3, keep_statements=False):
+    """Record the statements this thread executes inside the block."""
+    _install()
+    stats = QueryStats(keep_slowest=keep_slowest, keep_statements=keep_statements)
+    recorders = _recorders()
+    recorders.append(stats)
+    try:
+        yield stats
+    finally:
+        recorders.remove(stats)
+
+
+def _budget_message(label, limit, stats, threshold):
+    lines = [f'{label} ran {stats.count} queries (budget {limit})']
+    for shape, count in stats.repeated(threshold):
+        lines.append(f'  probable N+1, {count}x: {shape}')
+    if stats.statements is not None:
+        lines.extend(f'  {statement}' for statement in stats.statements)
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_max_queries(limit, threshold=None):
+    """Fail with QueryBudgetExceeded if the block runs more than limit statements.
+
+        with assert_max_queries(6):
+            client.get('/api/blogs')
+    """
+    threshold = threshold or current_app.config['SQL_N_PLUS_ONE_THRESHOLD']
+    with recording(keep_statements=True) as stats:
+        yield stats
+    if stats.count > limit:
+        raise QueryBudgetExceeded(_budget_message('Block', limit, stats, threshold))
+
+
+def query_budget(limit):
+    """Declare the most statements a view may run.
+
+    Over budget, SQL_QUERY_BUDGETS='raise' fails the request with
+    QueryBudgetExceeded and 'warn' logs it. 'off' skips the check and
+    records nothing; unset, it is 'raise' when TESTING and 'off' otherwise.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            mode = current_app.config['SQL_QUERY_BUDGETS'] or ('raise' if current_app.testing else 'off')
+            if mode == 'off':
+                return view(*args, **kwargs)
+            with recording(keep_slowest=0, keep_statements=mode == 'raise') as stats:
+                response = view(*args, **kwargs)
+            if stats.count > limit:
+                message = _budget_message(f'{request.method} {request.path}', limit, stats,
+                                          current_app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+                if mode == 'raise':
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def init_sql_instrumentation(app):
+    """Record every request's statements and report them in response headers."""
+    if not app.config['SQL_INSTRUMENTATION']:
+        return
+    _install()
+
+    @app.before_request
+    def start_query_stats():
+        g.request_started = time.perf_counter()
+        g.query_stats = QueryStats(keep_slowest=app.config['SQL_SLOWEST_STATEMENTS'])
+        _recorders().append(g.query_stats)
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        repeated = stats.repeated(threshold)
+        if app.config['SQL_INSTRUMENTATION_HEADERS']:
+            total_ms = (time.perf_counter() - g.request_started) * 1000
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['Server-Timing'] = (
+                f'db;dur={stats.total_ms:.3f};desc="{stats.count} queries", app;dur={total_ms:.3f}'
+            )
+            if repeated:
+                response.headers['X-Query-N-Plus-One'] = str(len(repeated))
+        if repeated or stats.total_ms >= app.config['SQL_SLOW_REQUEST_MS']:
+            app.logger.warning('SQL for %s %s: %s', request.method, request.path, stats.summary(threshold))
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(exc):
+        stats = g.pop('query_stats', None)
+        recorders = _recorders()
+        if stats is not None and stats in recorders:
+            recorders.remove(stats)
@@ -1,35 +1,76 @@
-from flask import Blueprint, jsonify
+from datetime import datetime
+from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import delete, exists, func, case, literal
 from .models import db, Like, CommentLike, Blog, Comment
+from .counters import bump_blog_counter
+from .trending import record_event
+from .caching import conditional, bump_versions
+from .metrics import LIKES_TOGGLED
+from .instrumentation import query_budget
+from .utils import dialect_insert
 
 likes_bp = Blueprint('likes', __name__)
 
+
+def toggle_like(model, values, conflict_columns):
+    """Flip one like row with single statements, safe against double taps.
+
+    Tries INSERT ... ON CONFLICT DO NOTHING RETURNING first; if the row was
+    already there it is removed with DELETE ... RETURNING. Returns
+    (liked, changed): changed is False when a concurrent request got there
+    first, so counters must not move.
+    """
+    table = model.__table__
+    statement = dialect_insert(table).values(timestamp=datetime.utcnow(), **values)\
+        .on_conflict_do_nothing(index_elements=conflict_columns)\
+        .returning(table.c.id)
+    if db.session.execute(statement).first() is not None:
+        return True, True
+    deleted = db.session.execute(
+        delete(table)
+        .where(*(table.c[column] == values[column] for column in conflict_columns))
+        .returning(table.c.id)
+    ).first()
+    return False, deleted is not None
+
+
+def toggle_comment_like_row(user_id, comment):
+    """toggle_like() for a comment; returns liked."""
+    liked, _ = toggle_like(CommentLike, {'user_id': user_id, 'comment_id': comment.id, 'blog_id': comment.blog_id},
+                           ['user_id', 'comment_id'])
+    db.session.commit()
+    LIKES_TOGGLED.inc('comment', 'liked' if liked else 'unliked')
+    return liked
+
 # ---------- Blog Likes ----------
 
 @likes_bp.route('/blog/<int:blog_id>', methods=['POST'])
 @jwt_required()
 def toggle_blog_like(blog_id):
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     blog = Blog.query.get_or_404(blog_id)
 
-    existing_like = Like.query.filter_by(user_id=user_id, blog_id=blog_id).first()
+    liked, changed = toggle_like(Like, {'user_id': user_id, 'blog_id': blog_id}, ['blog_id', 'user_id'])
+    if changed:
+        sign = 1 if liked else -1
+        bump_blog_counter(blog_id, 'like_count', sign)
+        record_event(blog_id, 'like', sign=sign)
+        bump_versions(f'likes:blog:{blog_id}', f'user:{blog.user_id}')
+    db.session.commit()
 
-    if existing_like:
-        db.session.delete(existing_like)
-        db.session.commit()
-        return jsonify({'message': 'Unliked blog'}), 200
-    else:
-        like = Like(user_id=user_id, blog_id=blog_id)
-        db.session.add(like)
-        db.session.commit()
+    if liked:
+        LIKES_TOGGLED.inc('blog', 'liked')
         return jsonify({'message': 'Liked blog'}), 201
+    LIKES_TOGGLED.inc('blog', 'unliked')
+    return jsonify({'message': 'Unliked blog'}), 200
 
 
 @likes_bp.route('/blog/<int:blog_id>', methods=['GET'])
+@conditional(lambda blog_id: [f'likes:blog:{blog_id}'])
 def get_blog_like_count(blog_id):
     blog = Blog.query.get_or_404(blog_id)
-    count = len(blog.likes)
-    return jsonify({'likes': count}), 200
+    return jsonify({'likes': blog.like_count}), 200
 
 
 # ---------- Comment Likes ----------
@@ -37,20 +78,12 @@ def get_blog_like_count(blog_id):
 @likes_bp.route('/comment/<int:comment_id>', methods=['POST'])
 @jwt_required()
 def toggle_comment_like(comment_id):
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     comment = Comment.query.get_or_404(comment_id)
 
-    existing_like = CommentLike.query.filter_by(user_id=user_id, comment_id=comment_id).first()
-
-    if existing_like:
-        db.session.delete(existing_like)
-        db.session.commit()
-        return jsonify({'message': 'Unliked comment'}), 200
-    else:
-        like = CommentLike(user_id=user_id, comment_id=comment_id, blog_id=comment.blog_id)
-        db.session.add(like)
-        db.session.commit()
+    if toggle_comment_like_row(user_id, comment):
         return jsonify({'message': 'Liked comment'}), 201
+    return jsonify({'message': 'Unliked comment'}), 200
 
 
 @likes_bp.route('/comment/<int:comment_id>', methods=['GET'])
@@ -58,3 +91,57 @@ def get_comment_like_count(comment_id):
     comment = Comment.query.get_or_404(comment_id)
     count = len(comment.likes)
     return jsonify({'likes': count}), 200
+
+
+# ---------- Batch status ----------
+
+def _id_list(data, key, limit):
+    ids = data.get(key, [])
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError(f'{key} must be a list of integers')
+    if len(ids) > limit:
+        raise ValueError(f'At most {limit} {key} per request')
+    return list(dict.fromkeys(ids))
+
+
+@likes_bp.route('/status', methods=['POST'])
+@jwt_required(optional=True)
+@query_budget(2)
+def get_like_status():
+    """Like counts and the caller's likes for up to LIKE_STATUS_MAX_IDS blogs and comments"""
+    data = request.get_json(silent=True) or {}
+    limit = current_app.config['LIKE_STATUS_MAX_IDS']
+    try:
+        blog_ids = _id_list(data, 'blog_ids', limit)
+        comment_ids = _id_list(data, 'comment_ids', limit)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    if not blog_ids and not comment_ids:
+        return jsonify({'error': 'Send blog_ids and/or comment_ids'}), 400
+
+    identity = get_jwt_identity()
+    user_id = int(identity) if identity is not None else None
+    result = {}
+
+    if blog_ids:
+        # Counters are denormalized on blog; the caller's like is an EXISTS on (blog_id, user_id)
+        liked = exists().where(Like.blog_id == Blog.id, Like.user_id == user_id) if user_id else literal(False)
+        rows = db.session.query(Blog.id, Blog.like_count, liked)\
+                         .filter(Blog.id.in_(blog_ids), Blog.is_draft == False).all()
+        result['blogs'] = {
+            'likes': {str(blog_id): count for blog_id, count, _ in rows},
+            'liked': [blog_id for blog_id, _, is_liked in rows if is_liked]
+        }
+
+    if comment_ids:
+        liked = func.max(case((CommentLike.user_id == user_id, 1), else_=0)) if user_id else literal(0)
+        rows = db.session.query(Comment.id, func.count(CommentLike.id), liked)\
+                         .outerjoin(CommentLike, CommentLike.comment_id == Comment.id)\
+                         .filter(Comment.id.in_(comment_ids))\
+                         .group_by(Comment.id).all()
+        result['comments'] = {
+            'likes': {str(comment_id): count for comment_id, count, _ in rows},
+            'liked': [comment_id for comment_id, _, is_liked in rows if is_liked]
+        }
+
+    return jsonify(result), 200
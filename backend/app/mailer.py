@@ -0,0 +1,406 @@
+# app/mailer.py
+import atexit
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_mail import Message, BadHeaderError
+from sqlalchemy import update, func, or_, and_, bindparam
+from . import mail
+from .models import db, EmailOutbox
+
+# Transactional email outbox.
+#
+# Request handlers call queue_email() inside their own transaction (so an
+# email exists exactly when the signup or reset that caused it committed)
+# and notify() after commit. A small pool of worker threads claims due rows
+# in batches, sends each batch over an SMTP connection the worker keeps open
+# between batches, and records the outcome. Failed sends are retried with
+# exponential backoff until MAIL_OUTBOX_MAX_ATTEMPTS, then marked 'failed'.
+#
+# Claims are optimistic: a worker flips candidate rows to 'sending' with an
+# UPDATE that re-checks they are still claimable, so concurrent workers (in
+# this or any other process) never share a row. A claim older than
+# MAIL_OUTBOX_CLAIM_TIMEOUT is assumed to belong to a dead worker and is
+# taken over, which makes delivery at-least-once.
+
+# Errors that only condemn the message being sent; any other SMTP or socket
+# error means the connection itself is unusable.
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+THROUGHPUT_WINDOW = 60  # seconds
+
+
+def describe_error(error):
+    """Exception class and SMTP reply code, for last_error.
+
+    The exception text is left out: refusals carry the recipient and
+    sender addresses.
+    """
+    code = getattr(error, 'smtp_code', None)
+    if code is None and isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code = next(iter(error.recipients.values()))[0]
+    name = type(error).__name__
+    return f'{name} {code}' if code is not None else name
+
+
+def queue_email(to, subject, html_body):
+    """Add an email to the outbox in the caller's transaction; call notify() after commit."""
+    message = EmailOutbox(recipient=to, subject=subject, html_body=html_body, next_attempt_at=datetime.utcnow())
+    db.session.add(message)
+    return message
+
+
+class SmtpSession:
+    """A worker's SMTP connection, reused across batches until it idles out or breaks."""
+
+    def __init__(self, idle_timeout):
+        self.idle_timeout = idle_timeout
+        self.connects = 0
+        self._connection = None
+        self._last_used = 0.0
+
+    def connection(self):
+        now = time.monotonic()
+        if self._connection is not None and now - self._last_used > self.idle_timeout:
+            # Servers drop idle clients; reconnecting is cheaper than a failed send
+            self.close()
+        if self._connection is None:
+            connection = mail.connect()
+            connection.__enter__()
+            self._connection = connection
+            self.connects += 1
+        self._last_used = now
+        return self._connection
+
+    def close(self):
+        if self._connection is None:
+            return
+        connection, self._connection = self._connection, None
+        try:
+            connection.__exit__(None, None, None)
+        except (smtplib.SMTPException, OSError):
+            pass
+
+
+class MailOutbox:
+    """Background delivery of EmailOutbox rows by a pool of worker threads.
+
+    Workers start with the app (or, in a forked server worker or under the
+    CLI, on its first request or notify()) and then poll every
+    poll_interval seconds for retries and mail queued by other processes,
+    so mail left pending by a restart still goes out. With
+    background=False, notify() delivers synchronously instead.
+    """
+
+    def __init__(self, app, workers=2, batch_size=50, poll_interval=5.0, max_attempts=8,
+                 backoff_base=30, backoff_max=3600, claim_timeout=300, smtp_idle_timeout=60,
+                 background=True):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.claim_timeout = claim_timeout
+        self.smtp_idle_timeout = smtp_idle_timeout
+        self.background = background
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._threads = []
+        self._sessions = []
+        self._pid = None
+        self._recent_sends = deque()
+
+        self.sent_total = 0
+        self.retried_total = 0
+        self.failed_total = 0
+        self.batch_count = 0
+        self.last_batch_ms = 0.0
+        self.last_error = None
+
+    def notify(self):
+        """Signal that new mail was committed."""
+        if not self.background:
+            self.deliver_pending()
+            return
+        self._ensure_workers()
+        self._wakeup.set()
+
+    def start(self):
+        """Start this process's workers, unless already running."""
+        if self.background:
+            self._ensure_workers()
+
+    def backoff(self, attempts):
+        """Seconds to wait before attempt number attempts + 1, with jitter."""
+        delay = min(self.backoff_base * 2 ** max(attempts - 1, 0), self.backoff_max)
+        return delay * random.uniform(0.75, 1.25)
+
+    def deliver_pending(self, session=None):
+        """Claim and send batches until nothing is due. Returns the number sent."""
+        own_session = session is None
+        if own_session:
+            session = SmtpSession(self.smtp_idle_timeout)
+        sent = 0
+        try:
+            while True:
+                with self.app.app_context():
+                    claimed = self._claim()
+                    if claimed is None:
+                        break
+                    rows, token = claimed
+                    if rows:
+                        sent += self._deliver(rows, token, session)
+        finally:
+            if own_session:
+                session.close()
+        return sent
+
+    def _claim(self):
+        """Claim up to batch_size due rows. Returns None when nothing is due."""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.claim_timeout)
+        claimable = or_(
+            and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+            and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < stale)
+        )
+        ids = [row[0] for row in db.session.query(EmailOutbox.id)
+                                           .filter(claimable)
+                                           .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+                                           .limit(self.batch_size).all()]
+        if not ids:
+            db.session.rollback()
+            return None
+
+        # Rows another worker claimed since the SELECT no longer match `claimable`
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(ids), claimable)
+            .values(status='sending', claim_token=token, claimed_at=now, attempts=EmailOutbox.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        rows = db.session.query(EmailOutbox.id, EmailOutbox.recipient, EmailOutbox.subject,
+                                EmailOutbox.html_body, EmailOutbox.attempts)\
+                         .filter(EmailOutbox.claim_token == token)\
+                         .order_by(EmailOutbox.id).all()
+        return rows, token
+
+    def _deliver(self, rows, token, session):
+        started = time.perf_counter()
+        sender = current_app.config['MAIL_DEFAULT_SENDER']
+        sent_ids, retries, failures = [], [], []
+
+        for index, row in enumerate(rows):
+            try:
+                session.connection().send(
+                    Message(row.subject, recipients=[row.recipient], html=row.html_body, sender=sender)
+                )
+            except BadHeaderError:
+                failures.append((row, 'Bad header in subject or recipient'))
+            except MESSAGE_ERRORS as e:
+                retries.append((row, describe_error(e)))
+            except (smtplib.SMTPException, OSError) as e:
+                # The connection is gone: drop it and retry the rest of the batch later
+                session.close()
+                retries.extend((pending, describe_error(e)) for pending in rows[index:])
+                break
+            else:
+                sent_ids.append(row.id)
+
+        self._finish(token, sent_ids, retries, failures)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            now = time.monotonic()
+            self._recent_sends.append((now, len(sent_ids)))
+            while self._recent_sends and now - self._recent_sends[0][0] > THROUGHPUT_WINDOW:
+                self._recent_sends.popleft()
+            self.sent_total += len(sent_ids)
+            self.batch_count += 1
+            self.last_batch_ms = elapsed_ms
+            if retries or failures:
+                self.last_error = (retries or failures)[-1][1]
+        return len(sent_ids)
+
+    def _finish(self, token, sent_ids, retries, failures):
+        """Record the batch outcome, skipping rows whose claim was taken over."""
+        now = datetime.utcnow()
+        table = EmailOutbox.__table__
+        mine = table.c.claim_token == token
+
+        if sent_ids:
+            db.session.execute(
+                table.update().where(table.c.id.in_(sent_ids), mine)
+                .values(status='sent', sent_at=now, claim_token=None, last_error=None)
+            )
+
+        outcomes = []
+        for row, error in retries:
+            if row.attempts >= self.max_attempts:
+                failures.append((row, error))
+                continue
+            outcomes.append({'b_id': row.id, 'status': 'pending', 'error': error[:1000],
+                             'next_attempt_at': now + timedelta(seconds=self.backoff(row.attempts))})
+        outcomes.extend({'b_id': row.id, 'status': 'failed', 'error': error[:1000], 'next_attempt_at': now}
+                        for row, error in failures)
+        if outcomes:
+            db.session.execute(
+                table.update().where(table.c.id == bindparam('b_id'), mine)
+                .values(status=bindparam('status'), last_error=bindparam('error'),
+                        next_attempt_at=bindparam('next_attempt_at'), claim_token=None),
+                outcomes
+            )
+        db.session.commit()
+
+        failed = sum(1 for outcome in outcomes if outcome['status'] == 'failed')
+        with self._lock:
+            self.retried_total += len(outcomes) - failed
+            self.failed_total += failed
+
+    def _ensure_workers(self):
+        pid = os.getpid()
+        if self._threads and self._pid == pid:
+            return
+        with self._lock:
+            if self._threads and self._pid == pid:
+                return
+            # First use, or a forked worker whose parent started the threads
+            self._pid = pid
+            self._stopped = False
+            self._sessions = [SmtpSession(self.smtp_idle_timeout) for _ in range(self.workers)]
+            self._threads = [
+                threading.Thread(target=self._run, args=(session,), name=f'mail-outbox-{n}', daemon=True)
+                for n, session in enumerate(self._sessions)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self, session):
+        try:
+            while not self._stopped:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                if self._stopped:
+                    break
+                try:
+                    self.deliver_pending(session)
+                except Exception:
+                    self.app.logger.exception('Mail outbox delivery failed')
+        finally:
+            session.close()
+
+    def stop(self):
+        """Stop the workers; undelivered mail stays queued in the database."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout=10)
+
+    def stats(self):
+        """Queue lag and delivery throughput, for monitoring."""
+        with self.app.app_context():
+            by_status = dict(db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))
+                                       .group_by(EmailOutbox.status).all())
+            oldest = db.session.query(func.min(EmailOutbox.created_at))\
+                               .filter(EmailOutbox.status.in_(['pending', 'sending'])).scalar()
+        lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            recent = sum(count for at, count in self._recent_sends if now - at <= THROUGHPUT_WINDOW)
+            return {
+                'pending': by_status.get('pending', 0),
+                'sending': by_status.get('sending', 0),
+                'sent': by_status.get('sent', 0),
+                'failed': by_status.get('failed', 0),
+                'queue_lag_seconds': round(lag, 3),
+                'sent_last_minute': recent,
+                'sent_per_second': round(recent / THROUGHPUT_WINDOW, 3),
+                'sent_total': self.sent_total,
+                'retried_total': self.retried_total,
+                'failed_total': self.failed_total,
+                'batch_count': self.batch_count,
+                'last_batch_ms': round(self.last_batch_ms, 3),
+                'last_error': self.last_error,
+                'smtp_connects': sum(session.connects for session in self._sessions),
+                'workers': self.workers if self.background else 0
+            }
+
+
+def init_mail_outbox(app):
+    """Create the app's MailOutbox and stop its workers at shutdown."""
+    outbox = MailOutbox(
+        app,
+        workers=app.config['MAIL_OUTBOX_WORKERS'],
+        batch_size=app.config['MAIL_OUTBOX_BATCH_SIZE'],
+        poll_interval=app.config['MAIL_OUTBOX_POLL_INTERVAL'],
+        max_attempts=app.config['MAIL_OUTBOX_MAX_ATTEMPTS'],
+        backoff_base=app.config['MAIL_OUTBOX_BACKOFF_BASE'],
+        backoff_max=app.config['MAIL_OUTBOX_BACKOFF_MAX'],
+        claim_timeout=app.config['MAIL_OUTBOX_CLAIM_TIMEOUT'],
+        smtp_idle_timeout=app.config['MAIL_OUTBOX_SMTP_IDLE_TIMEOUT'],
+        background=app.config['MAIL_OUTBOX_ENABLED']
+    )
+    app.extensions['mail_outbox'] = outbox
+    atexit.register(outbox.stop)
+
+    # CLI commands (migrations, deliver-outbox) should not start pollers
+    if click.get_current_context(silent=True) is None:
+        outbox.start()
+    app.before_request(outbox.start)
+    return outbox
+
+
+def get_outbox():
+    return current_app.extensions['mail_outbox']
+
+
+@click.command('deliver-outbox')
+@with_appcontext
+def deliver_outbox_command():
+    """Send every due email in the outbox once and exit."""
+    outbox = get_outbox()
+    sent = outbox.deliver_pending()
+    stats = outbox.stats()
+    click.echo(f"Sent {sent} email(s); {stats['pending']} pending, {stats['failed']} failed")
+
+
+@click.command('smtp-sink')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8025, show_default=True)
+def smtp_sink_command(host, port):
+    """Run a local SMTP server that prints messages instead of delivering them.
+
+    For development and tests: point MAIL_SERVER/MAIL_PORT at it and set
+    MAIL_USE_TLS=false. Requires aiosmtpd.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Debugging
+    except ImportError:
+        raise click.ClickException('smtp-sink requires aiosmtpd (pip install aiosmtpd)')
+
+    controller = Controller(Debugging(), hostname=host, port=port)
+    controller.start()
+    click.echo(f'SMTP sink listening on {host}:{port}; Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
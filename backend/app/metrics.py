@@ -0,0 +1,396 @@
+# app/metrics.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from flask import Blueprint, Response, current_app, g, request
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from .models import db
+from .utils import admin_required
+
+# Prometheus metrics, served as text from /metrics.
+#
+# Every request is counted and timed per blueprint and endpoint, along with
+# its response size; database pool checkouts are timed per bind, and a few
+# application counters (likes toggled, views recorded) are bumped where the
+# work happens. Recording is a dict update under one lock per call, cheap
+# enough to leave on permanently.
+#
+# With several worker processes each one only sees its own requests. When
+# METRICS_DIR is set, every process writes a snapshot of its metrics there
+# (as <pid>.json, every METRICS_FLUSH_INTERVAL seconds and at exit) and
+# /metrics adds up all the snapshots, so whichever worker answers the
+# scrape reports the whole server. Counters and histograms of exited
+# workers are kept; their gauges are dropped. Empty the directory when the
+# server starts, as with prometheus_client's multiprocess mode.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Metric:
+    """A counter, gauge or histogram and its value for each set of label values."""
+
+    def __init__(self, registry, name, help, kind, labelnames=(), buckets=None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self.values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self.registry.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def set(self, value, *labelvalues):
+        with self.registry.lock:
+            self.values[labelvalues] = value
+
+    def observe(self, value, *labelvalues):
+        """Histograms: one count per bucket (the last is +Inf), then the sum."""
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            row = self.values.get(labelvalues)
+            if row is None:
+                row = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    def describe(self):
+        return {'help': self.help, 'kind': self.kind, 'labelnames': list(self.labelnames),
+                'buckets': list(self.buckets) if self.buckets else None}
+
+
+class Registry:
+    """The metrics of this process, plus snapshot files for multi-process servers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = {}
+        self.directory = None
+        self.flush_interval = 5.0
+        self._thread = None
+        self._pid = None
+
+    def _add(self, name, help, kind, labelnames=(), buckets=None):
+        metric = self.metrics[name] = Metric(self, name, help, kind, labelnames, buckets)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(name, help, 'counter', labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(name, help, 'gauge', labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(name, help, 'histogram', labelnames, buckets)
+
+    def on_collect(self, key, callback):
+        """Run callback (to set gauges) before every snapshot; key replaces an earlier one."""
+        self.collectors[key] = callback
+
+    def _collect(self):
+        for callback in list(self.collectors.values()):
+            try:
+                callback()
+            except Exception:
+                pass  # a broken collector must not break the scrape
+
+    def snapshot(self):
+        self._collect()
+        with self.lock:
+            return {name: dict(metric.describe(), samples=[
+                [list(labels), list(value) if isinstance(value, list) else value]
+                for labels, value in metric.values.items()
+            ]) for name, metric in self.metrics.items()}
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def _after_fork(self):
+        # The child starts counting from zero under its own pid; the parent's
+        # numbers are still reported from the parent's snapshot.
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric.values.clear()
+        self._thread = None
+
+    # ---------- Multi-process snapshots ----------
+
+    def write_snapshot(self):
+        if not self.directory:
+            return
+        pid = os.getpid()
+        path = os.path.join(self.directory, f'{pid}.json')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'pid': pid, 'metrics': self.snapshot()}, f)
+        os.replace(temp_path, path)
+
+    def ensure_writer(self):
+        pid = os.getpid()
+        if not self.directory or (self._thread is not None and self._pid == pid):
+            return
+        with self.lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.write_snapshot()
+            except OSError:
+                pass
+
+    def gather(self):
+        """[(name, description, [(labelnames, labelvalues, value)])] over every process."""
+        if not self.directory:
+            return [(name, description, [(description['labelnames'], labels, value)
+                                         for labels, value in description['samples']])
+                    for name, description in self.snapshot().items()]
+
+        self.write_snapshot()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # exited mid-write or not ours
+            alive = _process_alive(snapshot['pid'])
+            for name, description in snapshot['metrics'].items():
+                entry = merged.setdefault(name, (description, {}))
+                samples = entry[1]
+                for labels, value in description['samples']:
+                    if description['kind'] == 'gauge':
+                        if alive:
+                            samples[(tuple(labels) + (str(snapshot['pid']),))] = value
+                        continue
+                    key = tuple(labels)
+                    if isinstance(value, list):
+                        previous = samples.get(key)
+                        samples[key] = value if previous is None else [a + b for a, b in zip(previous, value)]
+                    else:
+                        samples[key] = samples.get(key, 0) + value
+        gathered = []
+        for name, (description, samples) in sorted(merged.items()):
+            labelnames = description['labelnames']
+            if description['kind'] == 'gauge':
+                labelnames = labelnames + ['pid']
+            gathered.append((name, description, [(labelnames, list(labels), value)
+                                                 for labels, value in samples.items()]))
+        return gathered
+
+
+def _process_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+REGISTRY = Registry()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork)
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'HTTP requests by route and status.',
+    ['blueprint', 'endpoint', 'method', 'status'])
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time spent handling requests.',
+    ['blueprint', 'endpoint', 'method'])
+HTTP_RESPONSE_SIZE = REGISTRY.histogram(
+    'http_response_size_bytes', 'Response body sizes, for responses with a known length.',
+    ['blueprint', 'endpoint', 'method'], buckets=SIZE_BUCKETS)
+HTTP_EXCEPTIONS = REGISTRY.counter(
+    'http_request_exceptions_total', 'Requests that raised an unhandled exception.',
+    ['blueprint', 'endpoint', 'method', 'exception'])
+HTTP_IN_PROGRESS = REGISTRY.gauge(
+    'http_requests_in_progress', 'Requests being handled right now.')
+
+DB_POOL_CHECKOUT = REGISTRY.histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a database connection.',
+    ['bind'], buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0))
+DB_POOL_TIMEOUTS = REGISTRY.counter(
+    'db_pool_checkout_timeouts_total', 'Connection checkouts that gave up waiting.', ['bind'])
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    'db_pool_connections', 'Pooled connections by state.', ['bind', 'state'])
+
+LIKES_TOGGLED = REGISTRY.counter(
+    'likes_toggled_total', 'Likes added or removed.', ['target', 'action'])
+VIEWS_RECORDED = REGISTRY.counter(
+    'blog_views_total', 'Blog views, by whether they were recorded or inside the cooldown.', ['result'])
+VIEW_BUFFER_DEPTH = REGISTRY.gauge(
+    'blog_view_buffer_depth', 'Views queued but not yet written.')
+PASSWORD_HASHES_IN_FLIGHT = REGISTRY.gauge(
+    'password_hashes_in_flight', 'Password hashes queued or running.')
+
+
+def _labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = ('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+               for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(gathered):
+    """Prometheus text exposition format."""
+    lines = []
+    for name, description, samples in gathered:
+        lines.append(f"# HELP {name} {description['help']}")
+        lines.append(f"# TYPE {name} {description['kind']}")
+        for labelnames, labelvalues, value in sorted(samples, key=lambda sample: sample[1]):
+            if description['kind'] != 'histogram':
+                lines.append(f'{name}{_labels(labelnames, labelvalues)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(description['buckets'] + [float('inf')], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labelnames, labelvalues, ('le', _number(float(bound))))} {cumulative}")
+            lines.append(f'{name}_sum{_labels(labelnames, labelvalues)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labelnames, labelvalues)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _has_metrics_token():
+    token = current_app.config['METRICS_TOKEN']
+    return bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+
+
+def monitoring_required(view):
+    """Allow scrapers presenting METRICS_TOKEN, and admins (ADMIN_USERNAMES)."""
+    admin_view = admin_required(view)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if _has_metrics_token():
+            return view(*args, **kwargs)
+        return admin_view(*args, **kwargs)
+    return wrapper
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint"""
+    if current_app.config['METRICS_TOKEN'] and not _has_metrics_token():
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    response = Response(render(REGISTRY.gather()), content_type=CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _time_checkouts(engine, bind):
+    """Time the engine's pool checkouts (including opening a new connection)."""
+    if getattr(engine, '_checkout_timed', False):
+        return
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.inc(bind)
+            raise
+        finally:
+            DB_POOL_CHECKOUT.observe(time.perf_counter() - started, bind)
+
+    engine.raw_connection = timed_raw_connection
+    engine._checkout_timed = True
+
+
+def init_metrics(app):
+    """Record request, pool and application metrics and serve them at /metrics."""
+    if not app.config['METRICS_ENABLED']:
+        return
+    REGISTRY.directory = app.config['METRICS_DIR']
+    REGISTRY.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+    if REGISTRY.directory:
+        os.makedirs(REGISTRY.directory, exist_ok=True)
+        atexit.register(REGISTRY.write_snapshot)
+
+    with app.app_context():
+        engines = {bind or 'default': engine for bind, engine in db.engines.items()}
+    for bind, engine in engines.items():
+        _time_checkouts(engine, bind)
+
+    def collect_pools():
+        for bind, engine in engines.items():
+            pool = engine.pool
+            if hasattr(pool, 'checkedout'):
+                DB_POOL_CONNECTIONS.set(pool.checkedout(), bind, 'checked_out')
+            if hasattr(pool, 'checkedin'):
+                DB_POOL_CONNECTIONS.set(pool.checkedin(), bind, 'idle')
+            if hasattr(pool, 'overflow'):
+                DB_POOL_CONNECTIONS.set(max(pool.overflow(), 0), bind, 'overflow')
+
+    def collect_queues():
+        buffer = app.extensions.get('view_buffer')
+        if buffer is not None:
+            VIEW_BUFFER_DEPTH.set(buffer.stats()['queue_depth'])
+        hasher = app.extensions.get('password_hasher')
+        if hasher is not None:
+            PASSWORD_HASHES_IN_FLIGHT.set(hasher.in_flight)
+
+    REGISTRY.on_collect('pools', collect_pools)
+    REGISTRY.on_collect('queues', collect_queues)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = g.metrics_in_progress = time.perf_counter()
+        HTTP_IN_PROGRESS.inc(amount=1)
+        REGISTRY.ensure_writer()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None or request.blueprint == 'metrics':
+            return response
+        blueprint, endpoint = request.blueprint or '', request.endpoint or 'unmatched'
+        HTTP_REQUESTS.inc(blueprint, endpoint, request.method, str(response.status_code))
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, blueprint, endpoint, request.method)
+        if response.content_length is not None:
+            HTTP_RESPONSE_SIZE.observe(response.content_length, blueprint, endpoint, request.method)
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        if g.pop('metrics_in_progress', None) is not None:
+            HTTP_IN_PROGRESS.inc(amount=-1)
+        if exc is not None:
+            HTTP_EXCEPTIONS.inc(request.blueprint or '', request.endpoint or 'unmatched',
+                                request.method, type(exc).__name__)
+
+    app.register_blueprint(metrics_bp)
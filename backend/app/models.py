@@ -1,5 +1,6 @@
-from . import db, bcrypt
+from . import db
 from datetime import datetime
+from .passwords import hash_password, verify_password, password_needs_rehash
 from flask_login import UserMixin
 
 # Inherit from UserMixin to integrate with Flask-Login
@@ -14,12 +15,16 @@ class User(db.Model, UserMixin):
     is_verified = db.Column(db.Boolean, nullable=False, default=False)
 
     def set_password(self, password):
-        """Hashes the password using Bcrypt."""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hashes the password using Bcrypt (in the hashing process pool)."""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Checks the password against the stored Bcrypt hash."""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash uses a different cost factor than is configured."""
+        return password_needs_rehash(self.password_hash)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -38,13 +43,25 @@ class Tag(db.Model):
 class Blog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    # Deferred: only loaded when accessed or undefer()ed; listings use excerpt
+    content = db.deferred(db.Column(db.Text, nullable=False))
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     category = db.Column(db.String(50), nullable=True)  # New field
     is_draft = db.Column(db.Boolean, default=False)
     is_archived = db.Column(db.Boolean, default=False)
 
+    # Denormalized counters, maintained by the like/view/comment write paths
+    # (see app/counters.py) and rebuilt with `flask reconcile-counters`
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Derived from content whenever it is written (see app/excerpts.py) and
+    # filled for older rows with `flask backfill-excerpts`
+    excerpt = db.Column(db.String(255), nullable=True)
+    word_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reading_time = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # minutes
 
     # Relationship with tags
     tags = db.relationship('Tag', secondary=blog_tags, backref=db.backref('blogs', lazy='dynamic'))
@@ -57,6 +74,8 @@ class Blog(db.Model):
 
     __table_args__ = (
         db.Index('idx_blog_user', 'user_id'),
+        db.Index('idx_blog_timestamp', 'timestamp', 'id'),  # keyset pagination
+        db.Index('idx_blog_user_timestamp', 'user_id', 'timestamp', 'id')  # per-author feed streams
     )
 
 class Like(db.Model):
@@ -92,7 +111,9 @@ class Comment(db.Model):
     __table_args__ = (
         db.Index('idx_comment_blog', 'blog_id'),
         db.Index('idx_comment_user', 'user_id'),
-        db.Index('idx_comment_parent', 'parent_id')
+        db.Index('idx_comment_parent', 'parent_id'),
+        db.Index('idx_comment_blog_thread', 'blog_id', 'parent_id', 'timestamp'),
+        db.Index('idx_comment_parent_timestamp', 'parent_id', 'timestamp')
     )
 
     @property
@@ -147,6 +168,85 @@ class BlogView(db.Model):
     blog = db.relationship('Blog', backref='views')
     user = db.relationship('User', backref='blog_views')
 
+    __table_args__ = (
+        db.Index('idx_blog_view_blog', 'blog_id'),  # per-blog counts (reconcile-counters)
+        db.Index('idx_blog_view_user_timestamp', 'user_id', 'timestamp'),  # a user's recent views (recommendations)
+    )
+
+class TrendingScore(db.Model):
+    """Time-decayed trending score per blog (see app/trending.py).
+
+    score is expressed relative to epoch: an event of weight w at time t adds
+    w * 2 ** ((t - epoch) / half_life), so rows sharing an epoch sort in
+    decayed order without ever being rewritten. Rebasing moves every row to
+    a newer epoch to keep the numbers small.
+    """
+    __tablename__ = 'blog_trending_score'
+    blog_id = db.Column(db.Integer, db.ForeignKey('blog.id', ondelete="CASCADE"), primary_key=True)
+    category = db.Column(db.String(50), nullable=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    epoch = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_trending_score', 'score', 'blog_id'),
+        db.Index('idx_trending_category_score', 'category', 'score', 'blog_id')
+    )
+
+class TrendingMeta(db.Model):
+    """The epoch new trending increments are expressed in; a single row with id 1 (see app/trending.py)"""
+    __tablename__ = 'trending_meta'
+    id = db.Column(db.Integer, primary_key=True)
+    epoch = db.Column(db.DateTime, nullable=False)
+
+class EmailOutbox(db.Model):
+    """An email waiting for (or done with) delivery by the outbox workers (see app/mailer.py)"""
+    __tablename__ = 'email_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True)  # Set by the worker currently sending it
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_email_outbox_status_due', 'status', 'next_attempt_at'),
+        db.Index('idx_email_outbox_claim', 'claim_token')
+    )
+
+class VersionStamp(db.Model):
+    """Change counter for a cacheable entity such as 'blogs' or 'user:42' (see app/caching.py)"""
+    __tablename__ = 'version_stamp'
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class FeedEntry(db.Model):
+    """A blog fanned out to a follower's home timeline inbox (see app/feed.py)"""
+    __tablename__ = 'feed_inbox'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)  # Inbox owner
+    blog_id = db.Column(db.Integer, db.ForeignKey('blog.id', ondelete="CASCADE"), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)  # Copy of the blog's timestamp, the feed sort key
+
+    __table_args__ = (
+        db.Index('idx_feed_inbox_user_timestamp', 'user_id', 'timestamp', 'blog_id'),
+        db.Index('idx_feed_inbox_user_author', 'user_id', 'author_id'),
+        db.Index('idx_feed_inbox_blog', 'blog_id')
+    )
+
+class FeedPullAuthor(db.Model):
+    """An author with more than FEED_FANOUT_MAX_FOLLOWERS followers, whose posts are read at feed time (see app/feed.py)"""
+    __tablename__ = 'feed_pull_author'
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete="CASCADE"), primary_key=True)
+    since = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # When the author switched to pull
+
 # User follow system
 class Follow(db.Model):
     __tablename__ = 'follow'
@@ -164,6 +264,8 @@ class Follow(db.Model):
         db.UniqueConstraint('follower_id', 'followed_id', name='unique_follow'),
         db.Index('idx_follow_follower', 'follower_id'),
         db.Index('idx_follow_followed', 'followed_id'),
+        db.Index('idx_follow_followed_timestamp', 'followed_id', 'timestamp'),
+        db.Index('idx_follow_follower_timestamp', 'follower_id', 'timestamp'),
         # Prevent users from following themselves
         db.CheckConstraint('follower_id != followed_id', name='no_self_follow')
     )
@@ -171,3 +273,27 @@ class Follow(db.Model):
     def __repr__(self):
         return f'<Follow follower_id={self.follower_id} followed_id={self.followed_id}>'
 
+
+class FollowEvent(db.Model):
+    """Append-only log of follows and unfollows, replayed by each process's follow graph (see app/follow_graph.py)"""
+    __tablename__ = 'follow_event'
+    id = db.Column(db.Integer, primary_key=True)
+    follower_id = db.Column(db.Integer, nullable=False)
+    followed_id = db.Column(db.Integer, nullable=False)
+    following = db.Column(db.Boolean, nullable=False)  # False for an unfollow
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_follow_event_created', 'created_at'),
+    )
+
+class BlogSimilarity(db.Model):
+    """A blog's nearest neighbours by item-item cosine similarity (see app/recommendations.py).
+
+    Rebuilt offline by `flask build-recommendations`; only the top
+    RECO_NEIGHBORS rows per blog are kept.
+    """
+    __tablename__ = 'blog_similarity'
+    blog_id = db.Column(db.Integer, db.ForeignKey('blog.id', ondelete="CASCADE"), primary_key=True)
+    similar_blog_id = db.Column(db.Integer, db.ForeignKey('blog.id', ondelete="CASCADE"), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
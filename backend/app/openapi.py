@@ -0,0 +1,34 @@
+# app/openapi.py
+import hashlib
+import os
+from flask import Blueprint, current_app, request
+from .caching import cache_control_for
+
+# The OpenAPI document behind /api/docs, served straight from memory.
+#
+# swagger.json is read on the first request for it (not at startup) and kept
+# with a content hash as its ETag, so clients revalidate with a 304 and no
+# worker ever writes to disk.
+
+openapi_bp = Blueprint('openapi', __name__)
+
+
+def load_document():
+    """Return (bytes, etag) of the OpenAPI document, reading it once per app."""
+    document = current_app.extensions.get('openapi_document')
+    if document is None:
+        with open(os.path.join(current_app.root_path, 'swagger.json'), 'rb') as f:
+            body = f.read()
+        document = (body, hashlib.sha256(body).hexdigest()[:32])
+        current_app.extensions['openapi_document'] = document
+    return document
+
+
+@openapi_bp.route('/api/openapi.json', methods=['GET'])
+def get_openapi_document():
+    """OpenAPI document for the Swagger UI"""
+    body, etag = load_document()
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control_for('openapi')
+    return response.make_conditional(request)
@@ -0,0 +1,88 @@
+# app/pagination.py
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_, bindparam
+
+# Keyset ("cursor") pagination.
+#
+# Instead of OFFSET, a page is fetched by seeking past the sort key of the
+# last row the client saw, e.g. WHERE (timestamp, id) < (:ts, :id), which an
+# index on those columns answers in the same time for page 1 and page 10,000.
+# No COUNT(*) is issued; the client only learns whether there is a next page.
+# The cursor handed to clients is an opaque base64 token of that sort key.
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values):
+    """Encode a row's sort key as an opaque URL-safe token."""
+    raw = json.dumps([_dump(v) for v in values], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor, raising InvalidCursor if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list):
+            raise InvalidCursor('Invalid cursor')
+        return [_load(v) for v in values]
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def seek_condition(order_columns, values, descending=True):
+    """Row-value comparison selecting rows strictly after the sort key `values`."""
+    if len(values) != len(order_columns):
+        raise InvalidCursor('Invalid cursor')
+    bound = tuple_(*[bindparam(None, value, type_=column.type)
+                     for column, value in zip(order_columns, values)])
+    return tuple_(*order_columns) < bound if descending else tuple_(*order_columns) > bound
+
+
+def keyset_page(query, order_columns, cursor, per_page, row_key, descending=True, having=False):
+    """Fetch one page of query ordered by order_columns, starting after cursor.
+
+    order_columns must end with a unique column (usually the primary key) so
+    the order is total. row_key(row) returns the sort key values of a result
+    row, used to build the next cursor. Pass having=True when the sort key
+    contains an aggregate. Returns (rows, next_cursor); next_cursor is None
+    on the last page.
+    """
+    if cursor:
+        seek = seek_condition(order_columns, decode_cursor(cursor), descending)
+        query = query.having(seek) if having else query.filter(seek)
+
+    ordering = [column.desc() if descending else column.asc() for column in order_columns]
+    rows = query.order_by(None).order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(row_key(rows[-1]))
+    return rows, next_cursor
+
+
+def cursor_pagination(per_page, next_cursor):
+    """Pagination block returned by endpoints in cursor mode."""
+    return {
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    }
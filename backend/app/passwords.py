@@ -0,0 +1,196 @@
+# app/passwords.py
+import atexit
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt as _bcrypt
+from flask import current_app
+
+# Password hashing off the request threads.
+#
+# bcrypt is deliberately slow and CPU-bound. Run inline, a burst of logins
+# pins every worker thread (and the GIL) and slows down unrelated requests.
+# Instead hashes are computed in a process pool. Request threads only wait
+# on a future, which does not hold the GIL. At most PASSWORD_HASH_MAX_PENDING
+# hashes may be queued or running; beyond that callers get
+# PasswordHasherBusy, which the app turns into a 503 with Retry-After.
+#
+# The cost factor comes from BCRYPT_LOG_ROUNDS or, when that is unset, is
+# calibrated at startup so one hash takes about BCRYPT_TARGET_MS on this
+# machine. Hashes with a different cost are upgraded on the next login.
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool is saturated; retry later."""
+    retry_after = 1
+
+
+def calibrate_rounds(target_ms, min_rounds=10, max_rounds=16, sample_rounds=8, samples=3):
+    """Largest bcrypt cost whose hash time stays within target_ms on this machine.
+
+    Each extra round doubles the work, so the time is measured once at a
+    cheap cost and extrapolated.
+    """
+    salt = _bcrypt.gensalt(rounds=sample_rounds)
+    best = None
+    for _ in range(samples):
+        started = time.perf_counter()
+        _bcrypt.hashpw(b'calibration', salt)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    rounds = min_rounds
+    while rounds < max_rounds and best * 2 ** (rounds + 1 - sample_rounds) <= target_ms:
+        rounds += 1
+    return rounds
+
+
+def hash_cost(pw_hash):
+    """The cost factor encoded in a bcrypt hash ('$2b$12$...' -> 12), or None."""
+    parts = pw_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification in a bounded process pool.
+
+    workers=0 hashes on the calling thread (still bounded), for development
+    and single-threaded tools.
+    """
+
+    def __init__(self, rounds, prefix='2b', workers=None, max_pending=64, timeout=10.0,
+                 start_method='fork', handle_long_passwords=False):
+        self.rounds = rounds
+        self.prefix = prefix
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.start_method = start_method
+        self.handle_long_passwords = handle_long_passwords
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+        self.in_flight = 0
+        self.completed_total = 0
+        self.rejected_total = 0
+
+    def _password_bytes(self, password):
+        password = password.encode('utf-8') if isinstance(password, str) else password
+        if self.handle_long_passwords:
+            # Same pre-hash as Flask-Bcrypt, so existing hashes still verify
+            password = hashlib.sha256(password).hexdigest().encode('utf-8')
+        return password
+
+    def _pool(self):
+        pid = os.getpid()
+        if self._executor is not None and self._pid == pid:
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != pid:
+                # A forked server worker cannot use its parent's pool. 'fork'
+                # is the default because spawn/forkserver children re-import
+                # the main script, and run.py builds the whole app on import.
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pid = pid
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected_total += 1
+            raise PasswordHasherBusy('Password hashing queue is full')
+        with self._lock:
+            self.in_flight += 1
+        try:
+            if not self.workers:
+                return fn(*args)
+            try:
+                return self._pool().submit(fn, *args).result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise PasswordHasherBusy('Password hashing timed out')
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed_total += 1
+            self._slots.release()
+
+    def hash(self, password):
+        salt = _bcrypt.gensalt(rounds=self.rounds, prefix=self.prefix.encode('ascii'))
+        return self._run(_bcrypt.hashpw, self._password_bytes(password), salt).decode('utf-8')
+
+    def verify(self, pw_hash, password):
+        try:
+            return self._run(_bcrypt.checkpw, self._password_bytes(password), pw_hash.encode('utf-8'))
+        except ValueError:
+            # Not a bcrypt hash
+            return False
+
+    def needs_rehash(self, pw_hash):
+        return hash_cost(pw_hash) != self.rounds or not pw_hash.startswith(f'${self.prefix}$')
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'in_flight': self.in_flight,
+                'max_pending': self.max_pending,
+                'completed_total': self.completed_total,
+                'rejected_total': self.rejected_total
+            }
+
+
+def init_password_hasher(app):
+    """Settle the bcrypt cost (calibrating if unset) and create the app's hasher.
+
+    Runs before Flask-Bcrypt is initialised so both agree on BCRYPT_LOG_ROUNDS.
+    """
+    rounds = app.config.get('BCRYPT_LOG_ROUNDS')
+    if rounds is None:
+        rounds = calibrate_rounds(app.config['BCRYPT_TARGET_MS'],
+                                  min_rounds=app.config['BCRYPT_MIN_ROUNDS'],
+                                  max_rounds=app.config['BCRYPT_MAX_ROUNDS'])
+        app.config['BCRYPT_LOG_ROUNDS'] = rounds
+
+    hasher = PasswordHasher(
+        rounds,
+        prefix=app.config.get('BCRYPT_HASH_PREFIX', '2b'),
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+        start_method=app.config['PASSWORD_HASH_START_METHOD'],
+        handle_long_passwords=app.config.get('BCRYPT_HANDLE_LONG_PASSWORDS', False)
+    )
+    app.extensions['password_hasher'] = hasher
+    atexit.register(hasher.shutdown)
+    return hasher
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    return get_password_hasher().hash(password)
+
+
+def verify_password(pw_hash, password):
+    return get_password_hasher().verify(pw_hash, password)
+
+
+def password_needs_rehash(pw_hash):
+    return get_password_hasher().needs_rehash(pw_hash)
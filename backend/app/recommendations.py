@@ -0,0 +1,225 @@
+# app/recommendations.py
+import heapq
+import time
+import click
+from collections import defaultdict
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select, delete
+from .models import db, Blog, Like, BlogView, CommentLike, BlogSimilarity
+
+# Item-item collaborative filtering.
+#
+# Offline, `flask build-recommendations` turns likes, comment likes and
+# signed-in views into a user x blog sparse matrix (one weighted entry per
+# user and blog), scales every blog's column to unit length, and multiplies
+# the transpose by the matrix a block of blogs at a time: each block of the
+# product holds the cosine similarity of those blogs with every other blog.
+# The top RECO_NEIGHBORS of each row go into blog_similarity. NumPy and
+# SciPy are only needed for the build; web workers never import them.
+#
+# Online, a user's latest interactions pick out rows of blog_similarity;
+# candidates are scored by summed similarity (weighted by how the user
+# interacted), boosted when they are in a preferred category, and topped up
+# with the newest blogs from those categories. That is a handful of indexed
+# queries per request.
+
+
+def interaction_weights():
+    config = current_app.config
+    return {
+        'like': config['RECO_LIKE_WEIGHT'],
+        'comment_like': config['RECO_COMMENT_LIKE_WEIGHT'],
+        'view': config['RECO_VIEW_WEIGHT']
+    }
+
+
+def _sources():
+    # (model, kind); every source has user_id, blog_id and timestamp
+    return ((Like, 'like'), (CommentLike, 'comment_like'), (BlogView, 'view'))
+
+
+# ---------- Offline build ----------
+
+def item_neighbors(user_index, item_index, weights, n_items, k, block_size=1024):
+    """Top-k cosine neighbours per item.
+
+    user_index, item_index and weights describe the interactions (repeated
+    pairs are summed). Returns (items, neighbours, scores) arrays, grouped
+    by item with the most similar neighbour first.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    n_users = int(user_index.max()) + 1 if len(user_index) else 0
+    matrix = sparse.csr_matrix((weights, (user_index, item_index)), shape=(n_users, n_items), dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    inverse = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    normalized = (matrix @ sparse.diags(inverse)).tocsc()
+    by_item = normalized.T.tocsr()
+
+    items, neighbours, scores = [], [], []
+    for start in range(0, n_items, block_size):
+        block = (by_item[start:start + block_size] @ normalized).tocsr()
+        rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr)) + start
+        cols, data = block.indices, block.data
+        keep = (cols != rows) & (data > 0)
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+        # Sort by item, best score first, then keep each item's first k
+        order = np.lexsort((-data, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        top = rank < k
+        items.append(rows[top])
+        neighbours.append(cols[top])
+        scores.append(data[top])
+
+    if not items:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float32)
+    return np.concatenate(items), np.concatenate(neighbours), np.concatenate(scores)
+
+
+def load_interactions():
+    """(user ids, blog ids, weights) arrays: one entry per user, blog and kind of interaction."""
+    import numpy as np
+
+    weights = interaction_weights()
+    users, blogs, values = [], [], []
+    for model, kind in _sources():
+        rows = db.session.query(model.user_id, model.blog_id)\
+                         .filter(model.user_id.isnot(None))\
+                         .group_by(model.user_id, model.blog_id).all()
+        users.extend(row[0] for row in rows)
+        blogs.extend(row[1] for row in rows)
+        values.extend([weights[kind]] * len(rows))
+    return (np.array(users, dtype=np.int64), np.array(blogs, dtype=np.int64),
+            np.array(values, dtype=np.float32))
+
+
+def build_recommendations(chunk=5000):
+    """Recompute blog_similarity from every interaction. Returns build statistics."""
+    import numpy as np
+
+    config = current_app.config
+    started = time.perf_counter()
+    users, blogs, weights = load_interactions()
+
+    # Only public blogs are recommended, or used as evidence
+    public = np.array([row[0] for row in db.session.query(Blog.id).filter(
+        Blog.is_draft == False,
+        Blog.is_archived == False
+    ).all()], dtype=np.int64)
+    keep = np.isin(blogs, public)
+    users, blogs, weights = users[keep], blogs[keep], weights[keep]
+    loaded = time.perf_counter()
+
+    blog_ids, item_index = np.unique(blogs, return_inverse=True)
+    _, user_index = np.unique(users, return_inverse=True)
+    items, neighbours, scores = item_neighbors(user_index, item_index, weights, len(blog_ids),
+                                               config['RECO_NEIGHBORS'], config['RECO_BUILD_BLOCK_SIZE'])
+    computed = time.perf_counter()
+
+    db.session.execute(delete(BlogSimilarity))
+    blog_column, similar_column = blog_ids[items].tolist(), blog_ids[neighbours].tolist()
+    scores = scores.tolist()
+    for start in range(0, len(scores), chunk):
+        db.session.execute(BlogSimilarity.__table__.insert(), [
+            {'blog_id': blog_id, 'similar_blog_id': similar_id, 'score': score}
+            for blog_id, similar_id, score in zip(blog_column[start:start + chunk],
+                                                   similar_column[start:start + chunk],
+                                                   scores[start:start + chunk])
+        ])
+    db.session.commit()
+
+    return {
+        'interactions': len(weights),
+        'users': int(user_index.max()) + 1 if len(user_index) else 0,
+        'blogs': len(blog_ids),
+        'pairs': len(scores),
+        'load_seconds': round(loaded - started, 3),
+        'compute_seconds': round(computed - loaded, 3),
+        'store_seconds': round(time.perf_counter() - computed, 3)
+    }
+
+
+@click.command('build-recommendations')
+@with_appcontext
+def build_recommendations_command():
+    """Rebuild item-item similarities from likes, comment likes and views (run periodically)."""
+    stats = build_recommendations()
+    click.echo(f"Stored {stats['pairs']} neighbour(s) for {stats['blogs']} blog(s) from "
+               f"{stats['interactions']} interaction(s) in "
+               f"{stats['load_seconds'] + stats['compute_seconds'] + stats['store_seconds']:.1f}s "
+               f"(load {stats['load_seconds']}s, compute {stats['compute_seconds']}s, "
+               f"store {stats['store_seconds']}s)")
+
+
+# ---------- Serving ----------
+
+def user_history(user_id):
+    """{blog_id: weight} from the user's latest likes, comment likes and views."""
+    weights = interaction_weights()
+    limit = current_app.config['RECO_HISTORY_SIZE']
+    history = {}
+    for model, kind in _sources():
+        rows = db.session.query(model.blog_id).filter(model.user_id == user_id)\
+                         .order_by(model.timestamp.desc()).limit(limit).all()
+        for (blog_id,) in rows:
+            history[blog_id] = max(history.get(blog_id, 0.0), weights[kind])
+    return history
+
+
+def _public_blogs(user_id):
+    # Recommendable: published, not archived, someone else's
+    return db.session.query(Blog.id, Blog.category).filter(
+        Blog.is_draft == False,
+        Blog.is_archived == False,
+        Blog.user_id != user_id
+    )
+
+
+def recommend(user_id, preferred_categories=()):
+    """([(blog_id, reason)] best first, up to RECO_MAX_RESULTS; blogs in the user's history).
+
+    reason is 'similar' for blogs close to what the user interacted with,
+    'category' for the newest blogs in a preferred category after those.
+    Blogs the user already interacted with are left out.
+    """
+    config = current_app.config
+    max_results = config['RECO_MAX_RESULTS']
+    preferred = set(preferred_categories)
+    history = user_history(user_id)
+
+    scores = defaultdict(float)
+    if history:
+        # Core rows: thousands of tuples, no ORM entities needed
+        table = BlogSimilarity.__table__
+        rows = db.session.execute(
+            select(table.c.blog_id, table.c.similar_blog_id, table.c.score)
+            .where(table.c.blog_id.in_(list(history)))
+        ).all()
+        for blog_id, similar_id, score in rows:
+            scores[similar_id] += history[blog_id] * score
+        for blog_id in history:
+            scores.pop(blog_id, None)
+
+    ranked = []
+    if scores:
+        # The category boost can at most multiply a score by 1 + boost
+        candidates = heapq.nlargest(max_results * 2, scores, key=scores.get)
+        boost = 1.0 + config['RECO_CATEGORY_BOOST']
+        blended = [(scores[blog_id] * (boost if category in preferred else 1.0), blog_id)
+                   for blog_id, category in _public_blogs(user_id).filter(Blog.id.in_(candidates)).all()]
+        blended.sort(key=lambda item: (-item[0], item[1]))
+        ranked = [(blog_id, 'similar') for _, blog_id in blended[:max_results]]
+
+    if preferred and len(ranked) < max_results:
+        exclude = list(history) + [blog_id for blog_id, _ in ranked]
+        newest = _public_blogs(user_id).filter(
+            Blog.category.in_(preferred),
+            Blog.id.notin_(exclude)
+        ).order_by(Blog.timestamp.desc()).limit(max_results - len(ranked)).all()
+        ranked.extend((blog_id, 'category') for blog_id, _ in newest)
+
+    return ranked, len(history)
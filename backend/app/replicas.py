@@ -0,0 +1,312 @@
+# app/replicas.py
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import click
+from flask import current_app, request
+from flask.cli import with_appcontext
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, TextClause, event, text
+
+# Read replicas for GET traffic.
+#
+# Every URI in DATABASE_REPLICA_URIS becomes a bind ('replica0', ...). A
+# GET or HEAD request is pinned to one healthy replica, picked round-robin,
+# and its session sends SELECTs there. Anything else goes to the primary:
+# flushes, INSERT/UPDATE/DELETE, every non-GET request and any view marked
+# @use_primary. So a GET that happens to write still writes in the right
+# place.
+#
+# A background thread runs SELECT 1 against each replica every
+# REPLICA_HEALTH_INTERVAL seconds; on Postgres it also takes a replica out
+# of rotation while its replay lag exceeds REPLICA_MAX_LAG_SECONDS. A
+# connection error on a replica marks it down at once. With no healthy
+# replica, reads go to the primary.
+#
+# Read-your-writes: after a successful write, the user's reads go to the
+# primary for REPLICA_READ_YOUR_WRITES_SECONDS, longer than replication
+# normally lags. The worker that handled the write remembers the user id.
+# The other workers learn it from the client: the write's response carries
+# the deadline both as a cookie (browsers send it back by themselves) and
+# as an X-DB-Primary-Until header, which Bearer-token clients that keep no
+# cookies echo on their following requests. A deadline further away than
+# the window is ignored, so neither can pin a client to the primary.
+
+PRIMARY_UNTIL_COOKIE = 'db_primary_until'
+PRIMARY_UNTIL_HEADER = 'X-DB-Primary-Until'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+def _is_read(clause):
+    if clause is None or isinstance(clause, Select):
+        return True
+    if isinstance(clause, TextClause):
+        return clause.text.lstrip().lower().startswith(('select', 'with'))
+    return False
+
+
+class RoutingSession(Session):
+    """Sends reads to session.info['replica'] when a request has pinned one."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None and not self._flushing and _is_read(clause):
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_primary(view):
+    """Always read from the primary in this GET view (it writes, or must not lag).
+
+    Put it directly under the route decorator.
+    """
+    view.use_primary = True
+    return view
+
+
+class RecentWriters:
+    """Users who wrote recently, with a bounded number of entries."""
+
+    def __init__(self, window_seconds, max_entries=100000):
+        self.window = window_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[user_id] = now
+            self._entries.move_to_end(user_id)
+            while self._entries:
+                oldest_id, oldest_at = next(iter(self._entries.items()))
+                if now - oldest_at < self.window and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_id]
+
+    def wrote_recently(self, user_id, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            wrote_at = self._entries.get(user_id)
+        return wrote_at is not None and now - wrote_at < self.window
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ReplicaRouter:
+    """Round-robin choice among the replicas that passed their last health check."""
+
+    def __init__(self, app, replicas, health_interval=5.0, max_lag_seconds=10.0, read_your_writes_seconds=10.0):
+        self.app = app
+        self.replicas = replicas  # {bind name: engine}
+        self.health_interval = health_interval
+        self.max_lag_seconds = max_lag_seconds
+        self.recent_writers = RecentWriters(read_your_writes_seconds)
+        self.read_your_writes_seconds = read_your_writes_seconds
+
+        self.healthy = dict.fromkeys(replicas, True)  # until the first check says otherwise
+        self.lag = dict.fromkeys(replicas)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+        for name, engine in replicas.items():
+            event.listen(engine, 'handle_error', self._on_error(name))
+
+    def _on_error(self, name):
+        def mark_down(context):
+            if context.is_disconnect or context.connection is None:
+                self._set_health(name, False, 'connection error')
+        return mark_down
+
+    def _set_health(self, name, healthy, reason=''):
+        with self._lock:
+            changed = self.healthy[name] != healthy
+            self.healthy[name] = healthy
+        if changed:
+            if healthy:
+                self.app.logger.info('Replica %s is back in rotation', name)
+            else:
+                self.app.logger.warning('Replica %s taken out of rotation: %s', name, reason)
+
+    def choose(self):
+        """The replica engine to read from, or None for the primary."""
+        self._ensure_thread()
+        healthy = [name for name, ok in self.healthy.items() if ok]
+        if not healthy:
+            return None
+        return self.replicas[healthy[next(self._turn) % len(healthy)]]
+
+    def check(self, name):
+        """SELECT 1 (and the replay lag on Postgres) against one replica."""
+        engine = self.replicas[name]
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'postgresql':
+                    lag = connection.execute(text(
+                        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                        'ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END'
+                    )).scalar()
+                else:
+                    connection.execute(text('SELECT 1')).scalar()
+                    lag = 0
+        except Exception as error:
+            self._set_health(name, False, str(error).splitlines()[0])
+            return False
+        self.lag[name] = float(lag) if lag is not None else None
+        if lag is not None and lag > self.max_lag_seconds:
+            self._set_health(name, False, f'{lag:.1f}s behind the primary')
+            return False
+        self._set_health(name, True)
+        return True
+
+    def check_all(self):
+        return {name: self.check(name) for name in self.replicas}
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            # Threads do not survive fork, so each worker starts its own
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.check_all()
+            time.sleep(self.health_interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'replicas': {name: {'healthy': self.healthy[name], 'lag_seconds': self.lag[name]}
+                             for name in self.replicas},
+                'replica_reads': self.replica_reads,
+                'primary_reads': self.primary_reads,
+                'recent_writers': len(self.recent_writers)
+            }
+
+
+def _current_user_id():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None  # expired or malformed; the view will say so if it needs a user
+
+
+def _must_read_primary(router):
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, 'use_primary', False):
+        return True
+    now = time.time()
+    for until in (request.cookies.get(PRIMARY_UNTIL_COOKIE), request.headers.get(PRIMARY_UNTIL_HEADER)):
+        try:
+            if until and now < float(until) <= now + router.read_your_writes_seconds:
+                return True
+        except ValueError:
+            pass
+    if len(router.recent_writers) and 'Authorization' in request.headers:
+        user_id = _current_user_id()
+        return user_id is not None and router.recent_writers.wrote_recently(str(user_id))
+    return False
+
+
+def init_read_replicas(app):
+    """Route GET requests to DATABASE_REPLICA_URIS when any are configured."""
+    from .models import db
+
+    if not app.config['DATABASE_REPLICA_URIS']:
+        return None
+    with app.app_context():
+        replicas = {name: engine for name, engine in db.engines.items()
+                    if name is not None and name.startswith('replica')}
+    router = ReplicaRouter(
+        app,
+        replicas,
+        health_interval=app.config['REPLICA_HEALTH_INTERVAL'],
+        max_lag_seconds=app.config['REPLICA_MAX_LAG_SECONDS'],
+        read_your_writes_seconds=app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+    )
+    app.extensions['replica_router'] = router
+
+    @app.before_request
+    def pin_replica():
+        if request.method not in ('GET', 'HEAD') or _must_read_primary(router):
+            router.primary_reads += 1
+            return
+        replica = router.choose()
+        if replica is None:
+            router.primary_reads += 1
+            return
+        db.session.info['replica'] = replica
+        router.replica_reads += 1
+
+    @app.after_request
+    def remember_writer(response):
+        if request.method in WRITE_METHODS and response.status_code < 400:
+            try:
+                user_id = get_jwt_identity()
+            except RuntimeError:
+                user_id = None  # the view did not need a user
+            if user_id is not None:
+                router.recent_writers.add(str(user_id))
+                until = str(time.time() + router.read_your_writes_seconds)
+                response.set_cookie(PRIMARY_UNTIL_COOKIE, until, max_age=int(router.read_your_writes_seconds) + 1,
+                                    httponly=True, samesite='Lax')
+                response.headers[PRIMARY_UNTIL_HEADER] = until
+        return response
+
+    return router
+
+
+def get_replica_router():
+    return current_app.extensions.get('replica_router')
+
+
+def _sqlite_path(engine):
+    if engine.dialect.name != 'sqlite' or not engine.url.database or engine.url.database == ':memory:':
+        return None
+    return engine.url.database
+
+
+@click.command('sync-replicas')
+@with_appcontext
+def sync_replicas_command():
+    """Copy the primary SQLite database over every SQLite replica (local testing)."""
+    from .models import db
+
+    primary = _sqlite_path(db.engines[None])
+    if primary is None:
+        raise click.ClickException('sync-replicas only copies SQLite files; use real replication on Postgres')
+    if not current_app.config['DATABASE_REPLICA_URIS']:
+        raise click.ClickException('DATABASE_REPLICA_URIS is not set')
+
+    for name, engine in db.engines.items():
+        if name is None or not name.startswith('replica'):
+            continue
+        path = _sqlite_path(engine)
+        if path is None:
+            click.echo(f'Skipped {name}: not a SQLite file')
+            continue
+        engine.dispose()
+        source, target = sqlite3.connect(primary), sqlite3.connect(path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        click.echo(f'Copied {primary} to {name} ({path})')
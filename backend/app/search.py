@@ -0,0 +1,274 @@
+# app/search.py
+import re
+from html import escape
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import text, inspect, Integer, Float
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import selectinload, undefer
+from .models import db, Blog
+
+# Full-text index over blog title, content and tags.
+#
+# SQLite uses an FTS5 virtual table keyed by blog id (rowid); Postgres uses a
+# blog_search table holding a weighted tsvector with a GIN index. Only
+# published, non-archived blogs are indexed, so publish/archive/delete keep
+# the index in step by calling index_blog()/remove_blog() before commit.
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# The database marks hits with these private-use characters; the text is
+# HTML-escaped before they become the tags above
+HIGHLIGHT_START_SENTINEL = '\ue000'
+HIGHLIGHT_END_SENTINEL = '\ue001'
+SNIPPET_TOKENS = 24
+
+# Column weights for ranking: title, content, tags
+SQLITE_BM25_WEIGHTS = (10.0, 1.0, 4.0)
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts USING fts5("
+    "title, content, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+]
+
+POSTGRES_DDL = [
+    "CREATE TABLE IF NOT EXISTS blog_search ("
+    "blog_id INTEGER PRIMARY KEY REFERENCES blog(id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS idx_blog_search_document ON blog_search USING GIN (document)"
+]
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+INDEX_TABLES = {'sqlite': 'blog_fts', 'postgresql': 'blog_search'}
+
+
+def search_backend():
+    """Return 'sqlite', 'postgresql' or None when full-text search is unavailable.
+
+    Apps that skip init_search_index() at startup (STARTUP_MODE=production,
+    where migrations create the index) detect the backend on first use.
+    """
+    extensions = current_app.extensions
+    if 'search_backend' not in extensions:
+        dialect = db.engine.dialect.name
+        table = INDEX_TABLES.get(dialect)
+        extensions['search_backend'] = dialect if table and inspect(db.engine).has_table(table) else None
+    return extensions['search_backend']
+
+
+def init_search_index(app):
+    """Create the full-text structures for the configured database, if supported."""
+    dialect = db.engine.dialect.name
+    statements = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}.get(dialect)
+    backend = None
+    if statements:
+        try:
+            with db.engine.begin() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+            backend = dialect
+        except OperationalError:
+            # e.g. an SQLite build without FTS5
+            app.logger.warning('Full-text search unavailable on %s; falling back to LIKE search', dialect)
+    app.extensions['search_backend'] = backend
+
+
+def _ts_config():
+    config = current_app.config['SEARCH_TS_CONFIG']
+    if not config.isidentifier():
+        raise ValueError(f'Invalid SEARCH_TS_CONFIG: {config!r}')
+    return config
+
+
+def _tokens(value):
+    return TOKEN_RE.findall((value or '').lower())
+
+
+def build_match_expression(query_text=None, title=None):
+    """Translate free text (and an optional title-only filter) into a prefix query.
+
+    Every word must match; the last characters of each word are treated as a
+    prefix so partially typed words still hit. Returns None if nothing is left
+    to search for.
+    """
+    backend = search_backend()
+    terms, title_terms = _tokens(query_text), _tokens(title)
+    if not terms and not title_terms:
+        return None
+
+    if backend == 'sqlite':
+        parts = []
+        if terms:
+            parts.append('(' + ' '.join(f'"{term}"*' for term in terms) + ')')
+        if title_terms:
+            parts.append('title : (' + ' '.join(f'"{term}"*' for term in title_terms) + ')')
+        return ' AND '.join(parts)
+
+    # Postgres tsquery: ':*' is a prefix match, 'A' restricts to the title weight
+    parts = [f'{term}:*' for term in terms] + [f'{term}:*A' for term in title_terms]
+    return ' & '.join(parts)
+
+
+def search_hits(match):
+    """Subquery of (blog_id, rank) for every indexed blog matching the expression.
+
+    Higher rank is more relevant.
+    """
+    if search_backend() == 'sqlite':
+        weights = ', '.join(str(w) for w in SQLITE_BM25_WEIGHTS)
+        statement = text(
+            f"SELECT rowid AS blog_id, -bm25(blog_fts, {weights}) AS rank "
+            "FROM blog_fts WHERE blog_fts MATCH :match"
+        )
+    else:
+        statement = text(
+            "SELECT blog_id, ts_rank_cd(document, to_tsquery(:config, :match)) AS rank "
+            "FROM blog_search WHERE document @@ to_tsquery(:config, :match)"
+        ).bindparams(config=_ts_config())
+    return statement.bindparams(match=match).columns(blog_id=Integer, rank=Float).subquery('search_hits')
+
+
+def _highlight_html(marked):
+    """Escape database-highlighted text, then turn the sentinels into <mark> tags."""
+    if marked is None:
+        return None
+    return (escape(marked, quote=False)
+            .replace(HIGHLIGHT_START_SENTINEL, HIGHLIGHT_START)
+            .replace(HIGHLIGHT_END_SENTINEL, HIGHLIGHT_END))
+
+
+def highlight_hits(match, blog_ids):
+    """Return {blog_id: {'title': ..., 'content': ...}} as HTML with matches wrapped in <mark>.
+
+    Only run for the blogs on the current page, since snippet generation
+    reads the whole document. Everything outside the <mark> tags is escaped.
+    """
+    if not blog_ids:
+        return {}
+    params = {'match': match, 'start': HIGHLIGHT_START_SENTINEL, 'end': HIGHLIGHT_END_SENTINEL}
+    ids = ', '.join(str(int(blog_id)) for blog_id in blog_ids)
+
+    if search_backend() == 'sqlite':
+        statement = text(
+            "SELECT rowid, highlight(blog_fts, 0, :start, :end), "
+            f"snippet(blog_fts, 1, :start, :end, '…', {SNIPPET_TOKENS}) "
+            f"FROM blog_fts WHERE blog_fts MATCH :match AND rowid IN ({ids})"
+        )
+    else:
+        params['config'] = _ts_config()
+        options = f'StartSel="{HIGHLIGHT_START_SENTINEL}", StopSel="{HIGHLIGHT_END_SENTINEL}"'
+        statement = text(
+            "SELECT blog.id, "
+            f"ts_headline(:config, blog.title, q, 'HighlightAll=true, {options}'), "
+            f"ts_headline(:config, blog.content, q, 'MaxWords={SNIPPET_TOKENS}, MinWords=8, {options}') "
+            f"FROM blog, to_tsquery(:config, :match) AS q WHERE blog.id IN ({ids})"
+        )
+
+    rows = db.session.execute(statement, params)
+    return {row[0]: {'title': _highlight_html(row[1]), 'content': _highlight_html(row[2])} for row in rows}
+
+
+def _is_searchable(blog):
+    return not blog.is_draft and not blog.is_archived
+
+
+def index_blog(blog):
+    """Add or refresh a blog in the index (or drop it if it is not public).
+
+    Runs in the caller's transaction; the blog must already have an id.
+    """
+    backend = search_backend()
+    if backend is None:
+        return
+    if not _is_searchable(blog):
+        remove_blog(blog.id)
+        return
+
+    index_blog_rows([{
+        'id': blog.id,
+        'title': blog.title,
+        'content': blog.content,
+        'tags': ' '.join(tag.name for tag in blog.tags)
+    }])
+
+
+def index_blog_rows(rows):
+    """Index public blogs given as dicts of id, title, content and tags (space-separated).
+
+    One executemany per statement, for bulk writers that have no Blog objects.
+    """
+    backend = search_backend()
+    if backend is None or not rows:
+        return
+    if backend == 'sqlite':
+        db.session.execute(text("DELETE FROM blog_fts WHERE rowid = :id"), rows)
+        db.session.execute(text(
+            "INSERT INTO blog_fts (rowid, title, content, tags) VALUES (:id, :title, :content, :tags)"
+        ), rows)
+    else:
+        config = _ts_config()
+        db.session.execute(text(
+            "INSERT INTO blog_search (blog_id, document) VALUES (:id, "
+            "setweight(to_tsvector(:config, :title), 'A') || "
+            "setweight(to_tsvector(:config, :tags), 'B') || "
+            "setweight(to_tsvector(:config, :content), 'C')) "
+            "ON CONFLICT (blog_id) DO UPDATE SET document = EXCLUDED.document"
+        ), [dict(row, config=config) for row in rows])
+
+
+def remove_blog(blog_id):
+    """Drop a blog from the index in the caller's transaction."""
+    backend = search_backend()
+    if backend == 'sqlite':
+        db.session.execute(text("DELETE FROM blog_fts WHERE rowid = :id"), {'id': blog_id})
+    elif backend == 'postgresql':
+        db.session.execute(text("DELETE FROM blog_search WHERE blog_id = :id"), {'id': blog_id})
+
+
+def rebuild_search_index(chunk_size=500):
+    """Re-index every public blog from scratch, committing per chunk.
+
+    Returns the number of blogs indexed.
+    """
+    backend = search_backend()
+    if backend is None:
+        return 0
+
+    db.session.execute(text("DELETE FROM blog_fts" if backend == 'sqlite' else "DELETE FROM blog_search"))
+    db.session.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        blogs = Blog.query.options(selectinload(Blog.tags), undefer(Blog.content)).filter(
+            Blog.id > last_id,
+            Blog.is_draft == False,
+            Blog.is_archived == False
+        ).order_by(Blog.id).limit(chunk_size).all()
+        if not blogs:
+            break
+        for blog in blogs:
+            index_blog(blog)
+        db.session.commit()
+        indexed += len(blogs)
+        last_id = blogs[-1].id
+
+    if backend == 'sqlite':
+        db.session.execute(text("INSERT INTO blog_fts (blog_fts) VALUES ('optimize')"))
+        db.session.commit()
+    return indexed
+
+
+@click.command('rebuild-search-index')
+@click.option('--chunk-size', default=500, show_default=True, help='Blogs indexed per transaction')
+@with_appcontext
+def rebuild_search_index_command(chunk_size):
+    """Rebuild the full-text search index from the blog table."""
+    if search_backend() is None:
+        click.echo('Full-text search is not available for this database')
+        return
+    indexed = rebuild_search_index(chunk_size=chunk_size)
+    click.echo(f'Indexed {indexed} blog(s)')
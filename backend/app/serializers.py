@@ -0,0 +1,128 @@
+# app/serializers.py
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload, load_only, undefer
+from .models import db, Blog, User
+
+# Shared blog serialization for list endpoints.
+#
+# with_blog_relations() attaches loader options so a whole page of blogs
+# comes back with its authors and tags loaded by one SELECT ... WHERE id IN
+# (...) each; counts come from the denormalized counter columns. A page
+# therefore costs the same number of queries whatever its size. selectin
+# loading (rather than joined) keeps the page query itself untouched, so it
+# composes with GROUP BY, DISTINCT and keyset seeks.
+
+PREVIEW_LENGTH = 200
+
+COUNT_FIELDS = {
+    'likes_count': 'like_count',
+    'views_count': 'view_count',
+    'view_count': 'view_count',
+    'comments_count': 'comment_count'
+}
+
+# Response key -> Blog column, for loading only what a FieldSelection needs
+BLOG_COLUMNS = {
+    'title': 'title',
+    'timestamp': 'timestamp',
+    'category': 'category',
+    'word_count': 'word_count',
+    'reading_time': 'reading_time',
+    **COUNT_FIELDS
+}
+
+
+def blog_fields(content='full', counts=(), extra=()):
+    """Plain response keys of a blog endpoint, for select_fields()."""
+    keys = ['id', 'title', 'timestamp', 'category', 'word_count', 'reading_time', *counts, *extra]
+    if content:
+        keys.append('content')
+    return keys
+
+
+def with_blog_relations(query, author=True, tags=True, selection=None, content='full'):
+    """Add eager loading for the relationships serialize_blog() will touch.
+
+    With a FieldSelection, the relationships follow it and only the columns
+    its fields need are loaded (content as for serialize_blog()).
+    """
+    options = []
+    if selection is not None:
+        author = author and 'author' in selection
+        tags = tags and 'tags' in selection
+        if selection.partial:
+            # Ordering and keyset columns are always needed
+            columns = {Blog.id, Blog.timestamp}
+            columns.update(getattr(Blog, BLOG_COLUMNS[key]) for key in selection.fields if key in BLOG_COLUMNS)
+            if 'content' in selection.fields and content:
+                columns.add(Blog.content if content == 'full' else Blog.excerpt)
+            if author:
+                columns.add(Blog.user_id)
+            options.append(load_only(*columns))
+        elif content == 'full' and 'content' in selection:
+            options.append(undefer(Blog.content))
+    if author:
+        if selection is not None and selection.partial:
+            options.append(selectinload(Blog.user).load_only(User.id, User.username))
+        else:
+            options.append(selectinload(Blog.user))
+    if tags:
+        options.append(selectinload(Blog.tags))
+    return query.options(*options) if options else query
+
+
+def preview(content):
+    return content[:PREVIEW_LENGTH] + '...' if len(content) > PREVIEW_LENGTH else content
+
+
+def serialize_blog(blog, content='full', author=True, tags=True, counts=(), selection=None):
+    """Serialize a blog for API responses.
+
+    content is 'full' (loads the deferred body), 'preview' (the stored
+    excerpt, the first 200 characters) or None to omit it; counts lists
+    response keys from COUNT_FIELDS to include. A FieldSelection narrows
+    all of these to what the request asked for.
+    """
+    if selection is None:
+        wanted = lambda key: True
+    else:
+        wanted = selection.__contains__
+        author = author and 'author' in selection
+        tags = tags and 'tags' in selection
+
+    data = {'id': blog.id}
+    if wanted('title'):
+        data['title'] = blog.title
+    if wanted('timestamp'):
+        data['timestamp'] = blog.timestamp.isoformat()
+    if wanted('category'):
+        data['category'] = blog.category
+    if wanted('word_count'):
+        data['word_count'] = blog.word_count
+    if wanted('reading_time'):
+        data['reading_time'] = blog.reading_time
+    if content == 'full' and wanted('content'):
+        data['content'] = blog.content
+    elif content == 'preview' and wanted('content'):
+        # Rows written before excerpts were stored fall back to the body
+        data['content'] = blog.excerpt if blog.excerpt is not None else preview(blog.content)
+    if author:
+        data['author'] = blog.user.username
+    if tags:
+        data['tags'] = [tag.name for tag in blog.tags]
+    for name in counts:
+        if wanted(name):
+            data[name] = getattr(blog, COUNT_FIELDS[name])
+    return data
+
+
+def public_blog_counts(user_ids):
+    """Return {user_id: number of published, non-archived blogs} in one grouped query."""
+    if not user_ids:
+        return {}
+    rows = db.session.query(Blog.user_id, func.count(Blog.id)).filter(
+        Blog.user_id.in_(user_ids),
+        Blog.is_draft == False,
+        Blog.is_archived == False
+    ).group_by(Blog.user_id).all()
+    return dict(rows)
@@ -0,0 +1,143 @@
+# app/tags.py
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import select, delete, insert
+from .models import db, Tag, blog_tags
+from .utils import dialect_insert
+
+# Tag resolution for blog writes.
+#
+# A blog's tag list is turned into tag ids with at most one SELECT ... IN
+# and one INSERT ... ON CONFLICT DO NOTHING (for names nobody has used yet,
+# safe against a concurrent writer creating the same tag), plus a re-SELECT
+# of the rows just created. Ids of existing tags are kept in a bounded LRU
+# cache per process; tags are never renamed or deleted, so an entry cannot
+# go stale.
+#
+# set_blog_tags() then applies only the difference to blog_tags, so saving
+# a post costs the same handful of statements whatever its tag count.
+
+
+def normalize_tags(names):
+    """Lowercased, stripped, de-duplicated tag names in their original order."""
+    seen = OrderedDict()
+    for name in names or []:
+        if not isinstance(name, str):
+            continue
+        name = name.strip().lower()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+class TagCache:
+    """Bounded name -> id map with least-recently-used eviction."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, names):
+        """Return {name: id} for the cached names."""
+        found = {}
+        with self._lock:
+            for name in names:
+                tag_id = self._entries.get(name)
+                if tag_id is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(name)
+                found[name] = tag_id
+                self.hits += 1
+        return found
+
+    def put_many(self, mapping):
+        if not self.max_entries:
+            return
+        with self._lock:
+            for name, tag_id in mapping.items():
+                self._entries[name] = tag_id
+                self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def init_tag_cache(app):
+    cache = TagCache(app.config['TAG_CACHE_SIZE'])
+    app.extensions['tag_cache'] = cache
+    return cache
+
+
+def get_tag_cache():
+    return current_app.extensions['tag_cache']
+
+
+def _select_tag_ids(names):
+    rows = db.session.execute(select(Tag.id, Tag.name).where(Tag.name.in_(names)))
+    return {name: tag_id for tag_id, name in rows}
+
+
+def resolve_tag_ids(names):
+    """Map normalized tag names to ids, creating missing tags in the caller's transaction."""
+    if not names:
+        return {}
+    cache = get_tag_cache()
+    ids = cache.get_many(names)
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        found = _select_tag_ids(missing)
+        cache.put_many(found)
+        ids.update(found)
+
+    missing = [name for name in names if name not in ids]
+    if missing:
+        statement = dialect_insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name'])
+        db.session.execute(statement, [{'name': name} for name in missing])
+        # Not cached yet: if the caller rolls back, these ids never existed
+        ids.update(_select_tag_ids(missing))
+    return ids
+
+
+def set_blog_tags(blog, names, new=False):
+    """Make blog's tags exactly `names`, touching only the blog_tags rows that change.
+
+    blog must be flushed (have an id). new=True skips reading the current
+    tags of a blog that cannot have any yet.
+    """
+    names = normalize_tags(names)
+    wanted = set(resolve_tag_ids(names).values())
+
+    current = set()
+    if not new:
+        current = set(db.session.execute(
+            select(blog_tags.c.tag_id).where(blog_tags.c.blog_id == blog.id)
+        ).scalars())
+
+    removed = current - wanted
+    added = wanted - current
+    if removed:
+        db.session.execute(delete(blog_tags).where(blog_tags.c.blog_id == blog.id,
+                                                   blog_tags.c.tag_id.in_(removed)))
+    if added:
+        db.session.execute(insert(blog_tags), [{'blog_id': blog.id, 'tag_id': tag_id} for tag_id in added])
+    if removed or added or new:
+        # The collection was written around the ORM; reload it on next access
+        db.session.expire(blog, ['tags'])
+    return names
@@ -0,0 +1,246 @@
+# app/trending.py
+import click
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, update, delete
+from .models import db, Blog, Like, BlogView, Comment, TrendingScore, TrendingMeta
+from .utils import dialect_insert
+from .caching import bump_versions
+
+# Incrementally maintained, time-decayed trending scores.
+#
+# Each like, view and comment adds weight * 2 ** ((now - epoch) / half_life)
+# to the blog's row in blog_trending_score. Scaling by the growing factor
+# instead of shrinking old scores means rows never need rewriting for the
+# ordering to reflect decay; /api/blogs/trending is then a range read on
+# (score, blog_id). The factor grows over time, so `flask refresh-trending`
+# (run periodically, e.g. hourly) rebases every row onto a newer epoch
+# (multiplying by the decay since the old one) and prunes blogs that have
+# decayed to nothing.
+#
+# The current epoch lives in the single trending_meta row and is read in
+# every transaction that records events, under a share lock on Postgres. A
+# rebase updates that row before touching any scores, so it waits for
+# in-flight increments to commit and later ones see the new epoch: every
+# process moves to a new epoch together.
+
+def _half_life_seconds():
+    return current_app.config['TRENDING_HALF_LIFE_HOURS'] * 3600
+
+
+def event_weights():
+    config = current_app.config
+    return {
+        'like': config['TRENDING_LIKE_WEIGHT'],
+        'view': config['TRENDING_VIEW_WEIGHT'],
+        'comment': config['TRENDING_COMMENT_WEIGHT'],
+        'publish': config['TRENDING_PUBLISH_WEIGHT']
+    }
+
+
+def _growth(at, epoch):
+    """Weight multiplier for an event at `at` relative to `epoch`."""
+    return 2 ** ((at - epoch).total_seconds() / _half_life_seconds())
+
+
+def _current_epoch():
+    """The epoch new increments are expressed in, read in the caller's transaction."""
+    query = db.session.query(TrendingMeta.epoch).filter(TrendingMeta.id == 1).with_for_update(read=True)
+    epoch = query.scalar()
+    if epoch is None:
+        # First use: adopt whatever epoch existing scores are on
+        epoch = db.session.query(func.max(TrendingScore.epoch)).scalar()
+        if epoch is None:
+            epoch = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        statement = dialect_insert(TrendingMeta.__table__).values(id=1, epoch=epoch)
+        db.session.execute(statement.on_conflict_do_nothing(index_elements=['id']))
+        epoch = query.scalar()
+    return epoch
+
+
+def _set_epoch(epoch):
+    """Move new increments onto epoch; locks out record_events until commit."""
+    statement = dialect_insert(TrendingMeta.__table__).values(id=1, epoch=epoch)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['id'],
+        set_={'epoch': statement.excluded.epoch}
+    ))
+
+
+def decayed_score(score, epoch, at=None):
+    """Convert a stored score into its value at `at` (default now)."""
+    return score / _growth(at or datetime.utcnow(), epoch)
+
+
+def record_events(weights_by_blog, at=None):
+    """Add {blog_id: weight} to the trending scores in the caller's transaction.
+
+    Runs as one executemany upsert. An increment only applies to a row
+    still on the epoch it was computed for; if a rebase slipped in anyway
+    (SQLite takes no share lock), the epoch is re-read and the leftover
+    increments retried. Rebasing is left to `flask refresh-trending`; past
+    TRENDING_REBASE_AFTER_HALF_LIVES this only logs a warning.
+    """
+    weights_by_blog = {blog_id: w for blog_id, w in weights_by_blog.items() if w}
+    if not weights_by_blog:
+        return
+    at = at or datetime.utcnow()
+
+    epoch = _current_epoch()
+    if _growth(at, epoch) > 2 ** current_app.config['TRENDING_REBASE_AFTER_HALF_LIVES']:
+        current_app.logger.warning('Trending epoch %s is overdue for a rebase; run `flask refresh-trending`', epoch)
+
+    # Only published, non-archived blogs take part in trending
+    categories = dict(
+        db.session.query(Blog.id, Blog.category).filter(
+            Blog.id.in_(list(weights_by_blog)),
+            Blog.is_draft == False,
+            Blog.is_archived == False
+        ).all()
+    )
+    pending = {blog_id: w for blog_id, w in weights_by_blog.items() if blog_id in categories}
+
+    for _ in range(2):
+        if not pending:
+            return
+        growth = _growth(at, epoch)
+        statement = dialect_insert(TrendingScore.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['blog_id'],
+            set_={
+                'score': TrendingScore.__table__.c.score + statement.excluded.score,
+                'updated_at': statement.excluded.updated_at
+            },
+            where=TrendingScore.__table__.c.epoch == statement.excluded.epoch
+        )
+        db.session.execute(statement, [
+            {'blog_id': blog_id, 'category': categories[blog_id], 'score': weight * growth,
+             'epoch': epoch, 'updated_at': at}
+            for blog_id, weight in pending.items()
+        ])
+
+        # Rows left on another epoch were skipped by the WHERE clause
+        stale = db.session.query(TrendingScore.blog_id).filter(
+            TrendingScore.blog_id.in_(list(pending)),
+            TrendingScore.epoch != epoch
+        ).all()
+        pending = {row[0]: pending[row[0]] for row in stale}
+        if pending:
+            epoch = _current_epoch()
+
+
+def record_event(blog_id, kind, sign=1):
+    """Record a single 'like', 'view', 'comment' or 'publish' event for a blog."""
+    record_events({blog_id: sign * event_weights()[kind]})
+
+
+def sync_blog(blog):
+    """Keep a blog's row consistent with its visibility and category."""
+    if blog.is_draft or blog.is_archived:
+        remove_blog(blog.id)
+    else:
+        db.session.execute(
+            update(TrendingScore)
+            .where(TrendingScore.blog_id == blog.id)
+            .values(category=blog.category)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def remove_blog(blog_id):
+    db.session.execute(
+        delete(TrendingScore)
+        .where(TrendingScore.blog_id == blog_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_trending(at=None):
+    """Rebase every score onto a new epoch and prune rows that decayed away.
+
+    Returns the number of rows pruned.
+    """
+    at = at or datetime.utcnow()
+    new_epoch = at.replace(microsecond=0)
+    _set_epoch(new_epoch)
+    epochs = [row[0] for row in db.session.query(TrendingScore.epoch).distinct().all()]
+    for epoch in epochs:
+        db.session.execute(
+            update(TrendingScore)
+            .where(TrendingScore.epoch == epoch)
+            .values(score=TrendingScore.score / _growth(new_epoch, epoch), epoch=new_epoch)
+            .execution_options(synchronize_session=False)
+        )
+    pruned = db.session.execute(
+        delete(TrendingScore)
+        .where(TrendingScore.score < current_app.config['TRENDING_MIN_SCORE'])
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    bump_versions('trending')
+    return pruned
+
+
+def rebuild_trending(days=7):
+    """Recompute scores from the last `days` of likes, views, comments and posts.
+
+    Events are aggregated per blog and day, so the cost is one grouped
+    query per event table. Returns the number of blogs scored.
+    """
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
+    epoch = now.replace(microsecond=0)
+    weights = event_weights()
+
+    scores = defaultdict(float)
+    for model, kind in ((Like, 'like'), (BlogView, 'view'), (Comment, 'comment')):
+        day = func.date(model.timestamp)
+        rows = db.session.query(model.blog_id, day, func.count(model.id))\
+                         .filter(model.timestamp >= since)\
+                         .group_by(model.blog_id, day).all()
+        for blog_id, bucket, count in rows:
+            bucket = bucket if isinstance(bucket, datetime) else datetime.fromisoformat(str(bucket))
+            # Treat each day's events as happening at midday, capped at now
+            at = min(bucket + timedelta(hours=12), now)
+            scores[blog_id] += weights[kind] * count * _growth(at, epoch)
+
+    public = db.session.query(Blog.id, Blog.category, Blog.timestamp).filter(
+        Blog.is_draft == False,
+        Blog.is_archived == False
+    )
+    categories = {}
+    for blog_id, category, published_at in public.filter(Blog.timestamp >= since).all():
+        scores[blog_id] += weights['publish'] * _growth(published_at, epoch)
+        categories[blog_id] = category
+    missing = [blog_id for blog_id in scores if blog_id not in categories]
+    for start in range(0, len(missing), 500):
+        categories.update(public.filter(Blog.id.in_(missing[start:start + 500])).with_entities(Blog.id, Blog.category).all())
+
+    _set_epoch(epoch)
+    db.session.execute(delete(TrendingScore))
+    rows = [{'blog_id': blog_id, 'category': categories[blog_id], 'score': score, 'epoch': epoch, 'updated_at': now}
+            for blog_id, score in scores.items() if blog_id in categories]
+    if rows:
+        db.session.execute(TrendingScore.__table__.insert(), rows)
+    bump_versions('trending')
+    db.session.commit()
+    return len(rows)
+
+
+@click.command('refresh-trending')
+@with_appcontext
+def refresh_trending_command():
+    """Re-decay trending scores onto a fresh epoch (run periodically, e.g. hourly)."""
+    pruned = refresh_trending()
+    db.session.commit()
+    click.echo(f'Rebased trending scores, pruned {pruned} row(s)')
+
+
+@click.command('rebuild-trending')
+@click.option('--days', default=7, show_default=True, help='Days of history to score')
+@with_appcontext
+def rebuild_trending_command(days):
+    """Rebuild trending scores from raw likes, views and comments."""
+    scored = rebuild_trending(days=days)
+    click.echo(f'Scored {scored} blog(s)')
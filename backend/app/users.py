@@ -1,12 +1,28 @@
 from flask import Blueprint, request, jsonify
-from .models import User, Blog, Like, BlogView, Follow, db
+from .models import User, Blog, db
 from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from .pagination import keyset_page, cursor_pagination
+from .serializers import with_blog_relations, serialize_blog, public_blog_counts, blog_fields
+from .fieldsets import select_fields
+from .caching import conditional
+from .instrumentation import query_budget
+from .follow_graph import follow_counts
 
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
+def _profile_version_keys(username):
+    user_id = db.session.query(User.id).filter_by(username=username).scalar()
+    return [f'user:{user_id}'] if user_id else []
+
 @users_bp.route('/<username>', methods=['GET'])
+@conditional(_profile_version_keys)
+@query_budget(12)
 def get_user_profile(username):
     """Get user profile and their public blogs"""
+    # ?fields= applies to the blog items; ?include= picks the sections
+    selection = select_fields(blog_fields('preview', counts=('likes_count', 'views_count')),
+                              embeds=('tags', 'stats', 'blogs'))
     user = User.query.filter_by(username=username).first()
     if not user:
         return jsonify({'error': 'User not found'}), 404
@@ -21,59 +37,53 @@ def get_user_profile(username):
     if per_page < 1:
         return jsonify({'error': 'Items per page must be 1 or greater'}), 400
     
-    # Get user's published blogs with counts
-    blogs_query = Blog.query.filter(
-        Blog.user_id == user.id,
-        Blog.is_draft == False,
-        Blog.is_archived == False
-    ).order_by(Blog.timestamp.desc())
-    
-    paginated_blogs = blogs_query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    # Serialize blogs with counts
-    blogs_list = []
-    for blog in paginated_blogs.items:
-        likes_count = Like.query.filter_by(blog_id=blog.id).count()
-        views_count = BlogView.query.filter_by(blog_id=blog.id).count()
-        
-        blogs_list.append({
-            'id': blog.id,
-            'title': blog.title,
-            'content': blog.content[:200] + '...' if len(blog.content) > 200 else blog.content,
-            'timestamp': blog.timestamp.isoformat(),
-            'category': blog.category,
-            'tags': [tag.name for tag in blog.tags],
-            'likes_count': likes_count,
-            'views_count': views_count
-        })
-      # User stats
-    total_blogs = Blog.query.filter_by(user_id=user.id, is_draft=False, is_archived=False).count()
-    total_likes = db.session.query(func.count(Like.id)).join(Blog).filter(Blog.user_id == user.id).scalar() or 0
-    total_views = db.session.query(func.count(BlogView.id)).join(Blog).filter(Blog.user_id == user.id).scalar() or 0
-    
-    # Follow stats
-    followers_count = Follow.query.filter_by(followed_id=user.id).count()
-    following_count = Follow.query.filter_by(follower_id=user.id).count()
-    
-    return jsonify({
+    response = {
         'user': {
             'id': user.id,
             'username': user.username,
             'joined_date': user.created_at.isoformat() if hasattr(user, 'created_at') else None,
             'is_verified': user.is_verified
-        },
-        'stats': {
+        }
+    }
+
+    if 'stats' in selection:
+        # User stats
+        total_blogs = Blog.query.filter_by(user_id=user.id, is_draft=False, is_archived=False).count()
+        total_likes, total_views = db.session.query(
+            func.coalesce(func.sum(Blog.like_count), 0),
+            func.coalesce(func.sum(Blog.view_count), 0)
+        ).filter(Blog.user_id == user.id).one()
+        
+        # Follow stats
+        followers_count, following_count = follow_counts(user.id)
+        response['stats'] = {
             'total_blogs': total_blogs,
             'total_likes_received': total_likes,
             'total_views_received': total_views,
             'followers_count': followers_count,
             'following_count': following_count
-        },
-        'blogs': blogs_list,        'pagination': {
+        }
+
+    if 'blogs' in selection:
+        # Get user's published blogs with counts
+        blogs_query = Blog.query.filter(
+            Blog.user_id == user.id,
+            Blog.is_draft == False,
+            Blog.is_archived == False
+        ).order_by(Blog.timestamp.desc())
+        blogs_query = with_blog_relations(blogs_query, author=False, selection=selection, content='preview')
+        
+        paginated_blogs = blogs_query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        
+        # Serialize blogs with counts
+        response['blogs'] = [serialize_blog(blog, content='preview', author=False,
+                                            counts=('likes_count', 'views_count'), selection=selection)
+                             for blog in paginated_blogs.items]
+        response['pagination'] = {
             'page': paginated_blogs.page,
             'per_page': paginated_blogs.per_page,
             'total': paginated_blogs.total,
@@ -83,9 +93,11 @@ def get_user_profile(username):
             'next_num': paginated_blogs.next_num if paginated_blogs.has_next else None,
             'prev_num': paginated_blogs.prev_num if paginated_blogs.has_prev else None
         }
-    }), 200
+
+    return jsonify(response), 200
 
 @users_bp.route('', methods=['GET'])
+@query_budget(5)
 def get_all_users():
     """Get list of all users for discovery"""
     page = request.args.get('page', 1, type=int)
@@ -99,33 +111,27 @@ def get_all_users():
         return jsonify({'error': 'Items per page must be 1 or greater'}), 400
     
     search = request.args.get('search', '')
+    selection = select_fields(['id', 'username', 'joined_date', 'blog_count'])
     
     # Query users with search functionality
     query = User.query.filter(User.is_verified == True)
+    query = query.options(load_only(User.id, User.username, User.created_at))
     if search:
         query = query.filter(User.username.ilike(f'%{search}%'))
     
-    paginated_users = query.order_by(User.username).paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False
-    )
-    
-    users_list = []
-    for user in paginated_users.items:
-        # Get user stats
-        blog_count = Blog.query.filter_by(user_id=user.id, is_draft=False, is_archived=False).count()
-        
-        users_list.append({
-            'id': user.id,
-            'username': user.username,
-            'joined_date': user.created_at.isoformat() if hasattr(user, 'created_at') else None,
-            'blog_count': blog_count
-        })
-    
-    return jsonify({
-        'users': users_list,
-        'pagination': {
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        users, next_cursor = keyset_page(query, [User.username, User.id], cursor, per_page,
+                                         lambda user: (user.username, user.id), descending=False)
+        pagination = cursor_pagination(per_page, next_cursor)
+    else:
+        paginated_users = query.order_by(User.username).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        users = paginated_users.items
+        pagination = {
             'page': paginated_users.page,
             'per_page': paginated_users.per_page,
             'total': paginated_users.total,
@@ -135,4 +141,22 @@ def get_all_users():
             'next_num': paginated_users.next_num if paginated_users.has_next else None,
             'prev_num': paginated_users.prev_num if paginated_users.has_prev else None
         }
+    
+    # Get user stats for the whole page in one grouped query
+    blog_counts = public_blog_counts([user.id for user in users]) if 'blog_count' in selection else {}
+
+    users_list = []
+    for user in users:
+        item = {'id': user.id}
+        if 'username' in selection:
+            item['username'] = user.username
+        if 'joined_date' in selection:
+            item['joined_date'] = user.created_at.isoformat() if hasattr(user, 'created_at') else None
+        if 'blog_count' in selection:
+            item['blog_count'] = blog_counts.get(user.id, 0)
+        users_list.append(item)
+    
+    return jsonify({
+        'users': users_list,
+        'pagination': pagination
     }), 200
\ No newline at end of file
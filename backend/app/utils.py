@@ -1,7 +1,10 @@
+from functools import wraps
 from itsdangerous import URLSafeTimedSerializer
-from flask import current_app
+from flask import current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from flask_mail import Message
-from . import mail
+from . import mail, db
+from .models import User
 
 def generate_confirmation_token(email):
     """Generates a secure, timed token."""
@@ -29,4 +32,27 @@ def send_email(to, subject, html_body):
         html=html_body,
         sender=current_app.config['MAIL_DEFAULT_SENDER']
     )
-    mail.send(msg)
\ No newline at end of file
+    mail.send(msg)
+
+def admin_required(view):
+    """Allow only users listed in ADMIN_USERNAMES."""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        user = db.session.get(User, int(get_jwt_identity()))
+        if user is None or user.username not in current_app.config['ADMIN_USERNAMES']:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def dialect_insert(table):
+    """INSERT construct for the bound database, with ON CONFLICT support.
+
+    Both SQLite and Postgres accept INSERT ... ON CONFLICT, but SQLAlchemy
+    exposes it through dialect-specific insert() constructs.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
@@ -0,0 +1,261 @@
+# app/view_tracking.py
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict, Counter
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from .models import db, Blog, BlogView, User
+from .counters import bump_blog_counters
+from .trending import record_events, event_weights
+from .caching import bump_versions
+from .metrics import VIEWS_RECORDED
+
+
+class ViewDeduper:
+    """Bounded in-memory record of who viewed what, used for the view cooldown.
+
+    Entries are kept in first-seen order so expired ones can be dropped from
+    the front; once max_entries is reached the oldest entries are evicted.
+    """
+
+    def __init__(self, window_seconds, max_entries):
+        self.window = window_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def should_record(self, key, now=None):
+        """Return True (and remember the key) unless it was seen inside the window."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            seen_at = self._entries.get(key)
+            if seen_at is not None and now - seen_at < self.window:
+                return False
+
+            self._entries[key] = now
+            self._entries.move_to_end(key)
+
+            # Drop expired entries from the front, then enforce the size bound
+            while self._entries:
+                oldest_key, oldest_at = next(iter(self._entries.items()))
+                if now - oldest_at < self.window and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+            return True
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ViewBuffer:
+    """Write-behind queue for BlogView rows.
+
+    Views are appended in memory and written by a background thread in
+    batched multi-row inserts, together with one executemany UPDATE of the
+    blog view counters. A flush happens when batch_size views are pending
+    or every flush_interval seconds, and once more at interpreter shutdown.
+
+    max_unflushed is the loss budget: if that many views are waiting (for
+    example because the database is slow) the request thread flushes
+    synchronously, so a crash can never lose more than that many views.
+
+    Views of blogs deleted before the flush are dropped, and a batch the
+    database rejects outright (an IntegrityError) is discarded rather than
+    requeued; only transient failures are retried.
+    """
+
+    def __init__(self, app, batch_size=500, flush_interval=2.0, max_unflushed=5000,
+                 dedupe_window=3600, dedupe_max_entries=100000, background=True):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_unflushed = max_unflushed
+        self.background = background
+        self.deduper = ViewDeduper(dedupe_window, dedupe_max_entries)
+
+        self._rows = []
+        self._pending_by_blog = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+        self.flushed_total = 0
+        self.dropped_total = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.last_flush_at = None
+
+    def record(self, blog_id, user_id, ip_address=None):
+        """Queue a view unless the (user, blog) pair is inside the cooldown."""
+        if not self.deduper.should_record((user_id, blog_id)):
+            VIEWS_RECORDED.inc('deduplicated')
+            return False
+        VIEWS_RECORDED.inc('recorded')
+
+        with self._lock:
+            self._rows.append({
+                'blog_id': blog_id,
+                'user_id': user_id,
+                'ip_address': ip_address,
+                'timestamp': datetime.utcnow()
+            })
+            self._pending_by_blog[blog_id] += 1
+            depth = len(self._rows)
+
+        if not self.background or depth >= self.max_unflushed:
+            self.flush()
+        else:
+            self._ensure_thread()
+            if depth >= self.batch_size:
+                self._wakeup.set()
+        return True
+
+    def pending_count(self, blog_id):
+        """Views for blog_id that are queued but not yet written."""
+        with self._lock:
+            return self._pending_by_blog.get(blog_id, 0)
+
+    def flush(self):
+        """Write every queued view. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    # Blogs deleted since the view was recorded
+                    queued_ids = {row['blog_id'] for row in rows}
+                    existing = {row[0] for row in db.session.query(Blog.id).filter(Blog.id.in_(queued_ids))}
+                    if len(existing) < len(queued_ids):
+                        self._discard([row for row in rows if row['blog_id'] not in existing])
+                        rows = [row for row in rows if row['blog_id'] in existing]
+                        if not rows:
+                            return 0
+                    # Viewers deleted since then count as anonymous
+                    user_ids = {row['user_id'] for row in rows if row['user_id'] is not None}
+                    if user_ids:
+                        users = {row[0] for row in db.session.query(User.id).filter(User.id.in_(user_ids))}
+                        rows = [row if row['user_id'] is None or row['user_id'] in users else dict(row, user_id=None)
+                                for row in rows]
+                    deltas = Counter(row['blog_id'] for row in rows)
+                    db.session.execute(insert(BlogView), rows)
+                    bump_blog_counters('view_count', deltas)
+                    view_weight = event_weights()['view']
+                    record_events({blog_id: count * view_weight for blog_id, count in deltas.items()})
+                    # View totals show on the authors' profiles
+                    authors = db.session.query(Blog.user_id).filter(Blog.id.in_(list(deltas))).distinct().all()
+                    bump_versions(*(f'user:{row[0]}' for row in authors))
+                    db.session.commit()
+            except IntegrityError:
+                # Retrying cannot succeed (e.g. a blog deleted mid-flush)
+                self.app.logger.exception('Dropping %d buffered views the database rejected', len(rows))
+                self._discard(rows)
+                return 0
+            except Exception:
+                self.app.logger.exception('Failed to flush %d buffered views', len(rows))
+                self._requeue(rows)
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._pending_by_blog.subtract(deltas)
+                self._pending_by_blog += Counter()  # drop zero entries
+                self.flushed_total += len(rows)
+                self.flush_count += 1
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self.last_flush_at = datetime.utcnow()
+            return len(rows)
+
+    def _discard(self, rows):
+        """Forget rows that will never be written."""
+        with self._lock:
+            self._pending_by_blog.subtract(Counter(row['blog_id'] for row in rows))
+            self._pending_by_blog += Counter()
+            self.dropped_total += len(rows)
+
+    def _requeue(self, rows):
+        """Put failed rows back, keeping at most max_unflushed in memory."""
+        with self._lock:
+            self._rows = rows + self._rows
+            overflow = len(self._rows) - self.max_unflushed
+            if overflow > 0:
+                dropped, self._rows = self._rows[:overflow], self._rows[overflow:]
+                self._pending_by_blog.subtract(Counter(row['blog_id'] for row in dropped))
+                self._pending_by_blog += Counter()
+                self.dropped_total += overflow
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid:
+                return
+            # Either first use or we are in a forked worker whose parent
+            # started the thread; threads do not survive fork.
+            self._pid = pid
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='view-buffer-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """Stop the flusher thread and write whatever is still queued."""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': len(self._rows),
+                'dedupe_entries': len(self.deduper),
+                'flushed_total': self.flushed_total,
+                'dropped_total': self.dropped_total,
+                'flush_count': self.flush_count,
+                'last_flush_ms': round(self.last_flush_ms, 3),
+                'max_flush_ms': round(self.max_flush_ms, 3),
+                'last_flush_at': self.last_flush_at.isoformat() if self.last_flush_at else None,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'max_unflushed': self.max_unflushed
+            }
+
+
+def init_view_tracking(app):
+    """Create the app's ViewBuffer and make sure it is drained at shutdown."""
+    buffer = ViewBuffer(
+        app,
+        batch_size=app.config['VIEW_FLUSH_BATCH_SIZE'],
+        flush_interval=app.config['VIEW_FLUSH_INTERVAL'],
+        max_unflushed=app.config['VIEW_MAX_UNFLUSHED'],
+        dedupe_window=app.config['VIEW_DEDUPE_WINDOW'],
+        dedupe_max_entries=app.config['VIEW_DEDUPE_MAX_ENTRIES'],
+        background=app.config['VIEW_BUFFER_ENABLED']
+    )
+    app.extensions['view_buffer'] = buffer
+    atexit.register(buffer.stop)
+    return buffer
+
+
+def get_view_buffer():
+    return current_app.extensions['view_buffer']
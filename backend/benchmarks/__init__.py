@@ -0,0 +1,10 @@
+"""Benchmarks for the blogging API.
+
+Each module is a standalone script run from backend/ (see its docstring):
+
+    db_profile.py         read throughput per DB_PROFILE under concurrent writes
+    generate_data.py      synthetic users, blogs, likes, views, comments, follows
+    load_test.py          drives every blueprint's endpoints at a set concurrency
+    login_throughput.py   inline vs. pooled bcrypt under a login storm
+    startup_time.py       import-to-first-request time per STARTUP_MODE
+"""
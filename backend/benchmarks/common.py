@@ -0,0 +1,52 @@
+"""Helpers shared by the benchmark scripts."""
+import bisect
+import itertools
+import os
+import random
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def bench_username(user_id):
+    return f'bench{user_id}'
+
+
+def bench_email(user_id):
+    return f'bench{user_id}@example.com'
+
+
+class Zipf:
+    """Draw from [first, first + n) with Zipf-like popularity (exponent s).
+
+    Ranks are shuffled with `seed`, so the popular items are spread over
+    the id range instead of being the lowest ids, and the same seed gives
+    the generator and the load test the same hot set.
+    """
+
+    def __init__(self, first, n, s=1.1, seed=0):
+        self.first = first
+        self.n = n
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+        self.total = self.cum_weights[-1]
+        self.ids = list(range(first, first + n))
+        random.Random(seed).shuffle(self.ids)
+
+    def sample(self, rng):
+        return self.ids[bisect.bisect(self.cum_weights, rng.random() * self.total, 0, self.n - 1)]
+
+    def samples(self, rng, k):
+        cum_weights, total, ids, hi = self.cum_weights, self.total, self.ids, self.n - 1
+        return [ids[bisect.bisect(cum_weights, rng.random() * total, 0, hi)] for _ in range(k)]
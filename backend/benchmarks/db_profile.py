@@ -0,0 +1,209 @@
+"""Concurrent read throughput per DB_PROFILE while likes and views are written.
+
+A dataset is generated once (generate_data.py) into a SQLite file and
+copied fresh for each profile. Then, in a separate interpreter per
+profile, readers fetch public pages (the blog list, a blog's comments
+and like count) while writers toggle likes and view blogs. Each reader
+and writer is a forked process sharing the database, as under a
+preforking server (--threads makes them threads of one process). The
+view buffer is disabled, so every view is its own write transaction.
+The report gives read and write throughput, read latency percentiles and
+failed requests ("database is locked" shows up as a 500) per profile.
+
+    cd backend
+    python benchmarks/db_profile.py --readers 8 --writers 2 --seconds 20
+    python benchmarks/db_profile.py --scale small --json results.json
+    python benchmarks/db_profile.py --database-uri postgresql://localhost/bench --manifest benchmarks/manifest.json
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BACKEND, percentile
+
+PROFILES = ('default', 'tuned')
+
+
+def client_loop(app, role, seed, token, manifest, measure_from, deadline):
+    """One reader or writer; returns (latencies in ms, failed requests)."""
+    client, rng, latencies, failed = app.test_client(), random.Random(seed), [], 0
+    first_blog, last_blog = manifest['blogs']
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    while time.perf_counter() < deadline:
+        blog_id = rng.randint(first_blog, last_blog)
+        started = time.perf_counter()
+        if role == 'read':
+            path = rng.choice([f'/api/blogs?page={rng.randint(1, 20)}', f'/api/comments/blog/{blog_id}',
+                               f'/api/likes/blog/{blog_id}'])
+            status = client.get(path).status_code
+        elif rng.random() < 0.5:
+            status = client.post(f'/api/likes/blog/{blog_id}', headers=headers).status_code
+        else:
+            status = client.get(f'/api/blogs/{blog_id}', headers=headers).status_code  # records a view
+        if started >= measure_from:
+            latencies.append((time.perf_counter() - started) * 1000)
+            failed += status >= 500
+    return latencies, failed
+
+
+def run_profile(args, manifest):
+    """Runs in the child interpreter; prints one JSON line of results."""
+    import multiprocessing
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.models import db
+
+    app = create_app()
+    app.extensions['mail'].suppress = True
+    first_user, last_user = manifest['users']
+    with app.app_context():
+        tokens = [create_access_token(identity=str(user_id))
+                  for user_id in random.Random(1).sample(range(first_user, last_user + 1), args.writers)]
+        engine = db.engine
+
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.seconds
+    clients = [('read', i, None) for i in range(args.readers)]
+    clients += [('write', 1000 + i, token) for i, token in enumerate(tokens)]
+    results = {'read': [], 'write': []}
+    failures = {'read': 0, 'write': 0}
+
+    if args.threads:
+        lock = threading.Lock()
+
+        def run(role, seed, token):
+            latencies, failed = client_loop(app, role, seed, token, manifest, measure_from, deadline)
+            with lock:
+                results[role].extend(latencies)
+                failures[role] += failed
+
+        threads = [threading.Thread(target=run, args=client) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        # One forked process per client, like a preforking server
+        engine.dispose()
+        queue = multiprocessing.get_context('fork').Queue()
+
+        def run(role, seed, token):
+            queue.put((role,) + client_loop(app, role, seed, token, manifest, measure_from, deadline))
+
+        processes = [multiprocessing.get_context('fork').Process(target=run, args=client) for client in clients]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            role, latencies, failed = queue.get()
+            results[role].extend(latencies)
+            failures[role] += failed
+        for process in processes:
+            process.join()
+
+    reads, writes = results['read'], results['write']
+    print(json.dumps({
+        'reads': len(reads),
+        'read_rps': round(len(reads) / args.seconds, 1),
+        'read_p50_ms': percentile(reads, 50),
+        'read_p95_ms': percentile(reads, 95),
+        'read_p99_ms': percentile(reads, 99),
+        'writes': len(writes),
+        'write_rps': round(len(writes) / args.seconds, 1),
+        'write_p50_ms': percentile(writes, 50),
+        'write_p99_ms': percentile(writes, 99),
+        'failed_reads': failures['read'],
+        'failed_writes': failures['write']
+    }))
+
+
+def generate(args, workdir):
+    """Build the dataset once; returns (sqlite path, manifest)."""
+    path = os.path.join(workdir, 'seed.db')
+    manifest_path = os.path.join(workdir, 'manifest.json')
+    subprocess.run([sys.executable, 'benchmarks/generate_data.py', '--scale', args.scale, '--manifest', manifest_path],
+                   cwd=BACKEND, env=dict(os.environ, DATABASE_URI=f'sqlite:///{path}'), check=True,
+                   stdout=subprocess.DEVNULL)
+    with open(manifest_path) as f:
+        return path, json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES, default=list(PROFILES))
+    parser.add_argument('--scale', default='tiny', help='generate_data.py preset for the SQLite dataset')
+    parser.add_argument('--database-uri', help='Benchmark an existing database (with its --manifest) instead')
+    parser.add_argument('--manifest', help='Manifest of the database given with --database-uri')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=15.0, help='Measured duration per profile')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--threads', action='store_true', help='Clients as threads of one process, not processes')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--child', help=argparse.SUPPRESS)  # manifest path, set when run per profile
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child) as f:
+            run_profile(args, json.load(f))
+        return
+
+    workdir = tempfile.mkdtemp(prefix='db-profile-')
+    try:
+        if args.database_uri:
+            if not args.manifest:
+                parser.error('--database-uri needs the --manifest generate_data.py wrote for it')
+            seed_path, manifest_path = None, args.manifest
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        else:
+            seed_path, manifest = generate(args, workdir)
+            manifest_path = os.path.join(workdir, 'manifest.json')
+
+        results = {}
+        for profile in args.profiles:
+            uri = args.database_uri
+            if seed_path:
+                # Every profile starts from the same bytes, in rollback-journal mode
+                path = os.path.join(workdir, f'{profile}.db')
+                shutil.copyfile(seed_path, path)
+                uri = f'sqlite:///{path}'
+            env = dict(os.environ, DATABASE_URI=uri, DB_PROFILE=profile, VIEW_BUFFER_ENABLED='false',
+                       MAIL_OUTBOX_ENABLED='true', SQL_QUERY_BUDGETS='off', BCRYPT_LOG_ROUNDS='10')
+            child = subprocess.run([sys.executable, 'benchmarks/db_profile.py', '--child', manifest_path,
+                                    '--readers', str(args.readers), '--writers', str(args.writers),
+                                    '--seconds', str(args.seconds), '--warmup', str(args.warmup)]
+                                   + (['--threads'] if args.threads else []),
+                                   cwd=BACKEND, env=env, check=True, capture_output=True, text=True)
+            results[profile] = json.loads(child.stdout.strip().splitlines()[-1])
+            stats = results[profile]
+            print(f"{profile:>8}: reads {stats['read_rps']:>7}/s  p50 {stats['read_p50_ms']} ms  "
+                  f"p95 {stats['read_p95_ms']} ms  p99 {stats['read_p99_ms']} ms  | "
+                  f"writes {stats['write_rps']:>6}/s  p99 {stats['write_p99_ms']} ms  | "
+                  f"failed {stats['failed_reads']} reads, {stats['failed_writes']} writes")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'db_profile',
+                'database': manifest['database'],
+                'dataset': manifest['counts'],
+                'readers': args.readers,
+                'writers': args.writers,
+                'seconds': args.seconds,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Response size and query time saved by ?fields= and ?include=.
+
+Each case is one endpoint requested with its full response and with a
+few typical sparse fieldsets, against the data described by
+generate_data.py's manifest. The app runs in-process and a cursor
+listener times every SQL statement, so the report gives, per fieldset,
+the mean response bytes, the mean request and SQL time and the
+statements per request, and the savings against the full response.
+
+    cd backend
+    python benchmarks/generate_data.py --scale small
+    python benchmarks/fieldsets.py --requests 200
+    python benchmarks/fieldsets.py --only comments --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BENCH_PASSWORD, Zipf, bench_email, bench_username, percentile
+
+# (name, path, query strings); the first query string is the baseline.
+# {blog} and {user} are filled with ids drawn like the load test's.
+CASES = [
+    ('blog list', '/api/blogs?per_page=50', [
+        '', 'fields=id,title', 'fields=id,title,author,timestamp', 'include=author,tags'
+    ]),
+    ('blog detail', '/api/blogs/{blog}', [
+        '', 'fields=id,title,author,likes_count', 'fields=title,reading_time,word_count'
+    ]),
+    ('search', '/api/blogs/search?q=python&per_page=50', [
+        '', 'fields=id,title,rank', 'fields=id,title,author'
+    ]),
+    ('trending', '/api/blogs/trending?per_page=50', [
+        '', 'fields=id,title,trending_score'
+    ]),
+    ('feed', '/api/feed?per_page=50', [
+        '', 'fields=id,title,author,likes_count'
+    ]),
+    ('profile', '/api/users/{username}?per_page=50', [
+        '', 'include=stats', 'fields=id,title,blogs'
+    ]),
+    ('comments', '/api/comments/blog/{blog}?per_page=50', [
+        '', 'fields=content,user', 'fields=content,likes,replies_count', 'include=user'
+    ]),
+    ('users', '/api/users?per_page=50', [
+        '', 'fields=username'
+    ]),
+    ('followers', '/api/follows/followers/{user}?per_page=50', [
+        '', 'fields=username'
+    ])
+]
+
+
+class SqlTimer:
+    """Count and time the statements executed on an engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statements, self.seconds, self.started = 0, 0.0, {}
+        event.listen(engine, 'before_cursor_execute', self.before)
+        event.listen(engine, 'after_cursor_execute', self.after)
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        self.started[id(cursor)] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.seconds += time.perf_counter() - self.started.pop(id(cursor), time.perf_counter())
+        self.statements += 1
+
+    def reset(self):
+        self.statements, self.seconds = 0, 0.0
+
+
+def measure(client, headers, timer, paths):
+    """Mean bytes, request and SQL milliseconds and statements over paths."""
+    sizes, latencies, sql_ms, statements = [], [], [], []
+    for path in paths:
+        timer.reset()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f'GET {path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        sizes.append(len(response.get_data()))
+        sql_ms.append(timer.seconds * 1000)
+        statements.append(timer.statements)
+    n = len(paths)
+    return {
+        'bytes': round(sum(sizes) / n),
+        'request_ms': round(sum(latencies) / n, 3),
+        'p95_ms': percentile(latencies, 95),
+        'sql_ms': round(sum(sql_ms) / n, 3),
+        'statements': round(sum(statements) / n, 2)
+    }
+
+
+def run(args, manifest):
+    from app import create_app, db
+    app = create_app()
+    app.extensions['mail'].suppress = True  # stay offline
+    client = app.test_client()
+
+    rng = random.Random(args.seed)
+    blogs = Zipf(manifest['blogs'][0], manifest['blogs'][1] - manifest['blogs'][0] + 1,
+                 manifest['skew']['blogs'], manifest['seed'])
+    user_id = rng.randint(*manifest['users'])
+    response = client.post('/api/auth/login', json={'email': bench_email(user_id), 'password': BENCH_PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f'Login as {bench_email(user_id)} failed with {response.status_code}')
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    with app.app_context():
+        timer = SqlTimer(db.engine)
+
+    results = []
+    for name, path, queries in CASES:
+        if args.only and not re.search(args.only, name):
+            continue
+        # The same ids for every fieldset of a case
+        ids = []
+        for _ in range(args.requests):
+            user = rng.randint(*manifest['users'])
+            ids.append({'blog': blogs.sample(rng), 'user': user, 'username': bench_username(user)})
+        for query in queries:
+            separator = '&' if '?' in path else '?'
+            paths = [path.format(**values) + (separator + query if query else '') for values in ids]
+            measure(client, headers, timer, paths[:args.warmup])
+            stats = measure(client, headers, timer, paths)
+            stats.update(case=name, query=query or '(full)')
+            results.append(stats)
+
+    for name, _, _ in CASES:
+        rows = [stats for stats in results if stats['case'] == name]
+        if not rows:
+            continue
+        full = rows[0]
+        for stats in rows[1:]:
+            stats['bytes_saved_pct'] = round(100 * (1 - stats['bytes'] / full['bytes']), 1)
+            stats['sql_ms_saved_pct'] = round(100 * (1 - stats['sql_ms'] / full['sql_ms']), 1) if full['sql_ms'] else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--manifest', default='benchmarks/manifest.json', help='Written by generate_data.py')
+    parser.add_argument('--requests', type=int, default=100, help='Measured requests per fieldset')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests before those')
+    parser.add_argument('--only', help='Regex on case names, e.g. "blog|comments"')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    # In-process runs use the generator's cost factor instead of calibrating
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '10')
+
+    results = run(args, manifest)
+    width = max(len(f"{stats['case']} {stats['query']}") for stats in results) if results else 10
+    print(f"{'request':<{width}}  {'bytes':>8} {'saved':>6} {'req ms':>8} {'p95':>8} {'sql ms':>8} {'saved':>6} {'stmts':>5}")
+    for stats in results:
+        label = f"{stats['case']} {stats['query']}"
+        bytes_saved = f"{stats['bytes_saved_pct']}%" if 'bytes_saved_pct' in stats else ''
+        sql_saved = f"{stats['sql_ms_saved_pct']}%" if stats.get('sql_ms_saved_pct') is not None else ''
+        print(f"{label:<{width}}  {stats['bytes']:>8} {bytes_saved:>6} {stats['request_ms']:>8} {stats['p95_ms']:>8} "
+              f"{stats['sql_ms']:>8} {sql_saved:>6} {stats['statements']:>5}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'fieldsets',
+                'database': manifest['database'],
+                'dataset': manifest['counts'],
+                'requests': args.requests,
+                'seed': args.seed,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""Bulk-load synthetic data for the benchmarks.
+
+Inserts users, tags, blogs, likes, views, comments, comment likes, follows
+and category preferences with multi-row inserts, committing every --chunk
+rows. Popularity is skewed: a few authors write most posts, a few posts
+get most likes, views and comments, and a few users get most followers.
+Then the derived tables (counters, search index, trending, feeds) are
+rebuilt, and a manifest is written that load_test.py reads to pick ids.
+
+Every user's password is benchmarks.common.BENCH_PASSWORD. Runs against
+DATABASE_URI (SQLite or Postgres), appending to whatever is there.
+
+    cd backend
+    python benchmarks/generate_data.py --scale small
+    DATABASE_URI=postgresql://localhost/blog_bench python benchmarks/generate_data.py --scale large
+    python benchmarks/generate_data.py --scale tiny --blogs 50000 --manifest bench.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BENCH_PASSWORD, Zipf, bench_username, bench_email
+
+SCALES = {
+    'tiny': dict(users=200, blogs=2000, likes=10000, views=10000, comments=4000, follows=2000),
+    'small': dict(users=2000, blogs=20000, likes=200000, views=200000, comments=40000, follows=40000),
+    'medium': dict(users=20000, blogs=200000, likes=2000000, views=2000000, comments=400000, follows=1000000),
+    'large': dict(users=100000, blogs=1000000, likes=10000000, views=10000000, comments=2000000, follows=10000000),
+}
+
+TAG_COUNT = 500
+BLOG_SKEW = 1.1      # likes, views and comments per blog
+AUTHOR_SKEW = 1.0    # blogs per author
+FOLLOWED_SKEW = 1.2  # followers per user
+TAG_SKEW = 1.0
+
+WORDS = (
+    'the a of and to in is for on with as by this that from at it an be are or was which we can '
+    'python flask database query index cache latency throughput request server client api design '
+    'system data model performance scale test deploy cloud service user blog post write read '
+    'learn build code debug release feature team product growth review guide tips how why what'
+).split()
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def _timestamp(rng, now, days):
+    # Squared so recent activity is denser, like a live site
+    return now - timedelta(seconds=days * 86400 * rng.random() ** 2)
+
+
+class Loader:
+    def __init__(self, db, chunk, seed):
+        self.db = db
+        self.chunk = chunk
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow()
+        self.sqlite = db.engine.dialect.name == 'sqlite'
+
+    def insert(self, table, rows, ignore_conflicts=False):
+        from sqlalchemy import insert, text
+        from app.utils import dialect_insert
+
+        if not rows:
+            return
+        if self.sqlite:
+            # Durability does not matter for throwaway benchmark data
+            self.db.session.execute(text('PRAGMA synchronous=OFF'))
+        statement = dialect_insert(table).on_conflict_do_nothing() if ignore_conflicts else insert(table)
+        self.db.session.execute(statement, rows)
+        self.db.session.commit()
+
+    def load(self, name, table, source, ignore_conflicts=False):
+        """Insert the rows from an iterable (None entries are skipped) in chunks."""
+        started = time.perf_counter()
+        rows, written = [], 0
+        for row in source:
+            if row is not None:
+                rows.append(row)
+            if len(rows) >= self.chunk:
+                self.insert(table, rows, ignore_conflicts)
+                written += len(rows)
+                rows = []
+        self.insert(table, rows, ignore_conflicts)
+        written += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f'{name:>16}: {written:>10,} rows in {elapsed:7.1f}s ({written / max(elapsed, 1e-9):,.0f}/s)', flush=True)
+        return written
+
+
+def _next_id(db, model):
+    from sqlalchemy import func
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def generate(counts, seed=42, chunk=5000, days=90, derived=True):
+    from app import create_app, db
+    from app.blogs import BLOG_CATEGORIES
+    from app.excerpts import content_fields
+    from app.models import (User, Tag, Blog, blog_tags, Like, BlogView, Comment, CommentLike,
+                            Follow, UserCategoryPreference)
+    from app.passwords import hash_password
+    from sqlalchemy import text
+
+    app = create_app()
+    with app.app_context():
+        loader = Loader(db, chunk, seed)
+        rng, now = loader.rng, loader.now
+        first_user, first_blog, first_comment = _next_id(db, User), _next_id(db, Blog), _next_id(db, Comment)
+        n_users, n_blogs, n_comments = counts['users'], counts['blogs'], counts['comments']
+        if n_users < 2 or n_blogs < 1:
+            raise SystemExit('Need at least 2 users and 1 blog')
+
+        password_hash = hash_password(BENCH_PASSWORD)
+        loader.load('users', User.__table__, ({
+            'id': user_id,
+            'username': bench_username(user_id),
+            'email': bench_email(user_id),
+            'password_hash': password_hash,
+            'created_at': _timestamp(rng, now, days * 2),
+            'is_verified': True
+        } for user_id in range(first_user, first_user + n_users)))
+
+        loader.load('tags', Tag.__table__, ({'name': f'topic{i}'} for i in range(TAG_COUNT)), ignore_conflicts=True)
+        tag_ids = [tag_id for tag_id, in db.session.query(Tag.id).filter(
+            Tag.name.in_([f'topic{i}' for i in range(TAG_COUNT)])).order_by(Tag.id)]
+
+        authors = Zipf(first_user, n_users, AUTHOR_SKEW, seed)
+        def blog_row(i):
+            content = _text(rng, 30, 150)
+            return {
+                'id': first_blog + i,
+                'title': _text(rng, 3, 9).capitalize(),
+                'content': content,
+                **content_fields(content),
+                'timestamp': _timestamp(rng, now, days),
+                'user_id': authors.sample(rng),
+                'category': rng.choice(BLOG_CATEGORIES) if rng.random() < 0.9 else None,
+                'is_draft': rng.random() < 0.05,
+                'is_archived': rng.random() < 0.02
+            }
+        loader.load('blogs', Blog.__table__, (blog_row(i) for i in range(n_blogs)))
+
+        tags = Zipf(0, len(tag_ids), TAG_SKEW, seed)
+
+        def blog_tag_rows():
+            for blog_id in range(first_blog, first_blog + n_blogs):
+                for tag_id in {tag_ids[t] for t in tags.samples(rng, rng.randint(0, 4))}:
+                    yield {'blog_id': blog_id, 'tag_id': tag_id}
+        loader.load('blog_tags', blog_tags, blog_tag_rows())
+
+        blogs = Zipf(first_blog, n_blogs, BLOG_SKEW, seed)
+        loader.load('likes', Like.__table__, ({
+            'user_id': rng.randrange(first_user, first_user + n_users),
+            'blog_id': blogs.sample(rng),
+            'timestamp': _timestamp(rng, now, days)
+        } for _ in range(counts['likes'])), ignore_conflicts=True)
+
+        def view_row():
+            signed_in = rng.random() < 0.7
+            return {
+                'blog_id': blogs.sample(rng),
+                'user_id': rng.randrange(first_user, first_user + n_users) if signed_in else None,
+                'ip_address': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+                'timestamp': _timestamp(rng, now, days)
+            }
+        loader.load('views', BlogView.__table__, (view_row() for _ in range(counts['views'])))
+
+        comment_blogs = array('i', bytes(4 * n_comments))
+        last_top_level = {}  # blog id -> latest top-level comment id, for replies
+
+        def comment_row(i):
+            blog_id = blogs.sample(rng)
+            comment_blogs[i] = blog_id
+            parent_id = last_top_level.get(blog_id) if rng.random() < 0.3 else None
+            if parent_id is None:
+                last_top_level[blog_id] = first_comment + i
+                if len(last_top_level) > 100000:
+                    last_top_level.clear()
+            return {
+                'id': first_comment + i,
+                'content': _text(rng, 5, 40),
+                'timestamp': _timestamp(rng, now, days),
+                'user_id': rng.randrange(first_user, first_user + n_users),
+                'blog_id': blog_id,
+                'parent_id': parent_id
+            }
+        loader.load('comments', Comment.__table__, (comment_row(i) for i in range(n_comments)))
+        last_top_level.clear()
+
+        def comment_like_row():
+            comment = rng.randrange(n_comments)
+            return {
+                'user_id': rng.randrange(first_user, first_user + n_users),
+                'comment_id': first_comment + comment,
+                'blog_id': comment_blogs[comment]
+            }
+        if n_comments:
+            loader.load('comment_likes', CommentLike.__table__, (comment_like_row() for _ in range(n_comments // 2)),
+                        ignore_conflicts=True)
+
+        followed = Zipf(first_user, n_users, FOLLOWED_SKEW, seed + 1)
+
+        def follow_row():
+            follower = rng.randrange(first_user, first_user + n_users)
+            target = followed.sample(rng)
+            if follower == target:
+                return None
+            return {'follower_id': follower, 'followed_id': target, 'timestamp': _timestamp(rng, now, days)}
+        loader.load('follows', Follow.__table__, (follow_row() for _ in range(counts['follows'])), ignore_conflicts=True)
+
+        loader.load('preferences', UserCategoryPreference.__table__, (
+            {'user_id': user_id, 'category': category}
+            for user_id in range(first_user, first_user + n_users)
+            for category in rng.sample(BLOG_CATEGORIES, rng.randint(0, 3))
+        ))
+
+        if db.engine.dialect.name == 'postgresql':
+            # Ids were given explicitly, so move the sequences past them
+            for table in ('user', 'blog', 'comment'):
+                db.session.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT MAX(id) FROM \"{table}\"))"
+                ))
+            db.session.commit()
+
+        if derived:
+            rebuild_derived()
+
+        return {
+            'database': db.engine.dialect.name,
+            'generated_at': now.isoformat(),
+            'seed': seed,
+            'password': BENCH_PASSWORD,
+            'users': [first_user, first_user + n_users - 1],
+            'blogs': [first_blog, first_blog + n_blogs - 1],
+            'comments': [first_comment, first_comment + n_comments - 1] if n_comments else None,
+            'skew': {'blogs': BLOG_SKEW, 'authors': AUTHOR_SKEW, 'followed': FOLLOWED_SKEW},
+            'counts': counts
+        }
+
+
+def recount_blog_counters(chunk=5000):
+    """Set the blog counters from one GROUP BY per table.
+
+    reconcile-counters runs a correlated COUNT per blog, and blog_view has
+    no blog_id index, which is far too slow at these sizes.
+    """
+    from sqlalchemy import func, update, bindparam
+    from app import db
+    from app.models import Blog, Like, BlogView, Comment
+
+    for model, column in ((Like, 'like_count'), (BlogView, 'view_count'), (Comment, 'comment_count')):
+        counts = db.session.query(model.blog_id, func.count(model.id)).group_by(model.blog_id).all()
+        statement = update(Blog.__table__).where(Blog.__table__.c.id == bindparam('b_id'))\
+                                          .values({column: bindparam('b_count')})
+        for start in range(0, len(counts), chunk):
+            db.session.execute(statement, [{'b_id': blog_id, 'b_count': count}
+                                           for blog_id, count in counts[start:start + chunk]])
+            db.session.commit()
+
+
+def rebuild_derived():
+    from app.search import rebuild_search_index
+    from app.trending import rebuild_trending
+    from app.feed import rebuild_feeds
+
+    for name, step in (('counters', recount_blog_counters), ('search index', rebuild_search_index),
+                       ('trending', rebuild_trending), ('feeds', rebuild_feeds)):
+        started = time.perf_counter()
+        step()
+        print(f'{name:>16}: rebuilt in {time.perf_counter() - started:7.1f}s', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small', help='Preset row counts')
+    for name in SCALES['small']:
+        parser.add_argument(f'--{name}', type=int, help=f'Override the number of {name}')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (load_test.py reuses it)')
+    parser.add_argument('--chunk', type=int, default=5000, help='Rows per insert transaction')
+    parser.add_argument('--days', type=int, default=90, help='Spread timestamps over this many days')
+    parser.add_argument('--skip-derived', action='store_true',
+                        help='Do not rebuild counters, search index, trending and feeds')
+    parser.add_argument('--manifest', default='benchmarks/manifest.json', help='Where to write the manifest')
+    args = parser.parse_args()
+
+    # Keep the generator's own startup cheap and quiet
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '10')
+    os.environ.setdefault('MAIL_OUTBOX_ENABLED', 'false')
+
+    counts = dict(SCALES[args.scale])
+    for name in counts:
+        if getattr(args, name) is not None:
+            counts[name] = getattr(args, name)
+
+    started = time.perf_counter()
+    manifest = generate(counts, seed=args.seed, chunk=args.chunk, days=args.days, derived=not args.skip_derived)
+    manifest['seconds'] = round(time.perf_counter() - started, 1)
+    with open(args.manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Generated in {manifest['seconds']}s; manifest written to {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,420 @@
+"""Load test every endpoint of the auth, blogs, comments, likes, follows,
+users and preferences blueprints.
+
+Worker threads, each signed in as a different generated user, pick
+requests from a weighted mix of routes (mostly reads, with every write
+path represented) against the data described by generate_data.py's
+manifest. Blog ids are drawn with the same skew the data was generated
+with, so hot posts stay hot. The report gives throughput and p50/p95/p99
+latency per route; --json writes it machine-readable.
+
+By default the app runs in-process through Flask's test client (no
+network, outgoing mail suppressed). --url targets a running server
+instead; start `flask smtp-sink` next to it to keep mail offline.
+
+    cd backend
+    python benchmarks/generate_data.py --scale small
+    python benchmarks/load_test.py --concurrency 8 --seconds 30 --json results.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --only 'blogs|comments'
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import BENCH_PASSWORD, Zipf, bench_email, bench_username, percentile
+
+Request = namedtuple('Request', 'method path body auth on_response')
+Request.__new__.__defaults__ = (None, 'access', None)
+
+SEARCH_TERMS = ['python', 'cache', 'latency', 'database', 'flask design', 'scale', 'deploy', 'api']
+CATEGORIES = ['technology', 'programming', 'data-science', 'devops', 'design', 'career', 'news']
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, headers=None):
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """One keep-alive connection per worker."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            raise
+        data = response.read()
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+
+class Worker:
+    """A signed-in user and the blogs and comments it has created."""
+
+    def __init__(self, client, user_id, manifest, rng, metrics_token=None):
+        self.client = client
+        self.user_id = user_id
+        self.metrics_token = metrics_token
+        self.rng = rng
+        self.manifest = manifest
+        self.access_token = None
+        self.refresh_token = None
+        self.own_blogs = []
+        self.own_comments = []
+
+    def sign_in(self):
+        status, body = self.client.request('POST', '/api/auth/login',
+                                           {'email': bench_email(self.user_id), 'password': BENCH_PASSWORD})
+        if status != 200:
+            raise SystemExit(f'Login as {bench_email(self.user_id)} failed with {status}: {body}')
+        self.access_token, self.refresh_token = body['access_token'], body['refresh_token']
+
+    def send(self, request):
+        headers = {}
+        if request.auth == 'access':
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        elif request.auth == 'refresh':
+            headers['Authorization'] = f'Bearer {self.refresh_token}'
+        elif request.auth == 'metrics' and self.metrics_token:
+            headers['Authorization'] = f'Bearer {self.metrics_token}'
+        status, body = self.client.request(request.method, request.path, request.body, headers)
+        if request.on_response and 200 <= status < 300:
+            request.on_response(self, body)
+        return status
+
+
+class Mix:
+    """Weighted routes; each builder turns (worker, ids) into a Request."""
+
+    def __init__(self, manifest, seed):
+        self.blogs = Zipf(manifest['blogs'][0], manifest['blogs'][1] - manifest['blogs'][0] + 1,
+                          manifest['skew']['blogs'], manifest['seed'])
+        self.users = manifest['users']
+        self.comments = manifest['comments'] or [0, 0]
+        self.serializer = _token_serializer()
+        self.routes = self._routes()
+
+    def user(self, rng):
+        return rng.randint(*self.users)
+
+    def comment(self, rng):
+        return rng.randint(*self.comments)
+
+    def token(self, rng):
+        return self.serializer.dumps(bench_email(self.user(rng)), salt=self.serializer_salt)
+
+    def own_blog(self, worker):
+        if not worker.own_blogs:
+            return None
+        return worker.rng.choice(worker.own_blogs)
+
+    def _routes(self):
+        blog, user, comment = self.blogs.sample, self.user, self.comment
+
+        def created_blog(worker, body):
+            worker.own_blogs.append(body['blog']['id'])
+
+        def created_comment(worker, body):
+            worker.own_comments.append(body['comment']['id'])
+
+        def new_blog(worker):
+            return Request('POST', '/api/blogs', {
+                'title': f'Load test post {uuid.uuid4().hex[:8]}',
+                'content': ' '.join(worker.rng.choices(SEARCH_TERMS, k=80)),
+                'category': worker.rng.choice(CATEGORIES),
+                'tags': worker.rng.sample(['python', 'scale', 'topic1', 'topic2', 'topic3'], 2),
+                'publish': worker.rng.random() < 0.8
+            }, on_response=created_blog)
+
+        def with_own_blog(build):
+            # Writes to one's own posts need a post first
+            return lambda worker: build(worker, self.own_blog(worker)) if worker.own_blogs else new_blog(worker)
+
+        def delete_blog(worker):
+            if not worker.own_blogs:
+                return new_blog(worker)
+            return Request('DELETE', f'/api/blogs/{worker.own_blogs.pop()}')
+
+        def new_comment(worker):
+            return Request('POST', f'/api/comments/{blog(worker.rng)}', {'content': 'Nice post, thanks!'},
+                           on_response=created_comment)
+
+        def delete_comment(worker):
+            if not worker.own_comments:
+                return new_comment(worker)
+            return Request('DELETE', f'/api/comments/{worker.own_comments.pop()}')
+
+        def edit_comment(worker):
+            if not worker.own_comments:
+                return new_comment(worker)
+            return Request('PUT', f'/api/comments/{worker.rng.choice(worker.own_comments)}', {'content': 'Edited'})
+
+        signup = lambda worker: Request('POST', '/api/auth/signup', {
+            'username': f'load{uuid.uuid4().hex[:12]}',
+            'email': f'load{uuid.uuid4().hex[:12]}@example.com',
+            'password': BENCH_PASSWORD
+        }, auth=None)
+
+        # (route, weight, builder)
+        return [
+            ('POST /api/auth/signup', 0.3, signup),
+            ('POST /api/auth/login', 0.5, lambda w: Request('POST', '/api/auth/login', {
+                'email': bench_email(self.user(w.rng)), 'password': BENCH_PASSWORD}, auth=None)),
+            ('POST /api/auth/refresh', 1, lambda w: Request('POST', '/api/auth/refresh', auth='refresh')),
+            ('GET /api/auth/profile', 2, lambda w: Request('GET', '/api/auth/profile')),
+            ('GET /api/auth/verify-email/<token>', 0.3,
+             lambda w: Request('GET', f'/api/auth/verify-email/{self.token(w.rng)}', auth=None)),
+            ('POST /api/auth/reset-password-request', 0.3, lambda w: Request(
+                'POST', '/api/auth/reset-password-request', {'email': bench_email(self.user(w.rng))}, auth=None)),
+            ('GET /api/auth/reset-password/<token>', 0.3,
+             lambda w: Request('GET', f'/api/auth/reset-password/{self.token(w.rng)}', auth=None)),
+            ('GET /api/auth/outbox/stats', 0.3, lambda w: Request('GET', '/api/auth/outbox/stats', auth='metrics')),
+
+            ('GET /api/blogs', 8, lambda w: Request('GET', f'/api/blogs?page={w.rng.randint(1, 5)}', auth=None)),
+            ('GET /api/blogs?cursor', 4, lambda w: Request('GET', '/api/blogs?cursor=', auth=None)),
+            ('GET /api/blogs/<id>', 15, lambda w: Request('GET', f'/api/blogs/{blog(w.rng)}')),
+            ('GET /api/blogs/categories', 1, lambda w: Request('GET', '/api/blogs/categories', auth=None)),
+            ('GET /api/blogs/search', 5, lambda w: Request(
+                'GET', f'/api/blogs/search?q={w.rng.choice(SEARCH_TERMS).replace(" ", "+")}', auth=None)),
+            ('GET /api/blogs/trending', 5, lambda w: Request('GET', '/api/blogs/trending', auth=None)),
+            ('GET /api/blogs/drafts', 1, lambda w: Request('GET', '/api/blogs/drafts')),
+            ('GET /api/blogs/archived', 0.5, lambda w: Request('GET', '/api/blogs/archived')),
+            ('GET /api/blogs/recommendations', 3, lambda w: Request('GET', '/api/blogs/recommendations')),
+            ('GET /api/blogs/views/stats', 0.3, lambda w: Request('GET', '/api/blogs/views/stats', auth='metrics')),
+            ('POST /api/blogs', 2, new_blog),
+            ('PUT /api/blogs/<id>', 1, with_own_blog(lambda w, blog_id: Request(
+                'PUT', f'/api/blogs/{blog_id}', {'title': 'Updated title', 'tags': ['python', 'topic4']}))),
+            ('PATCH /api/blogs/<id>/publish', 0.5, with_own_blog(
+                lambda w, blog_id: Request('PATCH', f'/api/blogs/{blog_id}/publish'))),
+            ('PATCH /api/blogs/<id>/archive', 0.3, with_own_blog(
+                lambda w, blog_id: Request('PATCH', f'/api/blogs/{blog_id}/archive'))),
+            ('DELETE /api/blogs/<id>', 0.5, delete_blog),
+
+            ('GET /api/comments/blog/<id>', 6, lambda w: Request('GET', f'/api/comments/blog/{blog(w.rng)}', auth=None)),
+            ('GET /api/comments/<id>/replies', 2,
+             lambda w: Request('GET', f'/api/comments/{comment(w.rng)}/replies', auth=None)),
+            ('POST /api/comments/<blog_id>', 2, new_comment),
+            ('PUT /api/comments/<id>', 0.5, edit_comment),
+            ('DELETE /api/comments/<id>', 0.5, delete_comment),
+            ('POST /api/comments/<id>/like', 1, lambda w: Request('POST', f'/api/comments/{comment(w.rng)}/like')),
+
+            ('POST /api/likes/blog/<id>', 3, lambda w: Request('POST', f'/api/likes/blog/{blog(w.rng)}')),
+            ('GET /api/likes/blog/<id>', 4, lambda w: Request('GET', f'/api/likes/blog/{blog(w.rng)}', auth=None)),
+            ('POST /api/likes/comment/<id>', 1, lambda w: Request('POST', f'/api/likes/comment/{comment(w.rng)}')),
+            ('GET /api/likes/comment/<id>', 1,
+             lambda w: Request('GET', f'/api/likes/comment/{comment(w.rng)}', auth=None)),
+
+            ('POST /api/likes/status', 2, lambda w: Request('POST', '/api/likes/status', {
+                'blog_ids': [blog(w.rng) for _ in range(20)], 'comment_ids': [comment(w.rng) for _ in range(20)]})),
+
+            ('POST /api/follows/<id>', 1, lambda w: Request('POST', f'/api/follows/{user(w.rng)}')),
+            ('GET /api/follows/check/<id>', 2, lambda w: Request('GET', f'/api/follows/check/{user(w.rng)}')),
+            ('GET /api/follows/followers/<id>', 2,
+             lambda w: Request('GET', f'/api/follows/followers/{user(w.rng)}', auth=None)),
+            ('GET /api/follows/following/<id>', 2,
+             lambda w: Request('GET', f'/api/follows/following/{user(w.rng)}', auth=None)),
+            ('GET /api/follows/stats/<id>', 2, lambda w: Request('GET', f'/api/follows/stats/{user(w.rng)}', auth=None)),
+            ('GET /api/follows/mutuals/<id>', 1,
+             lambda w: Request('GET', f'/api/follows/mutuals/{user(w.rng)}', auth=None)),
+            ('GET /api/follows/suggestions', 1, lambda w: Request('GET', '/api/follows/suggestions')),
+
+            ('GET /api/users/<username>', 4,
+             lambda w: Request('GET', f'/api/users/{bench_username(user(w.rng))}', auth=None)),
+            ('GET /api/users', 2, lambda w: Request('GET', f'/api/users?page={w.rng.randint(1, 5)}', auth=None)),
+
+            ('GET /api/preferences/categories', 2, lambda w: Request('GET', '/api/preferences/categories')),
+            ('POST /api/preferences/categories', 0.5, lambda w: Request(
+                'POST', '/api/preferences/categories', {'categories': w.rng.sample(CATEGORIES, 3)})),
+            ('PUT /api/preferences/categories', 0.5, lambda w: Request(
+                'PUT', '/api/preferences/categories', {'category': w.rng.choice(CATEGORIES)})),
+            ('DELETE /api/preferences/categories/<category>', 0.5,
+             lambda w: Request('DELETE', f'/api/preferences/categories/{w.rng.choice(CATEGORIES)}')),
+        ]
+
+    def only(self, pattern):
+        self.routes = [route for route in self.routes if re.search(pattern, route[0])]
+        if not self.routes:
+            raise SystemExit(f'No route matches {pattern!r}')
+
+
+def _token_serializer():
+    """Mints the same email tokens as the app, for the verify and reset routes."""
+    from itsdangerous import URLSafeTimedSerializer
+    from app.config import Config
+    Mix.serializer_salt = Config.SECURITY_PASSWORD_SALT
+    return URLSafeTimedSerializer(Config.SECRET_KEY)
+
+
+def summarize(latencies, statuses, seconds):
+    routes = {}
+    for route in sorted(latencies):
+        values = latencies[route]
+        codes = statuses[route]
+        routes[route] = {
+            'requests': len(values),
+            'throughput_rps': round(len(values) / seconds, 2),
+            'p50_ms': percentile(values, 50),
+            'p95_ms': percentile(values, 95),
+            'p99_ms': percentile(values, 99),
+            'max_ms': round(max(values), 3),
+            'non_2xx': sum(count for code, count in codes.items() if not 200 <= code < 300),
+            'errors': sum(count for code, count in codes.items() if code >= 500 or code == 0),
+            'statuses': {str(code): count for code, count in sorted(codes.items())}
+        }
+    everything = [value for values in latencies.values() for value in values]
+    total = {
+        'requests': len(everything),
+        'throughput_rps': round(len(everything) / seconds, 2),
+        'p50_ms': percentile(everything, 50),
+        'p95_ms': percentile(everything, 95),
+        'p99_ms': percentile(everything, 99),
+        'errors': sum(route['errors'] for route in routes.values())
+    }
+    return routes, total
+
+
+def run(args, manifest):
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+        target = args.url
+    else:
+        from app import create_app
+        app = create_app()
+        app.extensions['mail'].suppress = True  # stay offline
+        # Monitoring routes take METRICS_TOKEN; make one up if none was given
+        args.metrics_token = app.config['METRICS_TOKEN'] = args.metrics_token or uuid.uuid4().hex
+        make_client = lambda: InProcessClient(app)
+        target = 'in-process'
+
+    mix = Mix(manifest, args.seed)
+    if args.only:
+        mix.only(args.only)
+    names = [route for route, _, _ in mix.routes]
+    weights = [weight for _, weight, _ in mix.routes]
+    builders = {route: build for route, _, build in mix.routes}
+
+    seeds = random.Random(args.seed)
+    user_ids = seeds.sample(range(manifest['users'][0], manifest['users'][1] + 1), args.concurrency)
+    workers = [Worker(make_client(), user_id, manifest, random.Random(seeds.random()), args.metrics_token) for user_id in user_ids]
+    for worker in workers:
+        worker.sign_in()
+
+    latencies, statuses = defaultdict(list), defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + args.warmup
+    deadline = measure_from + args.seconds
+
+    def loop(worker):
+        local_latencies, local_statuses = defaultdict(list), defaultdict(lambda: defaultdict(int))
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            route = worker.rng.choices(names, weights)[0]
+            request = builders[route](worker)
+            started = time.perf_counter()
+            try:
+                status = worker.send(request)
+            except Exception:
+                status = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            if started >= measure_from:
+                local_latencies[route].append(elapsed)
+                local_statuses[route][status] += 1
+        with lock:
+            for route, values in local_latencies.items():
+                latencies[route].extend(values)
+                for code, count in local_statuses[route].items():
+                    statuses[route][code] += count
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    routes, total = summarize(latencies, statuses, args.seconds)
+    missing = sorted(set(names) - set(routes))
+    return {
+        'benchmark': 'load_test',
+        'target': target,
+        'database': manifest['database'],
+        'dataset': manifest['counts'],
+        'concurrency': args.concurrency,
+        'seconds': args.seconds,
+        'warmup_seconds': args.warmup,
+        'seed': args.seed,
+        'total': total,
+        'routes': routes,
+        'routes_not_exercised': missing
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--manifest', default='benchmarks/manifest.json', help='Written by generate_data.py')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test client)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent signed-in clients')
+    parser.add_argument('--seconds', type=float, default=30.0, help='Measured duration')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Unmeasured seconds before that')
+    parser.add_argument('--only', help='Regex on route names, e.g. "GET /api/blogs"')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the request mix')
+    parser.add_argument('--json', help='Write results to this file')
+    parser.add_argument('--metrics-token', default=os.getenv('METRICS_TOKEN'),
+                        help="The server's METRICS_TOKEN, for the monitoring routes (default: $METRICS_TOKEN)")
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    # In-process runs use the generator's cost factor instead of calibrating
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', '10')
+
+    result = run(args, manifest)
+    width = max(len(route) for route in result['routes']) if result['routes'] else 10
+    print(f"{'route':<{width}}  {'req':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'non2xx':>6} {'err':>5}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<{width}}  {stats['requests']:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['non_2xx']:>6} {stats['errors']:>5}")
+    total = result['total']
+    print(f"{'TOTAL':<{width}}  {total['requests']:>7} {total['throughput_rps']:>8} {total['p50_ms']:>8} "
+          f"{total['p95_ms']:>8} {total['p99_ms']:>8} {'':>6} {total['errors']:>5}")
+    if result['routes_not_exercised']:
+        print('Not exercised (run longer):', ', '.join(result['routes_not_exercised']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Login throughput with inline vs. pooled bcrypt hashing.
+
+Drives POST /api/auth/login from concurrent client threads against a
+throwaway SQLite database and reports logins per second (total and per
+core), login latency percentiles, and the latency of a cheap endpoint
+(/api/blogs/categories) probed during the storm.
+
+    cd backend
+    python benchmarks/login_throughput.py --rounds 10 --threads 16 --seconds 10
+    python benchmarks/login_throughput.py --workers 0 4 --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def run(workers, rounds, threads, seconds):
+    from app import create_app, db
+    from app.models import User
+    from app.passwords import PasswordHasher
+
+    app = create_app()
+    app.config['HTTP_CACHE_ENABLED'] = False
+    app.extensions['password_hasher'] = PasswordHasher(rounds, workers=workers, max_pending=threads * 2)
+
+    with app.app_context():
+        if not User.query.filter_by(email='bench@example.com').first():
+            user = User(username='bench', email='bench@example.com', is_verified=True)
+            user.set_password('benchmark-password')
+            db.session.add(user)
+            db.session.commit()
+
+    payload = {'email': 'bench@example.com', 'password': 'benchmark-password'}
+    deadline = time.perf_counter() + seconds
+    login_ms, probe_ms, errors = [], [], []
+    lock = threading.Lock()
+
+    def login_loop():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/api/auth/login', json=payload)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                (login_ms if response.status_code == 200 else errors).append(elapsed)
+
+    def probe_loop():
+        client = app.test_client()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.get('/api/blogs/categories')
+            with lock:
+                probe_ms.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    pool = [threading.Thread(target=login_loop) for _ in range(threads)]
+    pool.append(threading.Thread(target=probe_loop))
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    app.extensions['password_hasher'].shutdown()
+    cores = max(workers, 1)
+    return {
+        'workers': workers,
+        'mode': 'pool' if workers else 'inline',
+        'bcrypt_rounds': rounds,
+        'client_threads': threads,
+        'seconds': round(elapsed, 3),
+        'logins': len(login_ms),
+        'rejected_or_failed': len(errors),
+        'logins_per_second': round(len(login_ms) / elapsed, 2),
+        'logins_per_second_per_core': round(len(login_ms) / elapsed / cores, 2),
+        'login_p50_ms': percentile(login_ms, 50),
+        'login_p95_ms': percentile(login_ms, 95),
+        'login_p99_ms': percentile(login_ms, 99),
+        'probe_p50_ms': percentile(probe_ms, 50),
+        'probe_p95_ms': percentile(probe_ms, 95),
+        'probe_mean_ms': round(statistics.mean(probe_ms), 3) if probe_ms else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, os.cpu_count() or 1],
+                        help='Hashing pool sizes to compare (0 = inline on the request thread)')
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost factor')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    database.close()
+    os.environ['DATABASE_URI'] = f'sqlite:///{database.name}'
+    os.environ['BCRYPT_LOG_ROUNDS'] = str(args.rounds)
+
+    results = []
+    try:
+        for workers in args.workers:
+            result = run(workers, args.rounds, args.threads, args.seconds)
+            results.append(result)
+            print(f"{result['mode']:>6} workers={workers:<3} {result['logins_per_second']:>8} logins/s "
+                  f"({result['logins_per_second_per_core']}/core)  "
+                  f"login p50={result['login_p50_ms']}ms p99={result['login_p99_ms']}ms  "
+                  f"probe p95={result['probe_p95_ms']}ms")
+    finally:
+        os.unlink(database.name)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'login_throughput', 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
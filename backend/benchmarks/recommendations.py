@@ -0,0 +1,93 @@
+"""Item-item recommendation build time and memory as interactions grow.
+
+For each interaction count, synthetic (user, blog) interactions are drawn
+with Zipf-like blog popularity and fed to app.recommendations.item_neighbors,
+the NumPy/SciPy step of `flask build-recommendations`. The report gives
+the compute time, the peak memory NumPy and SciPy allocated (tracemalloc),
+and the neighbour pairs produced. Loading interactions from the database
+and storing blog_similarity are not included; `flask build-recommendations`
+prints those times against a real database.
+
+    cd backend
+    python benchmarks/recommendations.py
+    python benchmarks/recommendations.py --interactions 100000 1000000 --blogs 50000 --users 200000
+    python benchmarks/recommendations.py --neighbors 20 --block-size 4096 --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate_data import BLOG_SKEW
+
+
+def synthetic_interactions(np, n, users, blogs, seed):
+    """n (user, blog, weight) triples; blog popularity falls off as rank ** -BLOG_SKEW."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, blogs + 1) ** BLOG_SKEW
+    blog_index = rng.choice(blogs, size=n, p=popularity / popularity.sum())
+    user_index = rng.integers(0, users, size=n)
+    # Roughly the generator's mix: mostly views, then likes, then comment likes
+    weights = rng.choice(np.array([1.0, 3.0, 2.0], dtype=np.float32), size=n, p=[0.7, 0.2, 0.1])
+    return user_index, blog_index, weights
+
+
+def run(np, n, args):
+    from app.recommendations import item_neighbors
+
+    user_index, blog_index, weights = synthetic_interactions(np, n, args.users, args.blogs, args.seed)
+    tracemalloc.start()
+    started = time.perf_counter()
+    items, _, _ = item_neighbors(user_index, blog_index, weights, args.blogs, args.neighbors, args.block_size)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'interactions': n,
+        'build_seconds': round(seconds, 3),
+        'peak_mb': round(peak / 2 ** 20, 1),
+        'pairs': int(len(items)),
+        'blogs_with_neighbors': int(len(np.unique(items)))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--interactions', type=int, nargs='+', default=[10000, 100000, 300000, 1000000])
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--blogs', type=int, default=10000)
+    parser.add_argument('--neighbors', type=int, default=50, help='RECO_NEIGHBORS')
+    parser.add_argument('--block-size', type=int, default=1024, help='RECO_BUILD_BLOCK_SIZE')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    import numpy as np
+    import scipy.sparse  # imported up front so the first build is not charged for it
+
+    results = []
+    for n in args.interactions:
+        stats = run(np, n, args)
+        results.append(stats)
+        print(f"{stats['interactions']:>10} interactions: {stats['build_seconds']:>8.3f}s  "
+              f"peak {stats['peak_mb']:>8.1f} MB  {stats['pairs']:>9} pairs "
+              f"for {stats['blogs_with_neighbors']} blogs", flush=True)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'benchmark': 'recommendations',
+                'users': args.users,
+                'blogs': args.blogs,
+                'neighbors': args.neighbors,
+                'block_size': args.block_size,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Startup time from `import app` to the first served request.
+
+Each sample runs in a fresh interpreter (so module imports are not cached)
+against a throwaway SQLite database, and times the import, create_app()
+and the first GET of /api/openapi.json and /api/blogs/categories. With
+--budget-ms the script exits non-zero when the production-mode median
+import-to-first-request time exceeds the budget, so CI can enforce it.
+
+    cd backend
+    python benchmarks/startup_time.py --samples 10
+    python benchmarks/startup_time.py --modes production --budget-ms 1500 --json results.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter and prints one JSON line of timings (ms)
+PROBE = r'''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+client = application.test_client()
+statuses = [client.get(path).status_code for path in ('/api/openapi.json', '/api/blogs/categories')]
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000,
+    'statuses': statuses
+}))
+'''
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 1)
+
+
+def prepare_schema(env):
+    """Production mode never creates tables, so build them once up front."""
+    subprocess.run([sys.executable, '-c', 'import app; app.create_app()'],
+                   cwd=BACKEND, env=dict(env, STARTUP_MODE='development'), check=True)
+
+
+def sample(mode, env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND, env=dict(env, STARTUP_MODE=mode),
+                            check=True, capture_output=True, text=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    if any(status != 200 for status in timings['statuses']):
+        raise RuntimeError(f'{mode}: first requests returned {timings["statuses"]}')
+    return timings
+
+
+def run(mode, samples, env):
+    runs = [sample(mode, env) for _ in range(samples)]
+    result = {'mode': mode, 'samples': samples}
+    for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        values = [r[phase] for r in runs]
+        result[f'{phase[:-3]}_p50_ms'] = round(statistics.median(values), 1)
+        result[f'{phase[:-3]}_p95_ms'] = percentile(values, 95)
+    return result
+
+
+def measure(modes, samples, report=None):
+    """Timings for each STARTUP_MODE in modes, against a throwaway database."""
+    database = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    database.close()
+    env = dict(os.environ, DATABASE_URI=f'sqlite:///{database.name}')
+    # A fixed cost keeps bcrypt calibration out of the measurement
+    env.setdefault('BCRYPT_LOG_ROUNDS', '12')
+
+    results = []
+    try:
+        prepare_schema(env)
+        for mode in modes:
+            results.append(run(mode, samples, env))
+            if report:
+                report(results[-1])
+    finally:
+        os.unlink(database.name)
+    return results
+
+
+def over_budget(results, budget_ms):
+    """True if the production median import-to-first-request time exceeds budget_ms."""
+    production = next(r for r in results if r['mode'] == 'production')
+    return production['total_p50_ms'] > budget_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['development', 'production'],
+                        choices=['development', 'production'], help='STARTUP_MODE values to compare')
+    parser.add_argument('--samples', type=int, default=5, help='Fresh interpreters per mode')
+    parser.add_argument('--budget-ms', type=float,
+                        help='Fail if the production median import-to-first-request time exceeds this')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args()
+
+    if args.budget_ms is not None and 'production' not in args.modes:
+        parser.error('--budget-ms needs the production mode')
+
+    def report(result):
+        print(f"{result['mode']:>11}  import p50={result['import_p50_ms']}ms  "
+              f"create_app p50={result['create_app_p50_ms']}ms  "
+              f"first request p50={result['first_request_p50_ms']}ms  "
+              f"total p50={result['total_p50_ms']}ms p95={result['total_p95_ms']}ms")
+
+    results = measure(args.modes, args.samples, report)
+
+    exceeded = False
+    if args.budget_ms is not None:
+        exceeded = over_budget(results, args.budget_ms)
+        production = next(r for r in results if r['mode'] == 'production')
+        print(f"budget {args.budget_ms}ms: {'EXCEEDED' if exceeded else 'ok'} "
+              f"(production p50 {production['total_p50_ms']}ms)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'startup_time', 'budget_ms': args.budget_ms, 'results': results}, f, indent=2)
+
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == '__main__':
+    main()
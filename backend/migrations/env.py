@@ -51,6 +51,19 @@ def get_metadata():
     return target_db.metadata
 
 
+# Full-text search structures are created by raw SQL (see app/search.py),
+# not the models; keep autogenerate from proposing to drop them
+SEARCH_INDEX_TABLES = {'blog_fts', 'blog_search'}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table':
+        return name not in SEARCH_INDEX_TABLES and not name.startswith('blog_fts_')
+    if type_ == 'index' and object.table is not None:
+        return object.table.name not in SEARCH_INDEX_TABLES
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +78,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -100,6 +114,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_object=include_object,
             **conf_args
         )
 
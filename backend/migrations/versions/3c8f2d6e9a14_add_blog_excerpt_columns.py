@@ -0,0 +1,33 @@
+"""Add stored excerpt, word count and reading time to blog
+
+Revision ID: 3c8f2d6e9a14
+Revises: 9e4a7c1b3f58
+Create Date: 2026-10-17 20:41:09.604127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8f2d6e9a14'
+down_revision = '9e4a7c1b3f58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('word_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reading_time', sa.Integer(), server_default='0', nullable=False))
+
+    # Existing rows have no excerpt yet; run `flask backfill-excerpts`
+    # afterwards. Until then listings fall back to reading the content.
+
+
+def downgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_column('reading_time')
+        batch_op.drop_column('word_count')
+        batch_op.drop_column('excerpt')
@@ -0,0 +1,28 @@
+"""Add an index on blog_view.blog_id
+
+Revision ID: 5a2e8c4d1f67
+Revises: 3c8f2d6e9a14
+Create Date: 2026-10-17 23:12:37.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a2e8c4d1f67'
+down_revision = '3c8f2d6e9a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # reconcile-counters counts views per blog; without this each count
+    # scans the whole table
+    with op.batch_alter_table('blog_view', schema=None) as batch_op:
+        batch_op.create_index('idx_blog_view_blog', ['blog_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('blog_view', schema=None) as batch_op:
+        batch_op.drop_index('idx_blog_view_blog')
@@ -0,0 +1,36 @@
+"""Add follow_event table
+
+Revision ID: 6d1f3b8a2c47
+Revises: 0b5d8e2f6a31
+Create Date: 2026-10-17 18:04:51.772031
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d1f3b8a2c47'
+down_revision = '0b5d8e2f6a31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('follow_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('followed_id', sa.Integer(), nullable=False),
+        sa.Column('following', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('follow_event', schema=None) as batch_op:
+        batch_op.create_index('idx_follow_event_created', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('follow_event', schema=None) as batch_op:
+        batch_op.drop_index('idx_follow_event_created')
+
+    op.drop_table('follow_event')
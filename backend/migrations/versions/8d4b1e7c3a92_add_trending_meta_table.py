@@ -0,0 +1,34 @@
+"""Add trending_meta table
+
+Revision ID: 8d4b1e7c3a92
+Revises: 5a2e8c4d1f67
+Create Date: 2026-10-17 23:41:09.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4b1e7c3a92'
+down_revision = '5a2e8c4d1f67'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trending_meta',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('epoch', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Carry over the epoch existing scores are on, if there are any
+    op.execute(
+        'INSERT INTO trending_meta (id, epoch) '
+        'SELECT 1, MAX(epoch) FROM blog_trending_score HAVING MAX(epoch) IS NOT NULL'
+    )
+
+
+def downgrade():
+    op.drop_table('trending_meta')
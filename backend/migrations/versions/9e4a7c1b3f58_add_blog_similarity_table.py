@@ -0,0 +1,38 @@
+"""Add blog_similarity table and blog_view user index
+
+Revision ID: 9e4a7c1b3f58
+Revises: 6d1f3b8a2c47
+Create Date: 2026-10-17 19:22:40.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a7c1b3f58'
+down_revision = '6d1f3b8a2c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blog_similarity',
+        sa.Column('blog_id', sa.Integer(), nullable=False),
+        sa.Column('similar_blog_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_blog_id'], ['blog.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('blog_id', 'similar_blog_id')
+    )
+    with op.batch_alter_table('blog_view', schema=None) as batch_op:
+        batch_op.create_index('idx_blog_view_user_timestamp', ['user_id', 'timestamp'], unique=False)
+
+    # Populate with `flask build-recommendations`
+
+
+def downgrade():
+    with op.batch_alter_table('blog_view', schema=None) as batch_op:
+        batch_op.drop_index('idx_blog_view_user_timestamp')
+
+    op.drop_table('blog_similarity')
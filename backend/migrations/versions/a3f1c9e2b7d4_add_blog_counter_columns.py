@@ -0,0 +1,33 @@
+"""Add denormalized like/view/comment counters to blog
+
+Revision ID: a3f1c9e2b7d4
+Revises: 1663633ecdcd
+Create Date: 2026-10-17 09:12:44.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9e2b7d4'
+down_revision = '1663633ecdcd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('view_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Existing rows start at zero; run `flask reconcile-counters` afterwards
+    # to backfill them from the like/blog_view/comment tables.
+
+
+def downgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('view_count')
+        batch_op.drop_column('like_count')
@@ -0,0 +1,31 @@
+"""Add feed_pull_author table
+
+Revision ID: b3f7a9d2c415
+Revises: 8d4b1e7c3a92
+Create Date: 2026-10-17 23:58:44.210396
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7a9d2c415'
+down_revision = '8d4b1e7c3a92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_pull_author',
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('since', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('author_id')
+    )
+
+    # Populate with `flask rebuild-feeds`
+
+
+def downgrade():
+    op.drop_table('feed_pull_author')
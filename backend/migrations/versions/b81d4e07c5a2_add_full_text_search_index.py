@@ -0,0 +1,41 @@
+"""Add full-text search index over blog title, content and tags
+
+Revision ID: b81d4e07c5a2
+Revises: a3f1c9e2b7d4
+Create Date: 2026-10-17 10:02:17.554019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d4e07c5a2'
+down_revision = 'a3f1c9e2b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same DDL as app.search; populate afterwards with `flask rebuild-search-index`
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS blog_fts USING fts5("
+            "title, content, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS blog_search ("
+            "blog_id INTEGER PRIMARY KEY REFERENCES blog(id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS idx_blog_search_document ON blog_search USING GIN (document)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS blog_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP TABLE IF EXISTS blog_search")
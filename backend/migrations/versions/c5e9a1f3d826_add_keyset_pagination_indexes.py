@@ -0,0 +1,42 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: c5e9a1f3d826
+Revises: b81d4e07c5a2
+Create Date: 2026-10-17 11:26:40.902113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e9a1f3d826'
+down_revision = 'b81d4e07c5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.create_index('idx_blog_timestamp', ['timestamp', 'id'], unique=False)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('idx_comment_blog_thread', ['blog_id', 'parent_id', 'timestamp'], unique=False)
+        batch_op.create_index('idx_comment_parent_timestamp', ['parent_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('follow', schema=None) as batch_op:
+        batch_op.create_index('idx_follow_followed_timestamp', ['followed_id', 'timestamp'], unique=False)
+        batch_op.create_index('idx_follow_follower_timestamp', ['follower_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('follow', schema=None) as batch_op:
+        batch_op.drop_index('idx_follow_follower_timestamp')
+        batch_op.drop_index('idx_follow_followed_timestamp')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('idx_comment_parent_timestamp')
+        batch_op.drop_index('idx_comment_blog_thread')
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_index('idx_blog_timestamp')
@@ -0,0 +1,41 @@
+"""Add blog_trending_score table
+
+Revision ID: d2b7f4a8e913
+Revises: c5e9a1f3d826
+Create Date: 2026-10-17 12:48:05.117630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7f4a8e913'
+down_revision = 'c5e9a1f3d826'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('blog_trending_score',
+        sa.Column('blog_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('epoch', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('blog_id')
+    )
+    with op.batch_alter_table('blog_trending_score', schema=None) as batch_op:
+        batch_op.create_index('idx_trending_score', ['score', 'blog_id'], unique=False)
+        batch_op.create_index('idx_trending_category_score', ['category', 'score', 'blog_id'], unique=False)
+
+    # Populate with `flask rebuild-trending`
+
+
+def downgrade():
+    with op.batch_alter_table('blog_trending_score', schema=None) as batch_op:
+        batch_op.drop_index('idx_trending_category_score')
+        batch_op.drop_index('idx_trending_score')
+
+    op.drop_table('blog_trending_score')
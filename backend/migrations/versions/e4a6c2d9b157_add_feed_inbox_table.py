@@ -0,0 +1,50 @@
+"""Add feed_inbox table
+
+Revision ID: e4a6c2d9b157
+Revises: d2b7f4a8e913
+Create Date: 2026-10-17 14:21:37.402913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a6c2d9b157'
+down_revision = 'd2b7f4a8e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_inbox',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('blog_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'blog_id')
+    )
+    with op.batch_alter_table('feed_inbox', schema=None) as batch_op:
+        batch_op.create_index('idx_feed_inbox_user_timestamp', ['user_id', 'timestamp', 'blog_id'], unique=False)
+        batch_op.create_index('idx_feed_inbox_user_author', ['user_id', 'author_id'], unique=False)
+        batch_op.create_index('idx_feed_inbox_blog', ['blog_id'], unique=False)
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.create_index('idx_blog_user_timestamp', ['user_id', 'timestamp', 'id'], unique=False)
+
+    # Populate with `flask rebuild-feeds`
+
+
+def downgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_index('idx_blog_user_timestamp')
+
+    with op.batch_alter_table('feed_inbox', schema=None) as batch_op:
+        batch_op.drop_index('idx_feed_inbox_blog')
+        batch_op.drop_index('idx_feed_inbox_user_author')
+        batch_op.drop_index('idx_feed_inbox_user_timestamp')
+
+    op.drop_table('feed_inbox')
@@ -0,0 +1,29 @@
+"""Add version_stamp table
+
+Revision ID: f7c3e9a1d428
+Revises: e4a6c2d9b157
+Create Date: 2026-10-17 15:06:52.719284
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3e9a1d428'
+down_revision = 'e4a6c2d9b157'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('version_stamp',
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade():
+    op.drop_table('version_stamp')
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configuration is read from the environment when app.config is imported,
+# so the test settings go in before anything imports the app
+DATA_DIR = tempfile.mkdtemp(prefix='blog-tests-')
+os.environ.update(
+    DATABASE_URI=f'sqlite:///{os.path.join(DATA_DIR, "test.db")}',
+    BCRYPT_LOG_ROUNDS='4',
+    MAIL_SERVER='127.0.0.1',
+    MAIL_USE_TLS='false',
+    MAIL_USERNAME='',
+    MAIL_PASSWORD='',
+    MAIL_OUTBOX_ENABLED='false',  # tests drive MailOutbox by hand
+    FOLLOW_GRAPH_ENABLED='false',
+    SQL_INSTRUMENTATION='false'
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Blog  # noqa: E402
+from app.excerpts import set_blog_content  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    path = os.path.join(DATA_DIR, 'test.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    app = create_app()
+    app.config['TESTING'] = True
+    app.extensions['mail'].suppress = True
+    yield app
+    app.extensions['view_buffer'].stop()
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username, verified=True):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', password_hash='x', is_verified=verified)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make_user
+
+
+@pytest.fixture
+def make_blog(app):
+    def make_blog(user_id, title='A post', content='Some words about nothing in particular.', **fields):
+        with app.app_context():
+            blog = Blog(title=title, user_id=user_id, **fields)
+            set_blog_content(blog, content)
+            db.session.add(blog)
+            db.session.commit()
+            return blog.id
+    return make_blog
+
+
+@pytest.fixture
+def auth_headers(app):
+    def auth_headers(user_id):
+        with app.app_context():
+            return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+    return auth_headers
@@ -0,0 +1,67 @@
+import json
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.bulk import import_stream
+from app.caching import get_versions
+from app.counters import reconcile_blog_counters
+from app.models import Blog, BlogView
+
+
+def ndjson(*records):
+    return [(json.dumps(record) + '\n').encode('utf-8') for record in records]
+
+
+def blog(title, **fields):
+    return dict({'author': 'author', 'title': title, 'content': 'Words'}, **fields)
+
+
+def test_booleans_are_parsed_strictly(app, make_user):
+    make_user('author')
+    with app.app_context():
+        stats = import_stream(ndjson(
+            blog('Quoted false', is_draft='false'),
+            blog('Real true', is_draft=True, is_archived='TRUE'),
+            blog('Missing'),
+            blog('Yes', is_draft='yes'),
+            blog('One', is_archived=1)
+        ))
+        assert (stats['imported'], stats['failed']) == (3, 2)
+        assert [error['line'] for error in stats['errors']] == [4, 5]
+        flags = {row.title: (row.is_draft, row.is_archived) for row in Blog.query.all()}
+        assert flags == {'Quoted false': (False, False), 'Real true': (True, True), 'Missing': (False, False)}
+
+
+def test_database_errors_reject_only_the_bad_record(app, make_user, monkeypatch):
+    make_user('author')
+    from app import bulk
+    index_blog_rows = bulk.index_blog_rows
+
+    def failing_index(rows):
+        if any(row['title'] == 'Bad' for row in rows):
+            raise IntegrityError('INSERT INTO blog_fts', {}, Exception('constraint failed'))
+        index_blog_rows(rows)
+    monkeypatch.setattr('app.bulk.index_blog_rows', failing_index)
+
+    with app.app_context():
+        stats = import_stream(ndjson(blog('First'), blog('Bad'), blog('Third'), blog('Fourth')), batch_size=3)
+        assert (stats['imported'], stats['failed'], stats['rejected']) == (3, 0, 1)
+        assert stats['errors'] == [{'line': 2, 'error': 'rejected by the database'}]
+        assert sorted(row.title for row in Blog.query.all()) == ['First', 'Fourth', 'Third']
+        # Bumped once the surviving records committed
+        assert 'blogs' in get_versions(['blogs'])
+
+
+def test_reconcile_keeps_imported_view_counts(app, make_user):
+    reader = make_user('reader')
+    make_user('author')
+    with app.app_context():
+        stats = import_stream(ndjson(blog('Imported', view_count=42), blog('Tracked')))
+        assert stats['imported'] == 2
+        imported, tracked = (Blog.query.filter_by(title=title).one() for title in ('Imported', 'Tracked'))
+        db.session.add_all(BlogView(blog_id=tracked.id, user_id=reader) for _ in range(2))
+        imported.like_count = 5  # drifted; no like rows back it
+        db.session.commit()
+
+        reconcile_blog_counters()
+        counts = {row.title: (row.view_count, row.like_count) for row in Blog.query.all()}
+        assert counts == {'Imported': (42, 0), 'Tracked': (2, 0)}
@@ -0,0 +1,39 @@
+from app import db
+from app.caching import bump_versions, get_versions
+
+
+def versions(keys):
+    return {key: version for key, (version, _) in get_versions(keys).items()}
+
+
+def test_site_wide_stamps_are_bumped_after_commit(app):
+    with app.app_context():
+        bump_versions('blogs', 'user:1')
+        # Only the per-entity row is written inside the transaction
+        assert versions(['blogs', 'user:1']) == {'user:1': 1}
+        db.session.commit()
+        assert versions(['blogs', 'user:1']) == {'blogs': 1, 'user:1': 1}
+
+        bump_versions('blogs', 'trending')
+        db.session.rollback()
+        assert versions(['blogs', 'trending']) == {'blogs': 1}
+
+        # Releasing a savepoint is not the commit
+        with db.session.begin_nested():
+            bump_versions('trending')
+        assert versions(['trending']) == {}
+        db.session.commit()
+        assert versions(['trending']) == {'trending': 1}
+
+
+def test_blog_listing_etag_changes_when_a_blog_is_published(app, client, make_user, auth_headers):
+    author = make_user('author')
+    etag = client.get('/api/blogs').headers['ETag']
+    assert client.get('/api/blogs', headers={'If-None-Match': etag}).status_code == 304
+
+    response = client.post('/api/blogs', json={'title': 'New', 'content': 'Words', 'publish': True},
+                           headers=auth_headers(author))
+    assert response.status_code == 201
+    response = client.get('/api/blogs', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,53 @@
+import pytest
+from app import db
+from app.comments import get_comments, REPLY_PREVIEW_LIMIT
+from app.instrumentation import assert_max_queries
+from app.models import Comment, CommentLike
+
+
+def seed_threads(app, blog_id, user_ids, threads, replies_per_thread):
+    """threads top-level comments, each with replies and likes from every user."""
+    with app.app_context():
+        for i in range(threads):
+            parent = Comment(content=f'Comment {i}', user_id=user_ids[i % len(user_ids)], blog_id=blog_id)
+            db.session.add(parent)
+            db.session.flush()
+            replies = [Comment(content=f'Reply {i}.{j}', user_id=user_ids[j % len(user_ids)], blog_id=blog_id,
+                               parent_id=parent.id) for j in range(replies_per_thread)]
+            db.session.add_all(replies)
+            db.session.flush()
+            for comment in [parent] + replies:
+                db.session.add_all(CommentLike(user_id=user_id, comment_id=comment.id, blog_id=blog_id)
+                                   for user_id in user_ids)
+        db.session.commit()
+
+
+def comment_page_queries(client, blog_id, headers=None):
+    with assert_max_queries(get_comments.query_budget) as stats:
+        response = client.get(f'/api/comments/blog/{blog_id}?per_page=50', headers=headers)
+    assert response.status_code == 200
+    return stats.count, response.get_json()['comments']
+
+
+@pytest.mark.parametrize('signed_in', [False, True])
+def test_comment_page_query_count_does_not_grow_with_comments(app, client, make_user, make_blog, auth_headers,
+                                                              signed_in):
+    user_ids = [make_user(f'user{i}') for i in range(4)]
+    small_blog, large_blog = make_blog(user_ids[0]), make_blog(user_ids[0])
+    seed_threads(app, small_blog, user_ids, threads=1, replies_per_thread=1)
+    seed_threads(app, large_blog, user_ids, threads=30, replies_per_thread=REPLY_PREVIEW_LIMIT + 2)
+    headers = auth_headers(user_ids[1]) if signed_in else None
+
+    with app.app_context():
+        small_count, small_page = comment_page_queries(client, small_blog, headers)
+        large_count, large_page = comment_page_queries(client, large_blog, headers)
+
+    assert large_count == small_count
+    assert len(large_page) == 30
+    thread = large_page[0]
+    assert len(thread['replies']) == REPLY_PREVIEW_LIMIT
+    assert thread['replies_count'] == REPLY_PREVIEW_LIMIT + 2
+    assert thread['has_more_replies'] is True
+    assert thread['likes'] == 4
+    assert thread['replies'][0]['likes'] == 4
+    assert thread['is_liked'] is signed_in
@@ -0,0 +1,23 @@
+import gzip
+import json
+
+
+def test_revalidation_304_matches_the_compressed_200(client):
+    response = client.get('/api/openapi.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert 'paths' in json.loads(gzip.decompress(response.get_data()))
+
+    response = client.get('/api/openapi.json', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    # Without an encoding the 304 stands for the identity 200: strong ETag
+    response = client.get('/api/openapi.json', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag[2:]
+    assert 'Accept-Encoding' in response.headers['Vary']
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from app import db
+from app.feed import get_feed
+from app.instrumentation import assert_max_queries
+from app.models import FeedEntry, FeedPullAuthor
+
+
+def inbox(app, user_id):
+    with app.app_context():
+        return {row.blog_id for row in FeedEntry.query.filter_by(user_id=user_id)}
+
+
+def test_author_switching_back_to_push_backfills_inboxes(app, client, make_user, auth_headers):
+    app.config['FEED_FANOUT_MAX_FOLLOWERS'] = 2
+    author = make_user('author')
+    followers = [make_user(f'reader{n}') for n in range(4)]
+
+    def follow(user_id):
+        response = client.post(f'/api/follows/{author}', headers=auth_headers(user_id))
+        assert response.status_code in (200, 201)
+
+    def publish(title):
+        response = client.post('/api/blogs', json={'title': title, 'content': 'Words', 'publish': True},
+                               headers=auth_headers(author))
+        return response.get_json()['blog']['id']
+
+    def feed(user_id):
+        return [blog['id'] for blog in client.get('/api/feed', headers=auth_headers(user_id)).get_json()['feed']]
+
+    follow(followers[0])
+    follow(followers[1])
+    pushed = publish('Pushed')
+    assert inbox(app, followers[0]) == {pushed}
+
+    # A third follower moves the author to pull mode
+    follow(followers[2])
+    with app.app_context():
+        assert db.session.get(FeedPullAuthor, author) is not None
+    pulled = publish('Pulled')
+    follow(followers[3])
+    assert inbox(app, followers[0]) == {pushed}
+    assert feed(followers[0]) == [pulled, pushed]
+    assert feed(followers[3]) == [pulled, pushed]
+
+    # Back down to two followers: both posts must now come from the inboxes
+    follow(followers[1])
+    follow(followers[2])
+    with app.app_context():
+        assert db.session.get(FeedPullAuthor, author) is None
+    for user_id in (followers[0], followers[3]):
+        assert inbox(app, user_id) == {pushed, pulled}
+        assert feed(user_id) == [pulled, pushed]
+    assert inbox(app, followers[1]) == set()
+
+
+def test_feed_reads_every_pulled_author_in_one_query(app, client, make_user, make_blog, auth_headers):
+    app.config['FEED_FANOUT_MAX_FOLLOWERS'] = 0
+    reader = make_user('reader')
+    authors = [make_user(f'author{n}') for n in range(6)]
+    start = datetime(2024, 1, 1)
+    posts = []
+    for n in range(18):
+        author = authors[n % len(authors)]
+        posts.append(make_blog(author, title=f'Post {n}', timestamp=start + timedelta(minutes=n)))
+    for author in authors:
+        assert client.post(f'/api/follows/{author}', headers=auth_headers(reader)).status_code in (200, 201)
+    with app.app_context():
+        assert FeedPullAuthor.query.count() == len(authors)
+        assert FeedEntry.query.count() == 0
+
+    feed, cursor = [], ''
+    while cursor is not None:
+        with app.app_context(), assert_max_queries(get_feed.query_budget):
+            response = client.get(f'/api/feed?per_page=5&cursor={cursor}', headers=auth_headers(reader))
+        assert response.status_code == 200
+        body = response.get_json()
+        feed.extend(blog['id'] for blog in body['feed'])
+        cursor = body['pagination']['next_cursor']
+    assert feed == posts[::-1]
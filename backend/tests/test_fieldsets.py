@@ -0,0 +1,45 @@
+from app.instrumentation import recording
+
+
+def blog_selects(stats):
+    return [statement for statement in stats.statements if statement.lstrip().startswith('SELECT blog.')]
+
+
+def test_unknown_fields_and_includes_are_rejected(client, make_user):
+    make_user('author')
+    response = client.get('/api/blogs?fields=title,secret')
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['error'] == 'Unknown field(s): secret'
+    assert {'id', 'title', 'content', 'author', 'tags'} <= set(body['available'])
+
+    response = client.get('/api/blogs?include=author,likes')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown include(s): likes', 'available': ['author', 'tags']}
+
+    response = client.get('/api/users/author?include=comments')
+    assert response.status_code == 400
+    assert response.get_json()['available'] == ['blogs', 'stats', 'tags']
+
+
+def test_narrow_fieldset_leaves_columns_out_of_the_select(app, client, make_user, make_blog):
+    author = make_user('author')
+    make_blog(author, title='Sparse', content='A body that should stay in the database.')
+
+    with app.app_context(), recording(keep_statements=True) as stats:
+        response = client.get('/api/blogs?fields=id,title')
+    assert response.status_code == 200
+    [blog] = response.get_json()['blogs']
+    assert set(blog) == {'id', 'title'}
+    selects = blog_selects(stats)
+    assert selects
+    for statement in selects:
+        assert 'blog.title' in statement
+        for column in ('blog.content', 'blog.excerpt', 'blog.category', 'blog.word_count'):
+            assert column not in statement
+    # No author or tags were asked for, so neither is loaded
+    assert not [statement for statement in stats.statements if 'FROM user' in statement or 'blog_tags' in statement]
+
+    with app.app_context(), recording(keep_statements=True) as stats:
+        assert client.get('/api/blogs').status_code == 200
+    assert any('blog.excerpt' in statement for statement in blog_selects(stats))
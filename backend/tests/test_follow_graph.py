@@ -0,0 +1,60 @@
+from app.follow_graph import FollowGraph
+
+
+def edges(graph):
+    return {user_id: list(ids) for user_id, ids in graph.following.items() if ids}
+
+
+def test_graph_follows_changes_made_by_this_and_other_processes(app, client, make_user, auth_headers):
+    app.config['FOLLOW_GRAPH_ENABLED'] = True
+    ann, bob, cat, dan, eve = (make_user(name) for name in ('ann', 'bob', 'cat', 'dan', 'eve'))
+
+    def toggle(follower_id, followed_id):
+        response = client.post(f'/api/follows/{followed_id}', headers=auth_headers(follower_id))
+        assert response.status_code in (200, 201)
+
+    toggle(ann, bob)
+    graph = app.extensions['follow_graph']
+    other = FollowGraph(app)  # another worker's copy
+    with app.app_context():
+        graph.load()
+        other.load()
+    assert edges(graph) == edges(other) == {ann: [bob]}
+
+    # Applied here at once; replayed from follow_event by the other worker
+    for follower_id, followed_id in ((ann, cat), (bob, ann), (bob, dan), (cat, dan), (cat, eve), (ann, bob)):
+        toggle(follower_id, followed_id)
+    expected = {ann: [cat], bob: [ann, dan], cat: [dan, eve]}
+    assert edges(graph) == expected
+    with app.app_context():
+        assert other.sync(force=True) == 6
+        assert other.sync(force=True) == 0
+    assert edges(other) == expected
+    assert other.counts(dan) == (2, 0)
+    assert other.is_following(cat, eve) and not other.is_following(ann, bob)
+
+    # Mutuals and second-hop suggestions, from the graph and from SQL alike
+    toggle(cat, ann)
+    toggle(ann, bob)
+    assert list(graph.mutuals(ann)) == [bob, cat]
+    assert graph.suggestions(ann) == [(dan, 2), (eve, 1)]
+    for enabled in (True, False):
+        app.config['FOLLOW_GRAPH_ENABLED'] = enabled
+        mutuals = client.get(f'/api/follows/mutuals/{ann}').get_json()
+        assert [user['id'] for user in mutuals['mutuals']] == [bob, cat]
+        suggestions = client.get('/api/follows/suggestions', headers=auth_headers(ann)).get_json()
+        assert [(user['username'], user['mutual_connections']) for user in suggestions['suggestions']] == \
+            [('dan', 2), ('eve', 1)]
+
+
+def test_graph_stats_need_the_metrics_token_or_an_admin(app, client, make_user, auth_headers):
+    admin, reader = make_user('admin'), make_user('reader')
+    app.config['ADMIN_USERNAMES'] = ['admin']
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+
+    assert client.get('/api/follows/graph/stats').status_code == 401
+    assert client.get('/api/follows/graph/stats', headers=auth_headers(reader)).status_code == 403
+    assert client.get('/api/follows/graph/stats', headers=auth_headers(admin)).status_code == 200
+    response = client.get('/api/follows/graph/stats', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'edges' in response.get_json()
@@ -0,0 +1,54 @@
+import logging
+import pytest
+from flask import jsonify
+from app import db
+from app.instrumentation import QueryBudgetExceeded, assert_max_queries, query_budget
+from app.models import User
+
+
+@pytest.fixture
+def chatty(app):
+    """A view allowed one query that runs three."""
+    @query_budget(1)
+    def chatty_view():
+        counts = [User.query.filter_by(id=n).count() for n in range(3)]
+        return jsonify(counts=counts)
+    app.add_url_rule('/test/chatty', 'chatty', chatty_view)
+    return '/test/chatty'
+
+
+def test_raise_mode_fails_the_request(app, client, chatty):
+    app.config['SQL_QUERY_BUDGETS'] = 'raise'
+    with pytest.raises(QueryBudgetExceeded, match=r'GET /test/chatty ran 3 queries \(budget 1\)'):
+        client.get(chatty)
+
+
+def test_warn_mode_logs_and_serves(app, client, chatty, caplog):
+    app.config['SQL_QUERY_BUDGETS'] = 'warn'
+    app.config['SQL_N_PLUS_ONE_THRESHOLD'] = 3
+    with caplog.at_level(logging.WARNING):
+        assert client.get(chatty).status_code == 200
+    assert 'GET /test/chatty ran 3 queries (budget 1)' in caplog.text
+    assert 'probable N+1, 3x' in caplog.text
+
+
+def test_unset_is_raise_when_testing_and_off_otherwise(app, client, chatty, caplog):
+    app.config['SQL_QUERY_BUDGETS'] = None
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(chatty)
+
+    app.config['TESTING'] = False
+    with caplog.at_level(logging.WARNING):
+        assert client.get(chatty).status_code == 200
+    assert 'queries (budget' not in caplog.text
+
+
+def test_assert_max_queries_counts_the_block(app):
+    with app.app_context():
+        with assert_max_queries(2) as stats:
+            db.session.query(User).count()
+        assert stats.count == 1
+        with pytest.raises(QueryBudgetExceeded, match=r'Block ran 3 queries \(budget 2\)'):
+            with assert_max_queries(2):
+                for n in range(3):
+                    db.session.query(User).filter_by(id=n).count()
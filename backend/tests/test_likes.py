@@ -0,0 +1,94 @@
+import threading
+from app import db
+from app.counters import bump_blog_counter
+from app.likes import toggle_like
+from app.models import Blog, Comment, CommentLike, Like
+
+
+def like_rows(app, blog_id):
+    with app.app_context():
+        return [row.user_id for row in Like.query.filter_by(blog_id=blog_id)]
+
+
+def like_count(app, blog_id):
+    with app.app_context():
+        return db.session.get(Blog, blog_id).like_count
+
+
+def test_toggling_twice_in_one_transaction(app, make_user, make_blog):
+    reader = make_user('reader')
+    blog_id = make_blog(make_user('author'))
+
+    def toggle():
+        liked, changed = toggle_like(Like, {'user_id': reader, 'blog_id': blog_id}, ['blog_id', 'user_id'])
+        if changed:
+            bump_blog_counter(blog_id, 'like_count', 1 if liked else -1)
+        return liked, changed
+
+    with app.app_context():
+        assert [toggle(), toggle(), toggle()] == [(True, True), (False, True), (True, True)]
+        db.session.commit()
+    assert like_rows(app, blog_id) == [reader]
+    assert like_count(app, blog_id) == 1
+
+
+def test_concurrent_toggles_from_two_sessions(app, make_user, make_blog, auth_headers):
+    reader = make_user('reader')
+    blog_id = make_blog(make_user('author'))
+    headers = auth_headers(reader)
+    start = threading.Barrier(2)
+    statuses = []
+
+    def tap():
+        client = app.test_client()
+        start.wait()
+        statuses.append(client.post(f'/api/likes/blog/{blog_id}', headers=headers).status_code)
+
+    threads = [threading.Thread(target=tap) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One like and one unlike, whichever came first
+    assert sorted(statuses) == [200, 201]
+    assert like_rows(app, blog_id) == []
+    assert like_count(app, blog_id) == 0
+
+
+def test_like_status_for_blogs_and_comments(app, client, make_user, make_blog, auth_headers):
+    author, reader = make_user('author'), make_user('reader')
+    liked_blog, other_blog = make_blog(author, title='Liked'), make_blog(author, title='Other')
+    draft = make_blog(author, title='Draft', is_draft=True)
+    with app.app_context():
+        comment = Comment(content='Nice', user_id=author, blog_id=liked_blog)
+        db.session.add(comment)
+        db.session.flush()
+        comment_id = comment.id
+        db.session.add_all([CommentLike(user_id=reader, comment_id=comment_id, blog_id=liked_blog),
+                            CommentLike(user_id=author, comment_id=comment_id, blog_id=liked_blog)])
+        db.session.commit()
+    assert client.post(f'/api/likes/blog/{liked_blog}', headers=auth_headers(reader)).status_code == 201
+
+    body = {'blog_ids': [liked_blog, other_blog, draft, liked_blog], 'comment_ids': [comment_id, 999]}
+    response = client.post('/api/likes/status', json=body, headers=auth_headers(reader))
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'blogs': {'likes': {str(liked_blog): 1, str(other_blog): 0}, 'liked': [liked_blog]},
+        'comments': {'likes': {str(comment_id): 2}, 'liked': [comment_id]}
+    }
+
+    # Anonymous callers get counts only
+    response = client.post('/api/likes/status', json=body)
+    assert response.get_json()['blogs']['liked'] == []
+    assert response.get_json()['comments']['liked'] == []
+
+
+def test_like_status_rejects_too_many_ids(app, client):
+    app.config['LIKE_STATUS_MAX_IDS'] = 3
+    assert client.post('/api/likes/status', json={'blog_ids': [1, 2, 3]}).status_code == 200
+    for key in ('blog_ids', 'comment_ids'):
+        response = client.post('/api/likes/status', json={key: [1, 2, 3, 4]})
+        assert response.status_code == 400
+        assert response.get_json() == {'error': f'At most 3 {key} per request'}
+    assert client.post('/api/likes/status', json={}).status_code == 400
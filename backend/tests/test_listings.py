@@ -0,0 +1,64 @@
+from app import db
+from app.blogs import get_blogs, search_blogs, get_drafts, get_archived_blogs, get_personalized_recommendations
+from app.excerpts import set_blog_content
+from app.instrumentation import assert_max_queries
+from app.models import Blog, Like, Tag, UserCategoryPreference
+from app.search import index_blog
+from app.users import get_user_profile
+
+ENDPOINTS = [
+    ('/api/blogs?per_page=50', get_blogs, 'author', 'blogs'),
+    ('/api/blogs/search?q=python&per_page=50', search_blogs, 'author', 'blogs'),
+    ('/api/blogs/drafts?per_page=50', get_drafts, 'author', 'blogs'),
+    ('/api/blogs/archived?per_page=50', get_archived_blogs, 'author', 'blogs'),
+    ('/api/blogs/recommendations?per_page=50', get_personalized_recommendations, 'reader', 'recommendations'),
+    ('/api/users/author?per_page=50&include=tags,stats,blogs', get_user_profile, 'author', 'blogs'),
+]
+
+
+def seed_blogs(app, author_id, liker_ids, count):
+    """count published blogs, drafts and archived blogs, each with tags and likes."""
+    with app.app_context():
+        shared = [Tag.query.filter_by(name=name).first() or Tag(name=name) for name in ('python', 'cache')]
+        start = Blog.query.count()
+        for n in range(start, start + 3 * count):
+            blog = Blog(title=f'Python post {n}', user_id=author_id, category='technology', is_draft=n % 3 == 1, is_archived=n % 3 == 2,
+                        like_count=len(liker_ids), tags=shared + [Tag(name=f'tag{n}')])
+            set_blog_content(blog, f'Words about python, number {n}.')
+            db.session.add(blog)
+            db.session.flush()
+            db.session.add_all(Like(user_id=user_id, blog_id=blog.id) for user_id in liker_ids)
+            index_blog(blog)
+        db.session.commit()
+
+
+def listing_queries(app, client, path, view, headers):
+    with app.app_context(), assert_max_queries(view.query_budget) as stats:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return stats.count, response.get_json()
+
+
+def test_blog_listing_query_counts_do_not_grow_with_page_size(app, client, make_user, auth_headers):
+    users = {'author': make_user('author'), 'reader': make_user('reader')}
+    likers = [make_user(f'liker{n}') for n in range(3)]
+    with app.app_context():
+        db.session.add(UserCategoryPreference(user_id=users['reader'], category='technology'))
+        db.session.commit()
+
+    def measure():
+        results = {}
+        for path, view, user, key in ENDPOINTS:
+            count, body = listing_queries(app, client, path, view, auth_headers(users[user]))
+            results[path] = count, len(body[key])
+        return results
+
+    seed_blogs(app, users['author'], likers, 5)
+    small = measure()
+    seed_blogs(app, users['author'], likers, 10)
+    large = measure()
+
+    for path, _, _, _ in ENDPOINTS:
+        assert small[path][1] == 5, path
+        assert large[path][1] == 15, path
+        assert large[path][0] == small[path][0], path
@@ -0,0 +1,155 @@
+import smtplib
+import socket
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.mailer import MailOutbox, SmtpSession, queue_email
+from app.models import EmailOutbox
+
+
+class FakeSmtp:
+    """Stands in for SmtpSession; send() raises error if one is set."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def connection(self):
+        return self
+
+    def send(self, message):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(message.recipients[0])
+
+    def close(self):
+        pass
+
+
+def queue(app, to='reader@example.com'):
+    with app.app_context():
+        message = queue_email(to, 'Hello', '<p>Hi</p>')
+        db.session.commit()
+        return message.id
+
+
+def outbox_row(app, message_id):
+    with app.app_context():
+        return db.session.get(EmailOutbox, message_id)
+
+
+def test_refused_message_is_retried_with_backoff_then_failed(app):
+    outbox = MailOutbox(app, max_attempts=2, backoff_base=30, background=False)
+    message_id = queue(app)
+    smtp = FakeSmtp(smtplib.SMTPRecipientsRefused({'reader@example.com': (550, b'No such user here')}))
+
+    started = datetime.utcnow()
+    assert outbox.deliver_pending(smtp) == 0
+    row = outbox_row(app, message_id)
+    assert (row.status, row.attempts, row.claim_token) == ('pending', 1, None)
+    assert row.next_attempt_at >= started + timedelta(seconds=30 * 0.75)
+    # Only the class and SMTP code are kept, never the addresses
+    assert row.last_error == 'SMTPRecipientsRefused 550'
+    assert outbox.stats()['last_error'] == 'SMTPRecipientsRefused 550'
+
+    # Not due again until the backoff has passed
+    assert outbox.deliver_pending(smtp) == 0
+    assert outbox_row(app, message_id).attempts == 1
+
+    with app.app_context():
+        db.session.get(EmailOutbox, message_id).next_attempt_at = datetime.utcnow()
+        db.session.commit()
+    outbox.deliver_pending(smtp)
+    row = outbox_row(app, message_id)
+    assert (row.status, row.attempts) == ('failed', 2)
+    assert outbox.stats()['failed_total'] == 1
+
+    smtp.error = None
+    sent_id = queue(app, 'other@example.com')
+    assert outbox.deliver_pending(smtp) == 1
+    assert smtp.sent == ['other@example.com']
+    assert outbox_row(app, sent_id).status == 'sent'
+
+
+def test_stale_claim_is_taken_over_and_late_finish_ignored(app):
+    slow = MailOutbox(app, claim_timeout=300, background=False)
+    fast = MailOutbox(app, claim_timeout=300, background=False)
+    message_id = queue(app)
+
+    with app.app_context():
+        rows, slow_token = slow._claim()
+        assert [row.id for row in rows] == [message_id]
+        # Nothing left to claim while the claim is fresh
+        assert fast._claim() is None
+
+        db.session.get(EmailOutbox, message_id).claimed_at = datetime.utcnow() - timedelta(seconds=301)
+        db.session.commit()
+        rows, fast_token = fast._claim()
+        assert [row.id for row in rows] == [message_id]
+        assert rows[0].attempts == 2
+
+        # The first worker's outcome no longer applies to the row
+        slow._finish(slow_token, [], [(rows[0], 'SMTPServerDisconnected')], [])
+        row = db.session.get(EmailOutbox, message_id)
+        db.session.refresh(row)
+        assert (row.status, row.claim_token, row.last_error) == ('sending', fast_token, None)
+
+        fast._finish(fast_token, [message_id], [], [])
+        db.session.refresh(row)
+        assert (row.status, row.claim_token) == ('sent', None)
+
+
+def test_outbox_stats_need_the_metrics_token_or_an_admin(app, client, make_user, auth_headers):
+    admin, reader = make_user('admin'), make_user('reader')
+    app.config['ADMIN_USERNAMES'] = ['admin']
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+
+    assert client.get('/api/auth/outbox/stats').status_code == 401
+    assert client.get('/api/auth/outbox/stats', headers=auth_headers(reader)).status_code == 403
+    assert client.get('/api/auth/outbox/stats', headers=auth_headers(admin)).status_code == 200
+    response = client.get('/api/auth/outbox/stats', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'pending' in response.get_json()
+
+
+class RecordingHandler:
+    """aiosmtpd handler keeping each message's recipients and client address."""
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.append((session.peer, envelope.rcpt_tos))
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server(app):
+    controller_module = pytest.importorskip('aiosmtpd.controller')
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    state = app.extensions['mail']
+    state.server, state.port, state.use_tls, state.use_ssl, state.suppress = '127.0.0.1', port, False, False, False
+    yield handler
+    controller.stop()
+
+
+def test_batches_go_out_over_one_smtp_connection(app, smtp_server):
+    outbox = MailOutbox(app, batch_size=2, background=False)
+    recipients = [f'reader{n}@example.com' for n in range(5)]
+    message_ids = [queue(app, to) for to in recipients]
+
+    session = SmtpSession(idle_timeout=60)
+    try:
+        assert outbox.deliver_pending(session) == 5
+    finally:
+        session.close()
+
+    assert session.connects == 1
+    assert sorted(rcpt for _, [rcpt] in smtp_server.received) == recipients
+    assert len({peer for peer, _ in smtp_server.received}) == 1
+    assert {outbox_row(app, message_id).status for message_id in message_ids} == {'sent'}
@@ -0,0 +1,91 @@
+import os
+import time
+import pytest
+from sqlalchemy import event
+from app import db
+from app.caching import bump_versions, get_versions
+from app.config import Config
+from app.replicas import PRIMARY_UNTIL_COOKIE, PRIMARY_UNTIL_HEADER, RecentWriters, _must_read_primary, get_replica_router
+
+
+@pytest.fixture
+def replicas(monkeypatch):
+    # One "replica" that is the test database itself
+    uri = os.environ['DATABASE_URI']
+    monkeypatch.setattr(Config, 'DATABASE_REPLICA_URIS', [uri])
+    monkeypatch.setattr(Config, 'SQLALCHEMY_BINDS', {'replica0': uri})
+    yield
+    # init_app left a MetaData for the bind on the shared extension
+    db.metadatas.pop('replica0', None)
+
+
+@pytest.fixture
+def app(replicas, app):
+    return app
+
+
+def reads_primary(app, path, headers=None):
+    with app.test_request_context(path, headers=headers or {}):
+        return _must_read_primary(get_replica_router())
+
+
+def test_routing_decision(app, make_user, auth_headers):
+    writer, reader = make_user('writer'), make_user('reader')
+    now = time.time()
+
+    assert not reads_primary(app, '/api/blogs')
+    assert reads_primary(app, '/api/auth/verify-email/token')  # @use_primary
+
+    assert reads_primary(app, '/api/blogs', {PRIMARY_UNTIL_HEADER: str(now + 5)})
+    assert reads_primary(app, '/api/blogs', {'Cookie': f'{PRIMARY_UNTIL_COOKIE}={now + 5}'})
+    # Expired, beyond the window (forged) or garbage
+    for until in (str(now - 1), str(now + 3600), 'soon'):
+        assert not reads_primary(app, '/api/blogs', {PRIMARY_UNTIL_HEADER: until})
+        assert not reads_primary(app, '/api/blogs', {'Cookie': f'{PRIMARY_UNTIL_COOKIE}={until}'})
+
+    app.extensions['replica_router'].recent_writers.add(str(writer))
+    assert reads_primary(app, '/api/blogs', auth_headers(writer))
+    assert not reads_primary(app, '/api/blogs', auth_headers(reader))
+
+
+def test_bearer_client_echoing_the_header_reads_its_write_on_another_worker(app, make_user, auth_headers):
+    router = app.extensions['replica_router']
+    writer = make_user('writer')
+    headers = auth_headers(writer)
+    client = app.test_client(use_cookies=False)
+
+    response = client.post('/api/blogs', json={'title': 'New', 'content': 'Words', 'publish': True}, headers=headers)
+    assert response.status_code == 201
+    until = response.headers[PRIMARY_UNTIL_HEADER]
+    assert PRIMARY_UNTIL_COOKIE in response.headers['Set-Cookie']
+
+    # Another worker has not seen the write
+    router.recent_writers = RecentWriters(router.read_your_writes_seconds)
+    primary_reads = router.primary_reads
+    client.get('/api/blogs', headers=headers)
+    assert router.primary_reads == primary_reads
+    client.get('/api/blogs', headers=dict(headers, **{PRIMARY_UNTIL_HEADER: until}))
+    assert router.primary_reads == primary_reads + 1
+
+
+def test_stamps_bumped_after_commit_go_to_the_primary_in_a_pinned_get(app):
+    with app.app_context():
+        replica = db.engines['replica0']
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.test_request_context('/api/blogs'):
+        app.preprocess_request()
+        assert db.session.info['replica'] is replica
+        event.listen(replica, 'before_cursor_execute', record)
+        try:
+            bump_versions('blogs')
+            db.session.commit()
+        finally:
+            event.remove(replica, 'before_cursor_execute', record)
+
+    assert not [statement for statement in statements if 'version_stamp' in statement]
+    with app.app_context():
+        assert 'blogs' in get_versions(['blogs'])
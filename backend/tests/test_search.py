@@ -0,0 +1,15 @@
+def test_highlights_escape_the_blog_text(client, make_user, auth_headers):
+    author = make_user('author')
+    response = client.post('/api/blogs', json={
+        'title': '<script>alert(1)</script> Python tips',
+        'content': 'Use <img src=x onerror=alert(1)> & python daily',
+        'publish': True
+    }, headers=auth_headers(author))
+    assert response.status_code == 201
+
+    response = client.get('/api/blogs/search?q=python')
+    assert response.status_code == 200
+    [blog] = response.get_json()['blogs']
+    highlight = blog['highlight']
+    assert highlight['title'] == '&lt;script&gt;alert(1)&lt;/script&gt; <mark>Python</mark> tips'
+    assert highlight['content'] == 'Use &lt;img src=x onerror=alert(1)&gt; &amp; <mark>python</mark> daily'
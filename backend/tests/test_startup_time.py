@@ -0,0 +1,15 @@
+import os
+import pytest
+from benchmarks.startup_time import measure, over_budget
+
+# Median import-to-first-request time allowed in production mode
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', 1500))
+
+
+@pytest.mark.slow
+def test_production_startup_is_within_budget():
+    results = measure(['production'], samples=3)
+    production = results[0]
+    assert not over_budget(results, STARTUP_BUDGET_MS), (
+        f"production startup p50 {production['total_p50_ms']}ms exceeds the {STARTUP_BUDGET_MS}ms budget"
+    )
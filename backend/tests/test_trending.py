@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import db
+from app.models import TrendingScore, TrendingMeta
+from app.trending import record_event, record_events, refresh_trending
+
+
+def scores(app):
+    with app.app_context():
+        return {row.blog_id: (row.score, row.epoch) for row in TrendingScore.query.all()}
+
+
+def test_increments_follow_a_rebase_made_elsewhere(app, make_user, make_blog):
+    author = make_user('author')
+    first, second = make_blog(author, title='First'), make_blog(author, title='Second')
+    with app.app_context():
+        record_event(first, 'like')
+        db.session.commit()
+    old_epoch = scores(app)[first][1]
+
+    # Another worker rebases; this process has nothing to invalidate
+    new_epoch = old_epoch + timedelta(hours=3)
+    with app.app_context():
+        db.session.execute(update(TrendingMeta).values(epoch=new_epoch))
+        db.session.execute(update(TrendingScore).values(epoch=new_epoch))
+        db.session.commit()
+
+        record_event(first, 'like')
+        record_event(second, 'like')
+        db.session.commit()
+
+    after = scores(app)
+    assert {epoch for _, epoch in after.values()} == {new_epoch}
+    assert after[first][0] > after[second][0] > 0
+
+
+def test_record_events_never_rebases_inline(app, make_user, make_blog):
+    author = make_user('author')
+    blog_id = make_blog(author)
+    app.config['TRENDING_REBASE_AFTER_HALF_LIVES'] = 1
+    with app.app_context():
+        record_event(blog_id, 'like')
+        db.session.commit()
+        epoch = db.session.get(TrendingMeta, 1).epoch
+
+        # Ten days on is well past one half-life, but only the CLI rebases
+        later = datetime.utcnow() + timedelta(days=10)
+        record_events({blog_id: 1.0}, at=later)
+        db.session.commit()
+        assert db.session.get(TrendingMeta, 1).epoch == epoch
+        assert db.session.get(TrendingScore, blog_id).epoch == epoch
+
+        refresh_trending(later)
+        db.session.commit()
+        assert db.session.get(TrendingMeta, 1).epoch == later.replace(microsecond=0)
+        assert db.session.get(TrendingScore, blog_id).epoch == later.replace(microsecond=0)
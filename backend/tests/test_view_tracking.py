@@ -0,0 +1,69 @@
+from sqlalchemy.exc import IntegrityError, OperationalError
+from app import db
+from app.models import Blog, BlogView
+from app.view_tracking import ViewBuffer
+
+
+def test_views_of_deleted_blog_are_dropped_at_flush(app, client, make_user, make_blog, auth_headers):
+    author = make_user('author')
+    viewer = make_user('viewer')
+    kept, deleted = make_blog(author, title='Kept'), make_blog(author, title='Deleted')
+
+    buffer = ViewBuffer(app, flush_interval=3600)  # flushed by hand below
+    buffer.record(kept, viewer)
+    buffer.record(deleted, viewer)
+    assert client.delete(f'/api/blogs/{deleted}', headers=auth_headers(author)).status_code == 200
+
+    assert buffer.flush() == 1
+    stats = buffer.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['flushed_total'] == 1
+    assert stats['dropped_total'] == 1
+    assert buffer.pending_count(deleted) == 0
+    with app.app_context():
+        assert [view.blog_id for view in BlogView.query.all()] == [kept]
+        assert db.session.get(Blog, kept).view_count == 1
+
+    # Nothing is left to retry
+    assert buffer.flush() == 0
+    buffer.stop()
+
+
+def test_rejected_batch_is_dropped_and_failed_batch_requeued(app, make_user, make_blog, monkeypatch):
+    author = make_user('author')
+    blog_id = make_blog(author)
+    buffer = ViewBuffer(app, flush_interval=3600)
+
+    def fail_with(error):
+        def bump_blog_counters(*args, **kwargs):
+            raise error
+        monkeypatch.setattr('app.view_tracking.bump_blog_counters', bump_blog_counters)
+
+    # Transient: the batch waits for the next flush
+    fail_with(OperationalError('UPDATE blog', {}, Exception('database is locked')))
+    buffer.record(blog_id, author)
+    assert buffer.flush() == 0
+    assert buffer.stats()['queue_depth'] == 1
+    assert buffer.pending_count(blog_id) == 1
+
+    # Permanent: retrying cannot help, so the batch is dropped
+    fail_with(IntegrityError('INSERT INTO blog_view', {}, Exception('FOREIGN KEY constraint failed')))
+    assert buffer.flush() == 0
+    stats = buffer.stats()
+    assert stats['queue_depth'] == 0
+    assert stats['dropped_total'] == 1
+    assert buffer.pending_count(blog_id) == 0
+    buffer.stop()
+
+
+def test_view_stats_need_the_metrics_token_or_an_admin(app, client, make_user, auth_headers):
+    admin, reader = make_user('admin'), make_user('reader')
+    app.config['ADMIN_USERNAMES'] = ['admin']
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+
+    assert client.get('/api/blogs/views/stats').status_code == 401
+    assert client.get('/api/blogs/views/stats', headers=auth_headers(reader)).status_code == 403
+    assert client.get('/api/blogs/views/stats', headers=auth_headers(admin)).status_code == 200
+    response = client.get('/api/blogs/views/stats', headers={'Authorization': 'Bearer scrape-secret'})
+    assert response.status_code == 200
+    assert 'queue_depth' in response.get_json()